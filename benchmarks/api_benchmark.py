@@ -0,0 +1,330 @@
+# benchmarks/api_benchmark.py
+# Нагрузочный прогон API внутри процесса (httpx + ASGITransport, без сети).
+#
+#   python -m benchmarks.api_benchmark                       # сравнить с baseline
+#   python -m benchmarks.api_benchmark --update-baseline     # записать новый baseline
+#   python -m benchmarks.api_benchmark --courses 5000 --concurrency 32
+#
+# Код возврата 1, если какой-то маршрут стал медленнее baseline больше,
+# чем на --threshold (по p95 или по пропускной способности).
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import time
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Awaitable, Callable
+
+BASELINE_PATH = Path(__file__).parent / "baselines" / "api.json"
+PASSWORD = "benchmark"
+
+
+@dataclass
+class Dataset:
+    users: int = 20
+    categories: int = 10
+    courses: int = 500
+    comments_per_course: int = 5
+    purchases_per_user: int = 10
+
+
+@dataclass
+class Scenario:
+    name: str
+    requests: int
+    call: Callable[["Worker"], Awaitable]
+
+
+class Worker:
+    """Клиент одного пользователя со своими cookie."""
+
+    def __init__(self, client, user_id: int, username: str, dataset: Dataset, rng: random.Random):
+        self.client = client
+        self.user_id = user_id
+        self.username = username
+        self.dataset = dataset
+        self.rng = rng
+
+    def course_id(self) -> int:
+        return self.rng.randint(1, self.dataset.courses)
+
+
+def _percentile(sorted_values: list[float], percent: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, int(round(percent / 100 * len(sorted_values))) - 1)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+async def seed(session, dataset: Dataset, rng: random.Random) -> list[tuple[int, str]]:
+    from sqlalchemy import insert
+    from server.app import models
+    from server.app.security import hash_password
+
+    hashed = hash_password(PASSWORD)
+    await session.execute(insert(models.User), [
+        {"username": f"user{i}", "email": f"user{i}@example.com", "hashed_password": hashed}
+        for i in range(1, dataset.users + 1)
+    ])
+    await session.execute(insert(models.Category), [
+        {"name": f"Category {i}"} for i in range(1, dataset.categories + 1)
+    ])
+    await session.execute(insert(models.Course), [
+        {
+            "title": f"Course {i} {rng.choice(['Python', 'SQL', 'Go', 'Design', 'Math'])}",
+            "format": "online",
+            "description": f"Benchmark course number {i}",
+            "price": rng.randint(0, 500),
+            "duration_hours": rng.randint(1, 100),
+            "owner_id": rng.randint(1, dataset.users),
+            "category_id": rng.randint(1, dataset.categories),
+        }
+        for i in range(1, dataset.courses + 1)
+    ])
+    await session.execute(insert(models.Comment), [
+        {
+            "user_id": rng.randint(1, dataset.users),
+            "course_id": course_id,
+            "content": "benchmark comment",
+            "rating": rng.randint(1, 5),
+        }
+        for course_id in range(1, dataset.courses + 1)
+        for _ in range(dataset.comments_per_course)
+    ])
+    purchases = {
+        (user_id, rng.randint(1, dataset.courses))
+        for user_id in range(1, dataset.users + 1)
+        for _ in range(dataset.purchases_per_user)
+    }
+    await session.execute(insert(models.BoughtCourse), [
+        {"user_id": user_id, "course_id": course_id} for user_id, course_id in purchases
+    ])
+    await session.commit()
+
+    from server.app.crud import course as crud_courses
+    await crud_courses.recompute_ratings(session)
+    return [(i, f"user{i}") for i in range(1, dataset.users + 1)]
+
+
+def default_scenarios(requests: int) -> list[Scenario]:
+    async def login(w: Worker):
+        return await w.client.post("/auth/login", data={"username": w.username, "password": PASSWORD})
+
+    async def list_courses(w: Worker):
+        return await w.client.get("/courses/", params={"limit": 20})
+
+    async def filter_courses(w: Worker):
+        return await w.client.get("/courses/", params={
+            "category_id": w.rng.randint(1, w.dataset.categories), "sort": "price", "limit": 20,
+        })
+
+    async def search_courses(w: Worker):
+        return await w.client.get("/courses/", params={"search": w.rng.choice(["pyth", "sql", "course 1"])})
+
+    async def read_course(w: Worker):
+        return await w.client.get(f"/courses/{w.course_id()}")
+
+    async def recommendations(w: Worker):
+        return await w.client.get(f"/courses/{w.course_id()}/recommendations")
+
+    async def categories(w: Worker):
+        return await w.client.get("/categories/")
+
+    async def course_comments(w: Worker):
+        return await w.client.get(f"/comments/course/{w.course_id()}", params={"limit": 20})
+
+    async def create_comment(w: Worker):
+        return await w.client.post("/comments/", json={
+            "user_id": w.user_id, "course_id": w.course_id(), "content": "bench", "rating": w.rng.randint(1, 5),
+        })
+
+    async def me(w: Worker):
+        return await w.client.get("/users/me")
+
+    async def bought_courses(w: Worker):
+        return await w.client.get("/bought-courses/user/me")
+
+    async def checkout(w: Worker):
+        for course_id in w.rng.sample(range(1, w.dataset.courses + 1), k=min(3, w.dataset.courses)):
+            await w.client.post("/cart/", json={"course_id": course_id})
+        return await w.client.post("/cart/checkout")
+
+    return [
+        Scenario("POST /auth/login", max(1, requests // 10), login),
+        Scenario("GET /courses/", requests, list_courses),
+        Scenario("GET /courses/?category_id&sort=price", requests, filter_courses),
+        Scenario("GET /courses/?search", requests, search_courses),
+        Scenario("GET /courses/{id}", requests, read_course),
+        Scenario("GET /courses/{id}/recommendations", requests, recommendations),
+        Scenario("GET /categories/", requests, categories),
+        Scenario("GET /comments/course/{id}", requests, course_comments),
+        Scenario("POST /comments/", max(1, requests // 2), create_comment),
+        Scenario("GET /users/me", requests, me),
+        Scenario("GET /bought-courses/user/me", requests, bought_courses),
+        Scenario("POST /cart/checkout", max(1, requests // 4), checkout),
+    ]
+
+
+async def _run_scenario(scenario: Scenario, workers: list[Worker]) -> dict:
+    latencies: list[float] = []
+    errors = 0
+    remaining = scenario.requests
+
+    async def loop(worker: Worker):
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await scenario.call(worker)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(loop(worker) for worker in workers))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(_percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(_percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(_percentile(latencies, 99) * 1000, 3),
+    }
+
+
+async def run_benchmark(
+    dataset: Dataset,
+    concurrency: int = 8,
+    requests: int = 200,
+    seed_value: int = 42,
+) -> dict:
+    """Готовит свежую БД, наполняет её и прогоняет все сценарии."""
+    from httpx import AsyncClient, ASGITransport
+    from server.main import app
+    from server.app.models import Base
+    from server.app.db_helper import db_helper
+    from server.app.recommendations import recommendations
+    from server.app.write_queue import write_queue
+
+    rng = random.Random(seed_value)
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    async with db_helper.session_factory() as session:
+        users = await seed(session, dataset, rng)
+        await recommendations.rebuild(session)
+
+    # 500 считаем ошибкой маршрута, а не падением всего прогона
+    transport = ASGITransport(app=app, raise_app_exceptions=False)
+    clients = [AsyncClient(transport=transport, base_url="http://bench") for _ in range(concurrency)]
+    try:
+        workers = []
+        for client, (user_id, username) in zip(clients, (users[i % len(users)] for i in range(concurrency))):
+            response = await client.post("/auth/login", data={"username": username, "password": PASSWORD})
+            response.raise_for_status()
+            workers.append(Worker(client, user_id, username, dataset, random.Random(rng.random())))
+
+        routes = {}
+        for scenario in default_scenarios(requests):
+            routes[scenario.name] = await _run_scenario(scenario, workers)
+    finally:
+        for client in clients:
+            await client.aclose()
+        await write_queue.stop()
+        await db_helper.engine.dispose()
+
+    return {
+        "dataset": asdict(dataset),
+        "concurrency": concurrency,
+        "requests_per_route": requests,
+        "routes": routes,
+    }
+
+
+def compare(report: dict, baseline: dict, threshold: float) -> list[str]:
+    """Возвращает список регрессий относительно baseline."""
+    regressions = []
+    for name, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(name)
+        if previous is None:
+            continue
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+        if previous["p95_ms"] and current["p95_ms"] > previous["p95_ms"] * (1 + threshold):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current["throughput_rps"] < previous["throughput_rps"] * (1 - threshold):
+            regressions.append(
+                f"{name}: throughput {previous['throughput_rps']} -> {current['throughput_rps']} rps"
+            )
+    return regressions
+
+
+def format_report(report: dict) -> str:
+    lines = [f"{'route':42} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"]
+    for name, stats in report["routes"].items():
+        lines.append(
+            f"{name:42} {stats['throughput_rps']:>9} {stats['p50_ms']:>9} "
+            f"{stats['p95_ms']:>9} {stats['p99_ms']:>9} {stats['errors']:>7}"
+        )
+    return "\n".join(lines)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="In-process API benchmark")
+    parser.add_argument("--users", type=int, default=Dataset.users)
+    parser.add_argument("--categories", type=int, default=Dataset.categories)
+    parser.add_argument("--courses", type=int, default=Dataset.courses)
+    parser.add_argument("--comments-per-course", type=int, default=Dataset.comments_per_course)
+    parser.add_argument("--purchases-per-user", type=int, default=Dataset.purchases_per_user)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="requests per route")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", type=Path, help="write this run's report as JSON")
+    args = parser.parse_args()
+
+    # всегда свежая временная БД: прогон пересоздаёт схему, и DB_URL
+    # из окружения указал бы на рабочую базу
+    workdir = tempfile.mkdtemp(prefix="api-bench-")
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ.pop("DB_REPLICA_URL", None)
+    os.environ["STATIC_DIR"] = f"{workdir}/static"
+
+    dataset = Dataset(
+        users=args.users,
+        categories=args.categories,
+        courses=args.courses,
+        comments_per_course=args.comments_per_course,
+        purchases_per_user=args.purchases_per_user,
+    )
+    report = asyncio.run(run_benchmark(dataset, args.concurrency, args.requests))
+    print(format_report(report))
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.update_baseline or not args.baseline.exists():
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"Baseline written to {args.baseline}")
+        return 0
+
+    baseline = json.loads(args.baseline.read_text())
+    if baseline.get("dataset") != report["dataset"] or baseline.get("concurrency") != report["concurrency"]:
+        print("Baseline was recorded with different dataset/concurrency; run with --update-baseline")
+        return 1
+    regressions = compare(report, baseline, args.threshold)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
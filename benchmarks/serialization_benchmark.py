@@ -0,0 +1,123 @@
+# benchmarks/serialization_benchmark.py
+# Стоимость сериализации одного элемента списка: путь FastAPI по умолчанию
+# (response_model + json) против server.app.serialization (TypeAdapter + orjson).
+#
+#   python -m benchmarks.serialization_benchmark
+#   python -m benchmarks.serialization_benchmark --sizes 100 1000 10000 --rounds 50
+#
+# ORM-объекты создаются в памяти, поэтому БД в замер не входит.
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+ROUTES = ("courses", "bought-courses")
+
+
+def build_app(rows_by_size: dict):
+    from fastapi import FastAPI
+    from server.app import schemas
+    from server.app.serialization import BOUGHT_COURSE_LIST, COURSE_LIST, json_response
+
+    app = FastAPI()
+
+    @app.get("/default/courses/{size}", response_model=list[schemas.Course])
+    async def default_courses(size: int):
+        return rows_by_size[size]["courses"]
+
+    @app.get("/fast/courses/{size}", response_model=list[schemas.Course])
+    async def fast_courses(size: int):
+        return json_response(COURSE_LIST, rows_by_size[size]["courses"])
+
+    @app.get("/default/bought-courses/{size}", response_model=list[schemas.BoughtCourse])
+    async def default_bought_courses(size: int):
+        # прежний обработчик: модели собираются вручную и валидируются повторно
+        return [
+            schemas.BoughtCourse(
+                id=bc.id,
+                user_id=bc.user_id,
+                course_id=bc.course_id,
+                course=schemas.CourseShort(
+                    id=bc.course.id, title=bc.course.title,
+                    price=bc.course.price, image_url=bc.course.image_url,
+                ),
+            )
+            for bc in rows_by_size[size]["bought-courses"]
+        ]
+
+    @app.get("/fast/bought-courses/{size}", response_model=list[schemas.BoughtCourse])
+    async def fast_bought_courses(size: int):
+        return json_response(BOUGHT_COURSE_LIST, rows_by_size[size]["bought-courses"])
+
+    return app
+
+
+def make_rows(size: int) -> dict:
+    from server.app import models
+
+    courses = [
+        models.Course(
+            id=i, title=f"Course {i}", format="online", description="x" * 200, price=i % 500,
+            duration_hours=10, rating=4.5, rating_count=12, owner_id=1, category_id=1 + i % 10,
+            image_url=f"/static/images/courses/{i}.png",
+        )
+        for i in range(1, size + 1)
+    ]
+    bought = [
+        models.BoughtCourse(id=course.id, user_id=1, course_id=course.id, course=course)
+        for course in courses
+    ]
+    return {"courses": courses, "bought-courses": bought}
+
+
+async def run(sizes: list[int], rounds: int) -> list[dict]:
+    from httpx import AsyncClient, ASGITransport
+
+    rows_by_size = {size: make_rows(size) for size in [0, *sizes]}
+    app = build_app(rows_by_size)
+    results = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+
+        async def timed(path: str) -> float:
+            await client.get(path)  # прогрев
+            started = time.perf_counter()
+            for _ in range(rounds):
+                response = await client.get(path)
+                response.raise_for_status()
+            return (time.perf_counter() - started) / rounds
+
+        for route in ROUTES:
+            for mode in ("default", "fast"):
+                # время пустого списка — накладные расходы запроса, их вычитаем
+                overhead = await timed(f"/{mode}/{route}/0")
+                for size in sizes:
+                    elapsed = await timed(f"/{mode}/{route}/{size}")
+                    results.append({
+                        "route": route,
+                        "mode": mode,
+                        "items": size,
+                        "request_ms": round(elapsed * 1000, 3),
+                        "per_item_us": round((elapsed - overhead) / size * 1e6, 2),
+                    })
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="List serialization microbenchmark")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000])
+    parser.add_argument("--rounds", type=int, default=30)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="serialization-bench-")
+    os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{workdir}/bench.db")
+    os.environ.setdefault("STATIC_DIR", f"{workdir}/static")
+
+    results = asyncio.run(run(args.sizes, args.rounds))
+    print(f"{'route':16} {'mode':8} {'items':>6} {'request ms':>11} {'us/item':>9}")
+    for row in results:
+        print(f"{row['route']:16} {row['mode']:8} {row['items']:>6} {row['request_ms']:>11} {row['per_item_us']:>9}")
+
+
+if __name__ == "__main__":
+    main()
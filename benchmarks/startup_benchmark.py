@@ -0,0 +1,138 @@
+# benchmarks/startup_benchmark.py
+# Холодный старт воркера: время импорта server.main и время от запуска
+# процесса до первого успешного запроса.
+#
+#   python -m benchmarks.startup_benchmark
+#   python -m benchmarks.startup_benchmark --runs 10 --path /categories/
+#
+# Каждый прогон — свежий интерпретатор на копии server/shop.db, доведённой
+# до головы миграций. Сервер запускается через фабрику (python -m server.main),
+# поэтому в «до первого ответа» входят импорт, lifespan (проверка схемы,
+# прогрев пула и выражений) и сам запрос. Отдельно видно, сколько стоит
+# первый запрос после готовности и шаги старта из /health/startup.
+import argparse
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+IMPORT_SNIPPET = (
+    "import time; started = time.perf_counter(); import server.main; "
+    "print(time.perf_counter() - started)"
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(source: Path, workdir: Path, env: dict) -> None:
+    shutil.copy(source, workdir / "shop.db")
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "-c", str(ROOT / "server" / "alembic.ini"), "upgrade", "head"],
+        cwd=workdir, env=env, check=True, capture_output=True,
+    )
+
+
+def measure_import(env: dict) -> float:
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_first_request(env: dict, path: str, timeout: float) -> dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "server.main", "--port", str(port)],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        with httpx.Client(base_url=url, timeout=timeout) as client:
+            # сокет открывается только после lifespan, до этого — отказ в соединении
+            while True:
+                if server.poll() is not None:
+                    raise RuntimeError(f"server exited with code {server.returncode}")
+                if time.perf_counter() - started > timeout:
+                    raise TimeoutError(f"no successful response from {path} in {timeout} s")
+                try:
+                    request_started = time.perf_counter()
+                    response = client.get(path)
+                except httpx.TransportError:
+                    time.sleep(0.005)
+                    continue
+                if response.status_code == 200:
+                    break
+            first_request = time.perf_counter() - request_started
+            to_first_response = time.perf_counter() - started
+
+            request_started = time.perf_counter()
+            client.get(path).raise_for_status()
+            second_request = time.perf_counter() - request_started
+            steps = client.get("/health/startup").json()["steps"]
+    finally:
+        server.terminate()
+        server.wait(timeout=10)
+    return {
+        "to_first_response": to_first_response,
+        "first_request": first_request,
+        "second_request": second_request,
+        "steps": steps,
+    }
+
+
+def _ms(values: list[float]) -> str:
+    return f"{statistics.median(values) * 1000:9.1f} {min(values) * 1000:9.1f} {max(values) * 1000:9.1f}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Worker import time and time to first successful request")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--path", default="/courses/", help="запрос, которого ждём после старта")
+    parser.add_argument("--db", type=Path, default=ROOT / "server" / "shop.db", help="исходная SQLite-база")
+    parser.add_argument("--timeout", type=float, default=60)
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="startup-bench-"))
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join(filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])),
+        "DB_URL": f"sqlite+aiosqlite:///{workdir}/shop.db",
+        "STATIC_DIR": str(workdir / "static"),
+        "RECOMMENDATIONS_PATH": str(workdir / "recommendations.json"),
+        "PURCHASE_COUNTER_MARKER_PATH": str(workdir / "purchase_counters.running"),
+    }
+    try:
+        prepare_database(args.db, workdir, env)
+        imports = [measure_import(env) for _ in range(args.runs)]
+        starts = [measure_first_request(env, args.path, args.timeout) for _ in range(args.runs)]
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'':28} {'median ms':>9} {'min ms':>9} {'max ms':>9}")
+    print(f"{'import server.main':28} {_ms(imports)}")
+    for key, title in (
+        ("to_first_response", f"spawn -> first 200 {args.path}"),
+        ("first_request", "first request after ready"),
+        ("second_request", "second request"),
+    ):
+        print(f"{title:28} {_ms([run[key] for run in starts])}")
+    print("startup steps (median ms):")
+    for step in starts[0]["steps"]:
+        print(f"  {step:26} {statistics.median(run['steps'][step] for run in starts):9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/write_queue_benchmark.py
+# Пропускная способность записи: коммит на каждую операцию против очереди
+# группового коммита (server.app.write_queue) при разной конкуренции.
+#
+#   python -m benchmarks.write_queue_benchmark
+#   python -m benchmarks.write_queue_benchmark --writes 2000 --concurrency 1 16 64
+#
+# Операция — создание комментария (INSERT + UPDATE агрегатов курса).
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+
+
+async def run(writes: int, levels: list[int]) -> list[dict]:
+    from server.app import models, schemas
+    from server.app.crud import comment as crud_comments
+    from server.app.db_helper import db_helper
+    from server.app.write_queue import write_queue
+
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(models.Base.metadata.create_all)
+    async with db_helper.session_factory() as session:
+        session.add_all([
+            models.User(username="writer", email="writer@example.com", hashed_password="x"),
+            models.Category(name="General"),
+        ])
+        await session.flush()
+        session.add(models.Course(title="Course", format="online", description="-", price=1,
+                                  duration_hours=1, owner_id=1, category_id=1))
+        await session.commit()
+    data = schemas.CommentCreate(course_id=1, user_id=1, content="-", rating=4)
+
+    async def direct():
+        async with db_helper.session_factory() as session:
+            await crud_comments.create_comment(session, data)
+
+    async def queued():
+        await write_queue.run(crud_comments.create_comment, data)
+
+    results = []
+    for concurrency in levels:
+        for mode, write in (("direct", direct), ("queue", queued)):
+            semaphore = asyncio.Semaphore(concurrency)
+            errors = 0
+            batches_before, writes_before = write_queue.batches, write_queue.writes
+
+            async def one():
+                nonlocal errors
+                async with semaphore:
+                    try:
+                        await write()
+                    except Exception:
+                        errors += 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(writes)))
+            elapsed = time.perf_counter() - started
+            batches = write_queue.batches - batches_before
+            results.append({
+                "mode": mode,
+                "concurrency": concurrency,
+                "writes_per_s": round(writes / elapsed),
+                "avg_batch": round((write_queue.writes - writes_before) / batches, 1) if batches else 1,
+                "errors": errors,
+            })
+    await write_queue.stop()
+    await db_helper.dispose()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Group commit write throughput")
+    parser.add_argument("--writes", type=int, default=600)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    # всегда свежая временная БД: прогон создаёт схему и пишет в неё, а DB_URL
+    # из окружения указал бы на рабочую базу
+    workdir = tempfile.mkdtemp(prefix="write-queue-bench-")
+    os.environ["DB_URL"] = f"sqlite+aiosqlite:///{workdir}/bench.db"
+    os.environ.pop("DB_REPLICA_URL", None)
+    os.environ["STATIC_DIR"] = f"{workdir}/static"
+
+    results = asyncio.run(run(args.writes, args.concurrency))
+    print(f"{'mode':8} {'conc':>5} {'writes/s':>9} {'avg batch':>10} {'errors':>7}")
+    for row in results:
+        print(f"{row['mode']:8} {row['concurrency']:>5} {row['writes_per_s']:>9} {row['avg_batch']:>10} {row['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,6 @@
-import api from "./axios";
+import api, { refreshSession } from "./axios";
+
+export { refreshSession };
 
 export const login = async (username, password) => {
   const formData = new URLSearchParams();
@@ -5,4 +5,30 @@ const api = axios.create({
   withCredentials: true, 
 });
 
+// Один общий запрос на продление, даже если 401 пришёл сразу нескольким запросам
+let refreshing = null;
+
+export const refreshSession = () => {
+  if (!refreshing) {
+    refreshing = api.post("/auth/refresh").finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
+api.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const original = error.config;
+    const isAuthRequest = original?.url?.startsWith("/auth/");
+    if (error.response?.status !== 401 || !original || original._retried || isAuthRequest) {
+      return Promise.reject(error);
+    }
+    original._retried = true;
+    await refreshSession();
+    return api(original);
+  }
+);
+
 export default api;
@@ -1,9 +1,8 @@
-import axios from "../api/axios";
+import { refreshSession } from "../api/auth";
 
+// Продлевает сессию по refresh-cookie без повторного ввода пароля.
 const useRefreshToken = () => {
-  return (
-    <div>useRefreshToken</div>
-  )
-}
+  return refreshSession;
+};
 
-export default useRefreshToken
\ No newline at end of file
+export default useRefreshToken;
@@ -0,0 +1,68 @@
+"""add courses full-text search index
+
+Revision ID: 20fff2712381
+Revises: 8189800a3336
+Create Date: 2026-10-18 12:04:31.518220
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '20fff2712381'
+down_revision: Union[str, Sequence[str], None] = '8189800a3336'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(
+        """
+        CREATE VIRTUAL TABLE courses_fts USING fts5(
+            title, description,
+            content='courses', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """
+    )
+    op.execute("INSERT INTO courses_fts(courses_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')")
+    op.execute(
+        """
+        CREATE TRIGGER courses_fts_ai AFTER INSERT ON courses BEGIN
+            INSERT INTO courses_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER courses_fts_ad AFTER DELETE ON courses BEGIN
+            INSERT INTO courses_fts(courses_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+        END
+        """
+    )
+    op.execute(
+        """
+        CREATE TRIGGER courses_fts_au AFTER UPDATE OF title, description ON courses BEGIN
+            INSERT INTO courses_fts(courses_fts, rowid, title, description)
+            VALUES ('delete', old.id, old.title, old.description);
+            INSERT INTO courses_fts(rowid, title, description)
+            VALUES (new.id, new.title, new.description);
+        END
+        """
+    )
+    # заполняем индекс уже существующими курсами
+    op.execute("INSERT INTO courses_fts(courses_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS courses_fts_au")
+    op.execute("DROP TRIGGER IF EXISTS courses_fts_ad")
+    op.execute("DROP TRIGGER IF EXISTS courses_fts_ai")
+    op.execute("DROP TABLE IF EXISTS courses_fts")
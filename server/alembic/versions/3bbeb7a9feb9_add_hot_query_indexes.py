@@ -0,0 +1,59 @@
+"""add indexes for hot queries
+
+Revision ID: 3bbeb7a9feb9
+Revises: c97815d76e0e
+Create Date: 2026-10-18 14:02:45.118903
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3bbeb7a9feb9'
+down_revision: Union[str, Sequence[str], None] = 'c97815d76e0e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_courses_owner_id', 'courses', ['owner_id'], unique=False)
+    op.create_index('ix_courses_category_id_price', 'courses', ['category_id', 'price'], unique=False)
+    op.create_index('ix_courses_price', 'courses', ['price'], unique=False)
+    op.create_index('ix_courses_rating', 'courses', ['rating'], unique=False)
+
+    # перед уникальным индексом убираем повторные покупки одного курса
+    op.execute(
+        """
+        DELETE FROM bought_courses WHERE id NOT IN (
+            SELECT MIN(id) FROM bought_courses GROUP BY user_id, course_id
+        )
+        """
+    )
+    op.execute(
+        """
+        UPDATE courses SET purchased_count = (
+            SELECT COUNT(*) FROM bought_courses WHERE bought_courses.course_id = courses.id
+        )
+        """
+    )
+    op.create_index('uq_bought_courses_user_course', 'bought_courses', ['user_id', 'course_id'], unique=True)
+    op.create_index('ix_bought_courses_course_id', 'bought_courses', ['course_id'], unique=False)
+
+    op.create_index('ix_comments_course_id_rating', 'comments', ['course_id', 'rating'], unique=False)
+    op.create_index('ix_comments_user_id', 'comments', ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_comments_user_id', table_name='comments')
+    op.drop_index('ix_comments_course_id_rating', table_name='comments')
+    op.drop_index('ix_bought_courses_course_id', table_name='bought_courses')
+    op.drop_index('uq_bought_courses_user_course', table_name='bought_courses')
+    op.drop_index('ix_courses_rating', table_name='courses')
+    op.drop_index('ix_courses_price', table_name='courses')
+    op.drop_index('ix_courses_category_id_price', table_name='courses')
+    op.drop_index('ix_courses_owner_id', table_name='courses')
@@ -0,0 +1,28 @@
+"""add courses image_url index
+
+Revision ID: a41f6c2d9e07
+Revises: 5d2e8c41a7f3
+Create Date: 2026-10-18 21:14:37.402915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a41f6c2d9e07'
+down_revision: Union[str, Sequence[str], None] = '5d2e8c41a7f3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_courses_image_url', 'courses', ['image_url'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_courses_image_url', table_name='courses')
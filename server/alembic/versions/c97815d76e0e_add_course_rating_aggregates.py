@@ -0,0 +1,39 @@
+"""add course rating aggregates
+
+Revision ID: c97815d76e0e
+Revises: 20fff2712381
+Create Date: 2026-10-18 13:21:07.402119
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c97815d76e0e'
+down_revision: Union[str, Sequence[str], None] = '20fff2712381'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('courses', sa.Column('rating_sum', sa.Float(), server_default='0', nullable=False))
+    op.add_column('courses', sa.Column('rating_count', sa.Integer(), server_default='0', nullable=False))
+    # рейтинг больше не задаётся клиентом: считаем его по комментариям
+    op.execute(
+        """
+        UPDATE courses SET
+            rating_sum = COALESCE((SELECT SUM(rating) FROM comments WHERE comments.course_id = courses.id), 0),
+            rating_count = (SELECT COUNT(*) FROM comments WHERE comments.course_id = courses.id),
+            rating = COALESCE((SELECT AVG(rating) FROM comments WHERE comments.course_id = courses.id), 0)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('courses', 'rating_count')
+    op.drop_column('courses', 'rating_sum')
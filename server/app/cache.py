@@ -0,0 +1,103 @@
+# server/app/cache.py
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+from server.app.config import settings
+
+
+class TTLCache:
+    """Ограниченный по размеру LRU-кэш с временем жизни записей.
+
+    Рассчитан на работу внутри одного event loop, поэтому без блокировок.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]) -> int:
+        keys = [key for key in self._data if predicate(key)]
+        for key in keys:
+            del self._data[key]
+        return len(keys)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+# Пользователи, прошедшие аутентификацию: ключ (user_id, exp токена)
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+
+def invalidate_user(user_id: int) -> None:
+    user_cache.invalidate(lambda key: key[0] == user_id)
+
+
+# Подсчёты фасетов каталога; в ключ входит версия "courses",
+# поэтому запись курса делает старые ключи недостижимыми
+facet_cache = TTLCache(maxsize=settings.facet_cache_size, ttl=settings.facet_cache_ttl)
+
+
+class VersionRegistry:
+    """Счётчики версий ресурсов каталога для ETag.
+
+    Версии живут в памяти процесса, поэтому в ETag входит boot_id:
+    после перезапуска все старые ETag становятся недействительными.
+    """
+
+    def __init__(self):
+        self.boot_id = uuid.uuid4().hex[:8]
+        self._versions: dict[Hashable, int] = {}
+
+    def get(self, key: Hashable) -> int:
+        return self._versions.get(key, 0)
+
+    def bump(self, *keys: Hashable) -> None:
+        for key in keys:
+            self._versions[key] = self._versions.get(key, 0) + 1
+
+    def etag(self, key: Hashable) -> str:
+        name = "-".join(str(part) for part in key) if isinstance(key, tuple) else str(key)
+        return f'W/"{name}-{self.boot_id}-{self.get(key)}"'
+
+
+catalog_versions = VersionRegistry()
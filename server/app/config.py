@@ -6,4 +6,72 @@ class Setting(BaseSettings):
     db_url: str = "sqlite+aiosqlite:///./shop.db"
     db_echo: bool = False
 
+    # пул соединений (применяется только к файловым БД)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # файловые SQLite-БД: сколько секунд соединение ждёт чужую блокировку
+    db_busy_timeout: float = 5
+    # реплика только для чтения (например, sqlite+aiosqlite:///file:replica.db?mode=ro&uri=true);
+    # после записи клиент столько секунд читает из primary
+    db_replica_url: str | None = None
+    db_replica_sticky_seconds: int = 5
+    # размер кэша скомпилированных SQL-выражений
+    db_statement_cache_size: int = 500
+    # при старте сверять ревизию схемы с головой миграций alembic
+    db_check_schema_revision: bool = True
+
+    # кэш аутентифицированных пользователей
+    user_cache_size: int = 10000
+    user_cache_ttl: float = 60
+
+    # refresh-токены: срок жизни, период удаления просроченных и сколько
+    # секунд только что погашенный токен ещё принимается (параллельные вкладки)
+    refresh_token_expire_days: int = 14
+    refresh_token_sweep_interval: float = 3600
+    refresh_token_reuse_grace_seconds: float = 10
+
+    # bcrypt выполняется в отдельных процессах
+    password_hash_workers: int = 2
+    password_hash_max_concurrency: int = 4
+
+    # статика и загрузка картинок курсов
+    static_dir: Path = BASE_DIR / "static"
+    max_image_upload_bytes: int = 5 * 1024 * 1024
+    allowed_image_types: set[str] = {"image/jpeg", "image/png", "image/webp", "image/gif"}
+
+    # фасеты в списке курсов: границы ценовых корзин и кэш подсчётов
+    facet_price_bounds: list[float] = [0, 50, 100, 200, 500]
+    facet_cache_size: int = 1000
+    facet_cache_ttl: float = 300
+
+    # массовый импорт курсов
+    import_batch_size: int = 1000
+    import_max_errors: int = 1000
+    import_max_line_bytes: int = 64 * 1024
+
+    # рекомендации «с этим курсом покупают»: снимок индекса на диске
+    recommendations_top_n: int = 20
+    recommendations_path: Path = BASE_DIR / "recommendations.json"
+    # сколько id до watermark перепроверять при догонке после загрузки снимка
+    recommendations_catch_up_window: int = 1000
+
+    # групповой коммит: сколько операций записи в одной транзакции и сколько ждать новых
+    write_queue_max_batch: int = 64
+    write_queue_max_wait: float = 0.002
+
+    # отложенная запись purchased_count: период сброса и префикс маркеров работающих процессов (<path>.<pid>)
+    purchase_counter_flush_interval: float = 2
+    purchase_counter_marker_path: Path = BASE_DIR / "purchase_counters.running"
+
+    # метрики Prometheus на /metrics
+    metrics_enabled: bool = True
+
+    # отладка числа SQL-запросов на HTTP-запрос (пишет в лог нарушителей)
+    query_debug: bool = False
+    query_budget: int = 10
+    query_repeat_threshold: int = 3
+
 settings = Setting()
@@ -0,0 +1,201 @@
+# server/app/counters.py
+# Отложенная запись горячих счётчиков (courses.purchased_count).
+#
+# Покупка не трогает строку курса: приращение копится в памяти и раз в
+# flush_interval уходит в БД одним executemany
+#   UPDATE courses SET purchased_count = purchased_count + :delta WHERE id = :row_id
+# Так распродажа одного курса не выстраивает покупки в очередь за
+# блокировкой записи SQLite и не теряет приращения на read-modify-write.
+#
+# Сброс и сверка идут через очередь группового коммита, как и прочие записи.
+#
+# Пока процесс работает, рядом лежит его файл-маркер <marker_path>.<pid>.
+# Штатная остановка сбрасывает остаток и удаляет свой маркер. Маркер
+# процесса, которого уже нет, значит, что тот упал с несброшенными
+# приращениями, и при старте счётчики пересчитываются по bought_courses.
+# Пересчёт откладывается, пока живы другие процессы: их буферы ещё не
+# в БД, и пересчёт поверх них посчитал бы покупки дважды.
+#
+# purchased_count не входит в ответы API, поэтому сброс не меняет версию
+# каталога для ETag.
+import asyncio
+import logging
+import os
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.app import models
+from server.app.config import settings
+from server.app.write_queue import WriteQueue
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindCounter:
+    """Приращения счётчика по id строки, сбрасываемые пачкой.
+
+    Рассчитан на работу внутри одного event loop, поэтому без блокировок.
+    """
+
+    def __init__(self, model: type[models.Base], column: str, flush_interval: float, marker_path: Path):
+        self.table = model.__table__
+        self.column = column
+        self.flush_interval = flush_interval
+        self.marker_path = marker_path
+        self._pending: dict[int, int] = defaultdict(int)
+        self._task: asyncio.Task | None = None
+        self.flushes = 0
+        self.flushed_rows = 0
+
+    def add(self, row_id: int, delta: int = 1) -> None:
+        self._pending[row_id] += delta
+
+    def pending(self) -> dict[int, int]:
+        return {row_id: delta for row_id, delta in self._pending.items() if delta}
+
+    def reset(self) -> None:
+        self._pending.clear()
+
+    async def _write(self, session: AsyncSession, batch: list[tuple[int, int]]) -> None:
+        column = self.table.c[self.column]
+        stmt = (
+            update(self.table)
+            .where(self.table.c.id == bindparam("row_id"))
+            .values({self.column: column + bindparam("delta")})
+        )
+        await session.execute(stmt, [{"row_id": row_id, "delta": delta} for row_id, delta in batch])
+        await session.commit()
+
+    async def flush(self, writer: WriteQueue) -> int:
+        """Записывает накопленное одним UPDATE через writer.
+
+        Если операция или COMMIT её пачки не удались, приращения
+        возвращаются в буфер и уйдут со следующим сбросом.
+        """
+        batch = sorted(self.pending().items())
+        self._pending = defaultdict(int)
+        if not batch:
+            return 0
+        try:
+            await writer.run(self._write, batch)
+        except BaseException:
+            for row_id, delta in batch:
+                self._pending[row_id] += delta
+            raise
+        self.flushes += 1
+        self.flushed_rows += len(batch)
+        return len(batch)
+
+    # ---------- жизненный цикл ----------
+
+    @property
+    def own_marker(self) -> Path:
+        return self.marker_path.with_name(f"{self.marker_path.name}.{os.getpid()}")
+
+    def _markers(self) -> tuple[list[Path], bool]:
+        """Маркеры упавших процессов и признак, что жив кто-то ещё."""
+        stale, others_alive = [], False
+        # общий маркер из версий до маркеров по PID
+        if self.marker_path.exists():
+            stale.append(self.marker_path)
+        for marker in self.marker_path.parent.glob(f"{self.marker_path.name}.*"):
+            pid = marker.suffix[1:]
+            if not pid.isdigit():
+                continue
+            # свой PID в маркере — прошлый запуск в том же контейнере
+            if int(pid) != os.getpid() and _process_alive(int(pid)):
+                others_alive = True
+            else:
+                stale.append(marker)
+        return stale, others_alive
+
+    async def start(self, writer: WriteQueue) -> None:
+        """Старт процесса: после падения — сверка с БД, затем фоновый сброс."""
+        stale, others_alive = self._markers()
+        if stale and others_alive:
+            logger.warning("Unclean shutdown detected, purchased_count reconciliation deferred: other processes run")
+        elif stale:
+            fixed = await writer.run(reconcile_purchased_counts)
+            logger.warning("Unclean shutdown detected, reconciled purchased_count for %d courses", fixed)
+            for marker in stale:
+                marker.unlink(missing_ok=True)
+        self.own_marker.write_text("running\n")
+        self._task = asyncio.create_task(self._flush_loop(writer))
+
+    async def stop(self, writer: WriteQueue) -> None:
+        """Останавливает фоновый сброс и сбрасывает остаток; writer должен ещё работать."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush(writer)
+        self.own_marker.unlink(missing_ok=True)
+
+    async def _flush_loop(self, writer: WriteQueue) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                # отмена при остановке не должна оборвать сброс, уже стоящий в очереди
+                await asyncio.shield(self.flush(writer))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Failed to flush %s counters", self.column)
+
+    def stats(self) -> dict:
+        pending = self.pending()
+        return {
+            "running": self._task is not None,
+            "pending_rows": len(pending),
+            "pending_total": sum(pending.values()),
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+        }
+
+
+async def reconcile_purchased_counts(session: AsyncSession) -> int:
+    """Приводит purchased_count к числу строк bought_courses; возвращает число исправленных курсов.
+
+    Запускать, когда в других процессах нет несброшенных приращений.
+    """
+    actual = (
+        select(func.count())
+        .where(models.BoughtCourse.course_id == models.Course.id)
+        .scalar_subquery()
+    )
+    result = await session.execute(
+        update(models.Course)
+        .where(models.Course.purchased_count != actual)
+        .values(purchased_count=actual)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    return result.rowcount
+
+
+def _process_alive(pid: int) -> bool:
+    if sys.platform == "win32":
+        # os.kill на Windows завершает процесс; считаем чужой маркер живым
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+purchase_counters = WriteBehindCounter(
+    models.Course,
+    "purchased_count",
+    flush_interval=settings.purchase_counter_flush_interval,
+    marker_path=settings.purchase_counter_marker_path,
+)
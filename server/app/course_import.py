@@ -0,0 +1,153 @@
+# server/app/course_import.py
+# Потоковый импорт курсов из NDJSON или CSV.
+import csv
+import json
+from typing import AsyncIterator
+
+from fastapi import HTTPException, status
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.app import models, schemas
+from server.app.cache import catalog_versions
+from server.app.crud import course as crud_courses
+from server.app.write_queue import WriteQueue, after_commit
+
+NDJSON_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl"}
+CSV_TYPES = {"text/csv"}
+
+
+async def iter_lines(chunks: AsyncIterator[bytes], max_line_bytes: int) -> AsyncIterator[str]:
+    """Режет поток байтов на строки, не держа в памяти больше одной строки."""
+    buffer = bytearray()
+    async for chunk in chunks:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", start)) != -1:
+            yield buffer[start:end].rstrip(b"\r").decode("utf-8", errors="replace")
+            start = end + 1
+        del buffer[:start]
+        if len(buffer) > max_line_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Line is longer than {max_line_bytes} bytes",
+            )
+    if buffer:
+        yield buffer.rstrip(b"\r").decode("utf-8", errors="replace")
+
+
+async def iter_ndjson_rows(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | str]]:
+    """(номер строки, объект) или (номер строки, текст ошибки)."""
+    line_no = 0
+    async for line in lines:
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_no, f"Invalid JSON: {exc}"
+            continue
+        yield line_no, row if isinstance(row, dict) else "Row must be a JSON object"
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[tuple[int, dict | str]]:
+    """Первая строка — заголовок. Поля в кавычках могут занимать несколько строк."""
+    header = None
+    line_no = 0
+    record: list[str] = []
+    record_line = 0
+    async for line in lines:
+        line_no += 1
+        if not record:
+            record_line = line_no
+        record.append(line)
+        text = "\n".join(record)
+        # нечётное число кавычек — запись продолжается на следующей строке
+        if text.count('"') % 2:
+            continue
+        record = []
+        if not text.strip():
+            continue
+        values = next(csv.reader([text]))
+        if header is None:
+            header = [name.strip() for name in values]
+            continue
+        if len(values) != len(header):
+            yield record_line, f"Expected {len(header)} columns, got {len(values)}"
+            continue
+        yield record_line, dict(zip(header, values))
+    if record:
+        yield record_line, "Unterminated quoted field"
+
+
+def _format_errors(exc: ValidationError) -> list[str]:
+    return [
+        f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}"
+        for error in exc.errors(include_url=False)
+    ]
+
+
+async def _insert_batch(session: AsyncSession, rows: list[dict]) -> None:
+    await crud_courses.bulk_insert_courses(session, rows)
+    await session.commit()
+    after_commit(session, catalog_versions.bump, "courses")
+
+
+async def import_courses(
+    session: AsyncSession,
+    writer: WriteQueue,
+    rows: AsyncIterator[tuple[int, dict | str]],
+    owner_id: int,
+    batch_size: int,
+    max_errors: int,
+) -> dict:
+    """Проверяет строки по CourseCreate и вставляет пачками по batch_size.
+
+    Каждая пачка — отдельная операция очереди записи, поэтому при обрыве
+    загрузки уже вставленные пачки остаются в базе. session нужна только
+    для чтения категорий.
+    """
+    category_ids = set((await session.scalars(select(models.Category.id))).all())
+    batch: list[dict] = []
+    imported = failed = 0
+    errors: list[dict] = []
+
+    def reject(line: int, messages: list[str]) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < max_errors:
+            errors.append({"line": line, "errors": messages})
+
+    async def flush() -> None:
+        nonlocal imported
+        await writer.run(_insert_batch, list(batch))
+        imported += len(batch)
+        batch.clear()
+
+    async for line, row in rows:
+        if isinstance(row, str):
+            reject(line, [row])
+            continue
+        try:
+            course = schemas.CourseCreate.model_validate(row)
+        except ValidationError as exc:
+            reject(line, _format_errors(exc))
+            continue
+        if course.category_id not in category_ids:
+            reject(line, [f"category_id: Category {course.category_id} not found"])
+            continue
+        batch.append({**course.model_dump(), "owner_id": owner_id})
+        if len(batch) >= batch_size:
+            await flush()
+
+    if batch:
+        await flush()
+
+    return {
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors),
+    }
@@ -1,30 +1,56 @@
 from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from server.app import models, schemas
+from server.app.pagination import paginate, DEFAULT_PAGE_SIZE
+from server.app.recommendations import recommendations
+from server.app.counters import purchase_counters
+from server.app.write_queue import after_commit
 
 async def create_bought_course(session: AsyncSession, data: schemas.BoughtCourseCreate) -> models.BoughtCourse:
-    db_obj = models.BoughtCourse(**data.dict())
+    # курс нужен в ответе; строку курса только читаем, счётчик не трогаем
+    db_obj = models.BoughtCourse(**data.dict(), course=await session.get(models.Course, data.course_id))
     session.add(db_obj)
-
-    # Увеличиваем счётчик покупок курса
-    stmt_course = select(models.Course).where(models.Course.id == data.course_id)
-    course = (await session.execute(stmt_course)).scalar_one_or_none()
-    if course:
-        course.purchased_count += 1
-
     await session.commit()
-    await session.refresh(db_obj)
+    # purchased_count пишется отложенно, пачкой
+    after_commit(session, purchase_counters.add, db_obj.course_id)
+    after_commit(session, recommendations.add_purchases, [(db_obj.id, db_obj.user_id, db_obj.course_id)])
     return db_obj
 
 async def get_bought_course(session: AsyncSession, bought_id: int):
-    stmt = select(models.BoughtCourse).where(models.BoughtCourse.id == bought_id)
+    stmt = (
+        select(models.BoughtCourse)
+        .where(models.BoughtCourse.id == bought_id)
+        .options(selectinload(models.BoughtCourse.course))
+    )
     result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
-async def get_user_bought_courses(session: AsyncSession, user_id: int):
-    stmt = select(models.BoughtCourse).where(models.BoughtCourse.user_id == user_id)
-    result = await session.execute(stmt)
-    return list(result.scalars().all())
+async def get_user_bought_courses(
+    session: AsyncSession,
+    user_id: int,
+    after: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+):
+    stmt = (
+        select(models.BoughtCourse)
+        .where(models.BoughtCourse.user_id == user_id)
+        .options(selectinload(models.BoughtCourse.course))
+    )
+    return await paginate(session, stmt, [models.BoughtCourse.id], after=after, limit=limit)
+
+def export_user_purchases_stmt(user_id: int):
+    bought, course = models.BoughtCourse, models.Course
+    return (
+        select(
+            bought.id, bought.course_id, course.title, course.format,
+            course.price, course.duration_hours, course.image_url,
+        )
+        .join(course, course.id == bought.course_id)
+        .where(bought.user_id == user_id)
+        .order_by(bought.id)
+    )
+
 
 async def update_bought_course(
     session: AsyncSession,
@@ -32,7 +58,12 @@ async def update_bought_course(
     data: schemas.BoughtCourseUpdate | schemas.BoughtCourseUpdatePartial,
     partial: bool = False
 ):
-    stmt = select(models.BoughtCourse).where(models.BoughtCourse.id == bought_id)
+    # курс нужен в ответе, а лениво догружать его после сессии нельзя
+    stmt = (
+        select(models.BoughtCourse)
+        .where(models.BoughtCourse.id == bought_id)
+        .options(selectinload(models.BoughtCourse.course))
+    )
     result = await session.execute(stmt)
     db_obj = result.scalar_one_or_none()
 
@@ -40,16 +71,29 @@ async def update_bought_course(
         return None
 
     update_data = data.dict(exclude_unset=partial)
+    old_pair = (db_obj.user_id, db_obj.course_id)
 
     for field, value in update_data.items():
         setattr(db_obj, field, value)
 
     await session.commit()
-    await session.refresh(db_obj)
+    if db_obj.course_id != old_pair[1]:
+        await session.refresh(db_obj, ["course"])
+        after_commit(session, purchase_counters.add, old_pair[1], -1)
+        after_commit(session, purchase_counters.add, db_obj.course_id)
+    after_commit(session, recommendations.replace_purchase, old_pair, (db_obj.user_id, db_obj.course_id))
     return db_obj
 
 async def delete_bought_course(session: AsyncSession, bought_id: int) -> bool:
-    stmt = delete(models.BoughtCourse).where(models.BoughtCourse.id == bought_id)
-    result = await session.execute(stmt)
+    stmt = (
+        delete(models.BoughtCourse)
+        .where(models.BoughtCourse.id == bought_id)
+        .returning(models.BoughtCourse.user_id, models.BoughtCourse.course_id)
+    )
+    deleted = (await session.execute(stmt)).first()
     await session.commit()
-    return result.rowcount > 0
\ No newline at end of file
+    if deleted is None:
+        return False
+    after_commit(session, purchase_counters.add, deleted.course_id, -1)
+    after_commit(session, recommendations.remove_purchase, *deleted)
+    return True
\ No newline at end of file
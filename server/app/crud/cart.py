@@ -1,4 +1,4 @@
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, insert, exists
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
 
@@ -9,19 +9,15 @@ async def add_to_cart(
     user_id: int,
     course_id: int,
 ) -> models.Cart:
+    # курс подгружаем до вставки, чтобы не перечитывать позицию после коммита
     cart_item = models.Cart(
         user_id=user_id,
         course_id=course_id,
+        course=await session.get(models.Course, course_id),
     )
     session.add(cart_item)
     await session.commit()
-
-    result = await session.execute(
-        select(models.Cart)
-        .where(models.Cart.id == cart_item.id)
-        .options(selectinload(models.Cart.course))
-    )
-    return result.scalar_one()
+    return cart_item
 
 
 async def get_cart_item(session: AsyncSession, cart_id: int):
@@ -51,3 +47,35 @@ async def clear_user_cart(session: AsyncSession, user_id: int) -> None:
         delete(models.Cart).where(models.Cart.user_id == user_id)
     )
     await session.commit()
+
+
+async def checkout(session: AsyncSession, user_id: int) -> tuple[list[dict], list[int]]:
+    """Покупка всей корзины за фиксированное число запросов.
+
+    Возвращает созданные покупки и id курсов, которые были в корзине.
+    Уже купленные курсы пропускаются. Коммит и приращение purchased_count
+    (через server.app.counters) остаются за вызывающим.
+    """
+    bought = models.BoughtCourse
+    already_bought = exists().where(
+        bought.user_id == models.Cart.user_id,
+        bought.course_id == models.Cart.course_id,
+    )
+    new_purchases = select(models.Cart.user_id, models.Cart.course_id).where(
+        models.Cart.user_id == user_id,
+        ~already_bought,
+    )
+    result = await session.execute(
+        insert(bought)
+        .from_select(["user_id", "course_id"], new_purchases)
+        .returning(bought.id, bought.user_id, bought.course_id)
+    )
+    purchases = [dict(row) for row in result.mappings()]
+
+    result = await session.execute(
+        delete(models.Cart)
+        .where(models.Cart.user_id == user_id)
+        .returning(models.Cart.course_id)
+    )
+    cart_course_ids = list(result.scalars().all())
+    return purchases, cart_course_ids
@@ -2,12 +2,16 @@ from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine import Result
 from server.app import models, schemas
+from server.app.cache import catalog_versions
+from server.app.write_queue import after_commit
+from server.app.pagination import paginate, DEFAULT_PAGE_SIZE
 
 
 async def create_category(session: AsyncSession, data: schemas.CategoryCreate) -> models.Category:
     db_obj = models.Category(name=data.name)
     session.add(db_obj)
     await session.commit()
+    after_commit(session, catalog_versions.bump, "categories")
     await session.refresh(db_obj)
     return db_obj
 
@@ -16,10 +20,13 @@ async def get_category(session: AsyncSession, category_id: int) -> models.Catego
     result: Result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
-async def get_categories(session: AsyncSession) -> list[models.Category]:
-    stmt = select(models.Category).order_by(models.Category.id)
-    result: Result = await session.execute(stmt)
-    return list(result.scalars().all())
+async def get_categories(
+    session: AsyncSession,
+    after: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[list[models.Category], str | None]:
+    stmt = select(models.Category)
+    return await paginate(session, stmt, [models.Category.id], after=after, limit=limit)
 
 async def update_category(
     session: AsyncSession,
@@ -40,11 +47,12 @@ async def update_category(
         setattr(db_obj, field, value)
 
     await session.commit()
-    await session.refresh(db_obj)
+    after_commit(session, catalog_versions.bump, "categories")
     return db_obj
 
 async def delete_category(session: AsyncSession, category_id: int) -> bool:
     stmt = delete(models.Category).where(models.Category.id == category_id)
     result = await session.execute(stmt)
     await session.commit()
+    after_commit(session, catalog_versions.bump, "categories")
     return result.rowcount > 0
@@ -1,17 +1,43 @@
-from sqlalchemy import select, delete
+from sqlalchemy import select, delete, update, case, func
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 from sqlalchemy.engine import Result
 from server.app import models, schemas
+from server.app.cache import catalog_versions
+from server.app.write_queue import after_commit
+from server.app.pagination import paginate, DEFAULT_PAGE_SIZE
+
+
+async def _apply_rating_delta(
+    session: AsyncSession,
+    course_id: int,
+    sum_delta: float,
+    count_delta: int,
+) -> None:
+    """Сдвигает агрегаты рейтинга курса в текущей транзакции."""
+    new_sum = models.Course.rating_sum + sum_delta
+    new_count = models.Course.rating_count + count_delta
+    await session.execute(
+        update(models.Course)
+        .where(models.Course.id == course_id)
+        .values(
+            rating_sum=new_sum,
+            rating_count=new_count,
+            rating=case((new_count > 0, new_sum / new_count), else_=0),
+        )
+    )
 
 
 # CREATE
 async def create_comment(session: AsyncSession, data: schemas.CommentCreate) -> models.Comment:
 
-    db_obj = models.Comment(**data.dict())
+    db_obj = models.Comment(**data.model_dump())
 
     session.add(db_obj)
+    await _apply_rating_delta(session, db_obj.course_id, db_obj.rating, 1)
 
     await session.commit()
+    after_commit(session, catalog_versions.bump, "courses", ("comments", db_obj.course_id))
     await session.refresh(db_obj)
     return db_obj
 
@@ -26,10 +52,28 @@ async def get_comment(session: AsyncSession, comment_id: int):
 
 
 # READ all for course
-async def get_course_comments(session: AsyncSession, course_id: int):
+async def get_course_comments(
+    session: AsyncSession,
+    course_id: int,
+    after: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    with_authors: bool = False,
+):
     stmt = select(models.Comment).where(models.Comment.course_id == course_id)
-    result: Result = await session.execute(stmt)
-    return list(result.scalars().all())
+    if with_authors:
+        # автор — many-to-one, JOIN в том же запросе
+        stmt = stmt.options(joinedload(models.Comment.user))
+    return await paginate(session, stmt, [models.Comment.id], after=after, limit=limit)
+
+
+async def get_rating_distribution(session: AsyncSession, course_id: int) -> dict[int, int]:
+    """Число оценок по каждому значению; идёт по индексу (course_id, rating)."""
+    stmt = (
+        select(models.Comment.rating, func.count())
+        .where(models.Comment.course_id == course_id)
+        .group_by(models.Comment.rating)
+    )
+    return {int(rating): count for rating, count in (await session.execute(stmt)).all()}
 
 
 # UPDATE
@@ -47,18 +91,39 @@ async def update_comment(
         return None
 
     update_data = data.model_dump(exclude_unset=partial)
+    old_course_id, old_rating = db_obj.course_id, db_obj.rating
 
     for field, value in update_data.items():
         setattr(db_obj, field, value)
 
+    if db_obj.course_id == old_course_id:
+        if db_obj.rating != old_rating:
+            await _apply_rating_delta(session, old_course_id, db_obj.rating - old_rating, 0)
+    else:
+        await _apply_rating_delta(session, old_course_id, -old_rating, -1)
+        await _apply_rating_delta(session, db_obj.course_id, db_obj.rating, 1)
+
     await session.commit()
-    await session.refresh(db_obj)
+    after_commit(
+        session, catalog_versions.bump,
+        "courses", ("comments", old_course_id), ("comments", db_obj.course_id),
+    )
     return db_obj
 
 
 # DELETE
 async def delete_comment(session: AsyncSession, comment_id: int) -> bool:
-    stmt = delete(models.Comment).where(models.Comment.id == comment_id)
-    result = await session.execute(stmt)
+    stmt = (
+        delete(models.Comment)
+        .where(models.Comment.id == comment_id)
+        .returning(models.Comment.course_id, models.Comment.rating)
+    )
+    deleted = (await session.execute(stmt)).all()
+    for course_id, rating in deleted:
+        await _apply_rating_delta(session, course_id, -rating, -1)
     await session.commit()
-    return result.rowcount > 0
+    after_commit(
+        session, catalog_versions.bump,
+        "courses", *(("comments", course_id) for course_id, _ in deleted),
+    )
+    return bool(deleted)
@@ -1,7 +1,13 @@
-from sqlalchemy import select, delete
+import re
+
+from sqlalchemy import select, delete, update, insert, func, case, literal, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine import Result
+from sqlalchemy.orm import joinedload
 from server.app import models, schemas
+from server.app.cache import catalog_versions, facet_cache
+from server.app.config import settings
+from server.app.write_queue import after_commit
 
 
 # CREATE
@@ -9,21 +15,56 @@ async def create_course(session: AsyncSession, data: schemas.CourseCreate) -> mo
     db_obj = models.Course(**data.dict())
     session.add(db_obj)
     await session.commit()
+    after_commit(session, catalog_versions.bump, "courses")
     await session.refresh(db_obj)
     return db_obj
 
 
+async def bulk_insert_courses(session: AsyncSession, rows: list[dict]) -> None:
+    """Одна executemany-вставка; коммит остаётся за вызывающим."""
+    if rows:
+        await session.execute(insert(models.Course), rows)
+
+
 # READ one
 async def get_course(session: AsyncSession, course_id: int) -> models.Course | None:
     stmt = select(models.Course).where(models.Course.id == course_id)
     result: Result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
-async def get_course_by_category(session: AsyncSession, category_id: int) ->list[models.Course]:
-    stmt = select(models.Course).where(models.Course.category_id == category_id)
+async def get_course_with_relations(session: AsyncSession, course_id: int) -> models.Course | None:
+    """Курс вместе с категорией и владельцем одним запросом."""
+    stmt = (
+        select(models.Course)
+        .where(models.Course.id == course_id)
+        .options(joinedload(models.Course.category), joinedload(models.Course.owner))
+    )
+    result: Result = await session.execute(stmt)
+    return result.scalar_one_or_none()
+
+async def get_course_by_category(session: AsyncSession, category_id: int) -> models.Course | None:
+    stmt = (
+        select(models.Course)
+        .where(models.Course.category_id == category_id)
+        .order_by(models.Course.id)
+        .limit(1)
+    )
     result: Result = await session.execute(stmt)
     return result.scalar_one_or_none()
 
+def export_courses_stmt(category_id: int | None = None):
+    """Плоские колонки без ORM-сущностей, чтобы выгрузка не наполняла identity map."""
+    course = models.Course
+    stmt = select(
+        course.id, course.title, course.format, course.description, course.price,
+        course.duration_hours, course.category_id, course.owner_id, course.rating,
+        course.rating_count, course.purchased_count, course.image_url,
+    ).order_by(course.id)
+    if category_id is not None:
+        stmt = stmt.where(course.category_id == category_id)
+    return stmt
+
+
 # READ all
 async def get_courses(session: AsyncSession) -> list[models.Course]:
     stmt = select(models.Course).order_by(models.Course.id)
@@ -31,6 +72,106 @@ async def get_courses(session: AsyncSession) -> list[models.Course]:
     return list(result.scalars().all())
 
 
+# SEARCH
+_SEARCH_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def build_search_match(search: str) -> str | None:
+    """Строка поиска -> выражение FTS5 MATCH (префиксный поиск по каждому слову)."""
+    tokens = _SEARCH_TOKEN_RE.findall(search)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def apply_search(stmt, search: str):
+    """Фильтрует запрос по FTS-индексу курсов.
+
+    Возвращает запрос и ключ сортировки по релевантности (или None,
+    если в строке поиска нет ни одного слова).
+    """
+    match = build_search_match(search)
+    if match is None:
+        return stmt, None
+    fts = models.courses_fts
+    stmt = stmt.join(fts, fts.c.rowid == models.Course.id).where(fts.c.courses_fts.match(match))
+    return stmt, [fts.c.rank, models.Course.id]
+
+
+def _price_buckets(bounds: list[float]) -> list[tuple[str, float, float | None]]:
+    bounds = sorted(bounds)
+    buckets = [(f"{lo:g}-{hi:g}", lo, hi) for lo, hi in zip(bounds, bounds[1:])]
+    return buckets + [(f"{bounds[-1]:g}+", bounds[-1], None)]
+
+
+async def get_course_facets(
+    session: AsyncSession,
+    search: str | None = None,
+    category_id: int | None = None,
+    min_price: float | None = None,
+    max_price: float | None = None,
+    min_rating: float | None = None,
+) -> dict:
+    """Число курсов по категориям и ценовым корзинам для текущих фильтров.
+
+    Каждый фасет не учитывает собственный фильтр (категории считаются без
+    category_id, корзины — без min/max_price), чтобы было видно, сколько
+    найдётся при его смене. Один GROUP BY, результат кэшируется.
+    """
+    # FTS5 не различает регистр, поэтому и ключ кэша тоже
+    match = build_search_match(search.lower()) if search else None
+    key = (
+        catalog_versions.get("courses"), match, category_id or None,
+        None if min_price is None else float(min_price),
+        None if max_price is None else float(max_price),
+        None if min_rating is None else float(min_rating),
+    )
+    cached = facet_cache.get(key)
+    if cached is not None:
+        return cached
+
+    course = models.Course
+    buckets = _price_buckets(settings.facet_price_bounds)
+    bucket = case(
+        *((course.price < hi, label) for label, _, hi in buckets[:-1]),
+        else_=buckets[-1][0],
+    )
+    price_conditions = []
+    if min_price is not None:
+        price_conditions.append(course.price >= min_price)
+    if max_price is not None:
+        price_conditions.append(course.price <= max_price)
+    in_price = case((and_(*price_conditions), 1), else_=0) if price_conditions else literal(1)
+
+    stmt = select(course.category_id, bucket, in_price, func.count()).group_by(
+        course.category_id, bucket, in_price
+    )
+    if min_rating is not None:
+        stmt = stmt.where(course.rating >= min_rating)
+    if search:
+        stmt, _ = apply_search(stmt, search)
+
+    categories: dict[int, int] = {}
+    bucket_counts = dict.fromkeys((label for label, _, _ in buckets), 0)
+    for row_category_id, row_bucket, row_in_price, count in await session.execute(stmt):
+        if row_in_price:
+            categories[row_category_id] = categories.get(row_category_id, 0) + count
+        if not category_id or row_category_id == category_id:
+            bucket_counts[row_bucket] += count
+
+    facets = {
+        "categories": [
+            {"category_id": cid, "count": count} for cid, count in sorted(categories.items())
+        ],
+        "price_buckets": [
+            {"bucket": label, "min": lo, "max": hi, "count": bucket_counts[label]}
+            for label, lo, hi in buckets
+        ],
+    }
+    facet_cache.set(key, facets)
+    return facets
+
+
 # UPDATE
 async def update_course(
     session: AsyncSession,
@@ -51,7 +192,7 @@ async def update_course(
         setattr(db_obj, field, value)
 
     await session.commit()
-    await session.refresh(db_obj)
+    after_commit(session, catalog_versions.bump, "courses")
     return db_obj
 
 
@@ -60,4 +201,26 @@ async def delete_course(session: AsyncSession, course_id: int) -> bool:
     stmt = delete(models.Course).where(models.Course.id == course_id)
     result = await session.execute(stmt)
     await session.commit()
+    after_commit(session, catalog_versions.bump, "courses")
     return result.rowcount > 0
+
+
+# RATINGS
+async def recompute_ratings(session: AsyncSession) -> int:
+    """Пересчитывает rating_sum/rating_count/rating всех курсов по комментариям.
+
+    Исправляет расхождения инкрементальных агрегатов одним UPDATE.
+    """
+    comments = models.Comment
+    course_comments = comments.course_id == models.Course.id
+    rating_sum = select(func.coalesce(func.sum(comments.rating), 0)).where(course_comments).scalar_subquery()
+    rating_count = select(func.count(comments.id)).where(course_comments).scalar_subquery()
+    rating_avg = select(func.coalesce(func.avg(comments.rating), 0)).where(course_comments).scalar_subquery()
+    result = await session.execute(
+        update(models.Course)
+        .values(rating_sum=rating_sum, rating_count=rating_count, rating=rating_avg)
+        .execution_options(synchronize_session=False)
+    )
+    await session.commit()
+    after_commit(session, catalog_versions.bump, "courses")
+    return result.rowcount
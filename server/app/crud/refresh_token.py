@@ -0,0 +1,104 @@
+import logging
+import secrets
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, delete, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.app import models
+from server.app.config import settings
+from server.app.security import new_refresh_token, refresh_token_digest
+
+logger = logging.getLogger(__name__)
+
+RT = models.RefreshToken
+
+
+async def _insert_token(session: AsyncSession, user_id: int, family: str, now: datetime) -> str:
+    token = new_refresh_token()
+    await session.execute(
+        insert(RT).values(
+            user_id=user_id,
+            family=family,
+            token_hash=refresh_token_digest(token),
+            expires_at=now + timedelta(days=settings.refresh_token_expire_days),
+        )
+    )
+    return token
+
+
+# CREATE
+async def issue_refresh_token(session: AsyncSession, user_id: int) -> str:
+    """Новая цепочка токенов (вход по паролю). Возвращает сам токен."""
+    token = await _insert_token(session, user_id, secrets.token_hex(8), datetime.utcnow())
+    await session.commit()
+    return token
+
+
+# ROTATE
+async def rotate_refresh_token(session: AsyncSession, token: str) -> tuple[int, str] | None:
+    """Меняет токен на новый той же цепочки: (user_id, новый токен) или None.
+
+    Поиск — по уникальному индексу на HMAC. Токен гасится условным UPDATE,
+    поэтому из двух одновременных обменов одного токена проходит один.
+    Погашенный токен ещё refresh_token_reuse_grace_seconds обменивается
+    на новый той же цепочки: так параллельные обмены из разных вкладок не
+    выкидывают пользователя. Более позднее предъявление считается кражей
+    и отзывает всю цепочку.
+    """
+    now = datetime.utcnow()
+    row = (await session.execute(
+        select(RT.id, RT.user_id, RT.family, RT.expires_at, RT.used_at, RT.revoked_at)
+        .where(RT.token_hash == refresh_token_digest(token))
+    )).first()
+    if row is None or row.expires_at <= now:
+        return None
+
+    claimed = await session.execute(
+        update(RT)
+        .where(RT.id == row.id, RT.used_at.is_(None), RT.revoked_at.is_(None))
+        .values(used_at=now)
+    )
+    if claimed.rowcount == 0:
+        grace = timedelta(seconds=settings.refresh_token_reuse_grace_seconds)
+        if row.revoked_at is None and row.used_at is not None and now - row.used_at <= grace:
+            new_token = await _insert_token(session, row.user_id, row.family, now)
+            await session.commit()
+            return row.user_id, new_token
+        logger.warning("Refresh token reuse for user %s, revoking family %s", row.user_id, row.family)
+        await _revoke(session, RT.family == row.family, now)
+        await session.commit()
+        return None
+
+    new_token = await _insert_token(session, row.user_id, row.family, now)
+    await session.commit()
+    return row.user_id, new_token
+
+
+# REVOKE
+async def _revoke(session: AsyncSession, condition, now: datetime) -> int:
+    result = await session.execute(
+        update(RT).where(condition, RT.revoked_at.is_(None)).values(revoked_at=now)
+    )
+    return result.rowcount
+
+
+async def revoke_refresh_token_family(session: AsyncSession, token: str) -> int:
+    """Выход: отзывает цепочку, к которой относится токен."""
+    family = select(RT.family).where(RT.token_hash == refresh_token_digest(token)).scalar_subquery()
+    revoked = await _revoke(session, RT.family == family, datetime.utcnow())
+    await session.commit()
+    return revoked
+
+
+async def revoke_user_refresh_tokens(session: AsyncSession, user_id: int) -> int:
+    """Выход со всех устройств; коммит остаётся за вызывающим."""
+    return await _revoke(session, RT.user_id == user_id, datetime.utcnow())
+
+
+# SWEEP
+async def delete_expired_refresh_tokens(session: AsyncSession) -> int:
+    """Удаляет просроченные токены; идёт по индексу expires_at."""
+    result = await session.execute(delete(RT).where(RT.expires_at <= datetime.utcnow()))
+    await session.commit()
+    return result.rowcount
@@ -2,26 +2,23 @@ from sqlalchemy import select, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.engine import Result
 
-from passlib.context import CryptContext
-
 from server.app import models, schemas
+from server.app.cache import invalidate_user
+from server.app.write_queue import after_commit
+from server.app.pagination import paginate, DEFAULT_PAGE_SIZE
+from server.app.security import password_hasher
+from server.app.crud.refresh_token import revoke_user_refresh_tokens
 
-pwd_context = CryptContext(schemes=["bcrypt_sha256"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
-
-async def create_user(session: AsyncSession, user: schemas.UserCreate) -> models.User:
-
-
+async def create_user(
+    session: AsyncSession,
+    user: schemas.UserCreate,
+    hashed_password: str | None = None,
+) -> models.User:
+    # хэш можно посчитать заранее, вне транзакции (см. server.app.write_queue)
     db_user = models.User(
         username=user.username,
         email=user.email,
-        hashed_password=hash_password(user.password),
+        hashed_password=hashed_password or await password_hasher.hash(user.password),
         avatar_url=None
     )
 
@@ -46,10 +43,13 @@ async def get_user_by_username(session: AsyncSession, username: str) -> models.U
     return result.scalar_one_or_none()
 
 
-async def get_users(session: AsyncSession) -> list[models.User]:
-    stmt = select(models.User).order_by(models.User.id)
-    result: Result = await session.execute(stmt)
-    return list(result.scalars().all())
+async def get_users(
+    session: AsyncSession,
+    after: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> tuple[list[models.User], str | None]:
+    stmt = select(models.User)
+    return await paginate(session, stmt, [models.User.id], after=after, limit=limit)
 
 
 
@@ -58,7 +58,8 @@ async def update_user(
     session: AsyncSession,
     user_id: int,
     user_update: schemas.UserUpdate | schemas.UserUpdatePartial,
-    partial: bool = False
+    partial: bool = False,
+    hashed_password: str | None = None,
 ) -> models.User | None:
 
 
@@ -74,21 +75,26 @@ async def update_user(
 
 
     if "password" in update_data:
-        update_data["hashed_password"] = hash_password(update_data.pop("password"))
+        password = update_data.pop("password")
+        update_data["hashed_password"] = hashed_password or await password_hasher.hash(password)
+        # смена пароля завершает все сессии
+        await revoke_user_refresh_tokens(session, user_id)
 
 
     for field, value in update_data.items():
         setattr(db_user, field, value)
 
     await session.commit()
-    await session.refresh(db_user)
+    after_commit(session, invalidate_user, user_id)
     return db_user
 
 
 async def delete_user(session: AsyncSession, user_id: int) -> bool:
 
+    await session.execute(delete(models.RefreshToken).where(models.RefreshToken.user_id == user_id))
     stmt = delete(models.User).where(models.User.id == user_id)
     result = await session.execute(stmt)
     await session.commit()
+    after_commit(session, invalidate_user, user_id)
 
     return result.rowcount > 0
@@ -1,29 +1,24 @@
 # app/database.py
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+# Совместимость со старыми импортами: движок и фабрика сессий
+# берутся из единственного db_helper (и создаются при первом обращении).
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from server.app.config import settings
+from server.app.db_helper import db_helper
+from server.app.models import Base
 
-SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:///./shop.db"
 
+SQLALCHEMY_DATABASE_URL = settings.db_url
 
-engine = create_async_engine(
-    SQLALCHEMY_DATABASE_URL,
-    echo=True,
-)
-
-async_session_maker = async_sessionmaker(
-    engine,
-    class_=AsyncSession,
-    expire_on_commit=False,
-)
-
-
-class Base(DeclarativeBase):
-    pass
 
+def __getattr__(name: str):
+    if name == "engine":
+        return db_helper.engine
+    if name == "async_session_maker":
+        return db_helper.session_factory
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 async def get_async_session() -> AsyncSession:
-    async with async_session_maker() as session:
+    async with db_helper.session_factory() as session:
         yield session
-
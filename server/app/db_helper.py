@@ -1,23 +1,106 @@
 # server/app/db_helper.py
+from contextlib import AsyncExitStack
+
+from sqlalchemy import event, make_url
 from sqlalchemy.ext.asyncio import (
     create_async_engine,
     async_sessionmaker,
     async_scoped_session,
+    AsyncEngine,
     AsyncSession,
 )
 from asyncio import current_task
-from server.app.config import settings
+from server.app.config import settings, Setting
+
+
+def _is_file_db(url: str) -> bool:
+    database = make_url(url).database
+    return bool(database) and database != ":memory:"
+
+
+def sqlite_pragmas(engine: AsyncEngine, wal: bool, busy_timeout: float) -> None:
+    """Настраивает каждое новое соединение файловой SQLite-БД.
+
+    WAL: читатели не блокируют COMMIT писателя, и наоборот. В режиме
+    rollback journal любой долгий читатель (выгрузка, недочитанный курсор)
+    держит SHARED-блокировку, и COMMIT пачки группового коммита падает
+    целиком с "database is locked". Режим хранится в самом файле, так что
+    реплике только для чтения его не выставляют.
+    """
+
+    def on_connect(dbapi_connection, connection_record) -> None:
+        cursor = dbapi_connection.cursor()
+        if wal:
+            cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA busy_timeout={int(busy_timeout * 1000)}")
+        cursor.close()
+
+    event.listen(engine.sync_engine, "connect", on_connect)
 
 
+async def warm_pool(engine: AsyncEngine, connections: int) -> int:
+    """Открывает соединения пула заранее и возвращает их в пул."""
+    size = getattr(engine.pool, "size", None)
+    # у StaticPool/NullPool держать в пуле нечего, кроме одного соединения
+    connections = min(connections, size()) if size is not None else 1
+    async with AsyncExitStack() as stack:
+        for _ in range(connections):
+            await stack.enter_async_context(engine.connect())
+    return connections
+
 
 class DatabaseHelper:
-    def __init__(self, url: str, echo: bool = False):
-        self.engine = create_async_engine(url=url, echo=echo)
-        self.session_factory = async_sessionmaker(
-            bind=self.engine,
-            autoflush=False,
-            expire_on_commit=False,
-        )
+    """Движок и фабрика сессий создаются при первом обращении, а не при импорте."""
+
+    def __init__(
+        self,
+        url: str,
+        echo: bool = False,
+        wal: bool = False,
+        busy_timeout: float = 5,
+        **engine_kwargs,
+    ):
+        self.url = url
+        self.echo = echo
+        self.wal = wal
+        self.busy_timeout = busy_timeout
+        self.engine_kwargs = engine_kwargs
+        self._engine: AsyncEngine | None = None
+        self._session_factory: async_sessionmaker | None = None
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            self._engine = create_async_engine(url=self.url, echo=self.echo, **self.engine_kwargs)
+            if _is_file_db(self.url):
+                sqlite_pragmas(self._engine, self.wal, self.busy_timeout)
+        return self._engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        if self._session_factory is None:
+            self._session_factory = async_sessionmaker(
+                bind=self.engine,
+                autoflush=False,
+                expire_on_commit=False,
+            )
+        return self._session_factory
+
+    @classmethod
+    def from_settings(cls, config: Setting, url: str | None = None) -> "DatabaseHelper":
+        """Без url — primary (в режиме WAL), с url — реплика только для чтения."""
+        wal = url is None
+        url = url or config.db_url
+        engine_kwargs = {"query_cache_size": config.db_statement_cache_size}
+        if _is_file_db(url):
+            engine_kwargs.update(
+                pool_size=config.db_pool_size,
+                max_overflow=config.db_max_overflow,
+                pool_timeout=config.db_pool_timeout,
+                pool_recycle=config.db_pool_recycle,
+                pool_pre_ping=config.db_pool_pre_ping,
+            )
+        return cls(url=url, echo=config.db_echo, wal=wal, busy_timeout=config.db_busy_timeout, **engine_kwargs)
 
     def get_scoped_session(self):
         return async_scoped_session(
@@ -29,8 +112,77 @@ class DatabaseHelper:
         async with self.session_factory() as session:
             yield session
 
+    def pool_status(self) -> dict:
+        pool = self.engine.pool
+        stats = {"pool_class": type(pool).__name__}
+        for name in ("size", "checkedin", "checkedout", "overflow"):
+            method = getattr(pool, name, None)
+            if method is not None:
+                stats[name] = method()
+        return stats
 
-db_helper = DatabaseHelper(
-    url=settings.db_url,
-    echo=settings.db_echo,
-)
+    async def warm_up(self, connections: int) -> int:
+        return await warm_pool(self.engine, connections)
+
+    async def dispose(self) -> None:
+        if self._engine is not None:
+            await self._engine.dispose()
+
+
+class DatabaseRouter:
+    """Разводит сессии: запись — в primary, чтение — в реплику.
+
+    Без реплики оба направления идут в primary. Клиент, который только что
+    писал, получает cookie и ещё sticky_seconds читает из primary, чтобы
+    видеть свои изменения, пока реплика не догнала.
+    """
+
+    READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+    STICKY_COOKIE = "db_primary"
+
+    def __init__(self, primary: DatabaseHelper, replica: DatabaseHelper | None = None, sticky_seconds: int = 5):
+        self.primary = primary
+        self.replica = replica or primary
+        self.sticky_seconds = sticky_seconds
+
+    @classmethod
+    def from_settings(cls, config: Setting, primary: DatabaseHelper) -> "DatabaseRouter":
+        replica = DatabaseHelper.from_settings(config, url=config.db_replica_url) if config.db_replica_url else None
+        return cls(primary, replica, sticky_seconds=config.db_replica_sticky_seconds)
+
+    @property
+    def has_replica(self) -> bool:
+        return self.replica is not self.primary
+
+    @property
+    def helpers(self) -> list[DatabaseHelper]:
+        return [self.primary, self.replica] if self.has_replica else [self.primary]
+
+    def use_primary(self, method: str, cookies: dict[str, str]) -> bool:
+        return method not in self.READ_METHODS or self.STICKY_COOKIE in cookies
+
+    def session_factory_for(self, method: str, cookies: dict[str, str]) -> async_sessionmaker:
+        helper = self.primary if self.use_primary(method, cookies) else self.replica
+        return helper.session_factory
+
+    def mark_write(self, response) -> None:
+        """Выставляет cookie «читать из primary» после пишущего запроса."""
+        if self.has_replica:
+            response.set_cookie(
+                self.STICKY_COOKIE, "1",
+                max_age=self.sticky_seconds, httponly=True, samesite="lax",
+            )
+
+    def pool_status(self) -> dict:
+        stats = self.primary.pool_status()
+        if self.has_replica:
+            stats["replica"] = self.replica.pool_status()
+        return stats
+
+    async def dispose(self) -> None:
+        for helper in self.helpers:
+            await helper.dispose()
+
+
+db_helper = DatabaseHelper.from_settings(settings)
+db_router = DatabaseRouter.from_settings(settings, db_helper)
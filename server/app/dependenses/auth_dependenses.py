@@ -1,21 +1,43 @@
-from fastapi import Depends, HTTPException, status, Cookie
+import time
+
+from fastapi import Depends, HTTPException, Request, Response, status, Cookie
 from jose import jwt, JWTError
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from server.app import schemas
+from server.app.cache import user_cache
 from server.app.security import SECRET_KEY, ALGORITHM
-from server.app.database import async_session_maker
+from server.app.db_helper import db_router
+from server.app.write_queue import WriteQueue, write_queue
 from server.app.crud import users as crud_users
 
-async def get_db():
-    async with async_session_maker() as session:
+def reads_replica(request: Request) -> bool:
+    """Запрос обслуживает реплика, которая может отставать от primary."""
+    return db_router.has_replica and not db_router.use_primary(request.method, request.cookies)
+
+async def get_session_factory(request: Request) -> async_sessionmaker:
+    # для ответов, которые читают БД уже после обработчика (стриминг)
+    return db_router.session_factory_for(request.method, request.cookies)
+
+async def get_db(request: Request, response: Response):
+    # GET/HEAD читают реплику, остальные методы пишут в primary
+    factory = db_router.session_factory_for(request.method, request.cookies)
+    if request.method not in db_router.READ_METHODS:
+        db_router.mark_write(response)
+    async with factory() as session:
         yield session
-        
+
+async def get_writer(response: Response) -> WriteQueue:
+    # запись идёт через очередь группового коммита в primary
+    db_router.mark_write(response)
+    return write_queue
+
 async def get_current_user(
     access_token: str = Cookie(None),
     session: AsyncSession = Depends(get_db)
-):
+) -> schemas.User:
     if not access_token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
-    
+
     try:
         payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
         user_id: int = int(payload.get("sub"))
@@ -24,6 +46,13 @@ async def get_current_user(
     except JWTError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+    # запись живёт не дольше самого токена
+    expires_at = payload.get("exp")
+    cache_key = (user_id, expires_at)
+    cached_user = user_cache.get(cache_key)
+    if cached_user is not None:
+        return cached_user
+
     db_user = await crud_users.get_user(session, user_id=user_id)
     if db_user is None:
         raise HTTPException(
@@ -31,5 +60,7 @@ async def get_current_user(
             detail="Invalid authentication credentials"
         )
 
-    
-    return db_user
+    user = schemas.User.model_validate(db_user)
+    if expires_at is not None:
+        user_cache.set(cache_key, user, ttl=expires_at - time.time())
+    return user
@@ -0,0 +1,35 @@
+from fastapi import HTTPException, Request, Response, status
+
+from server.app.cache import catalog_versions
+from server.app.dependenses.auth_dependenses import reads_replica
+
+# клиент может хранить ответ, но обязан перепроверять его через If-None-Match
+CATALOG_CACHE_CONTROL = "public, no-cache"
+
+
+def _check_etag(request: Request, response: Response, key) -> None:
+    if reads_replica(request):
+        # версия растёт сразу после COMMIT в primary, а реплика может ещё не
+        # догнать: такой ETag пометил бы старые данные новой версией
+        response.headers["Cache-Control"] = CATALOG_CACHE_CONTROL
+        return
+    etag = catalog_versions.etag(key)
+    headers = {"ETag": etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+        if "*" in candidates or etag in candidates:
+            raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    response.headers.update(headers)
+
+
+async def courses_etag(request: Request, response: Response) -> None:
+    _check_etag(request, response, "courses")
+
+
+async def categories_etag(request: Request, response: Response) -> None:
+    _check_etag(request, response, "categories")
+
+
+async def course_comments_etag(course_id: int, request: Request, response: Response) -> None:
+    _check_etag(request, response, ("comments", course_id))
@@ -0,0 +1,72 @@
+# server/app/exports.py
+# Потоковая выгрузка выборок в NDJSON или CSV.
+import csv
+import io
+import json
+from typing import AsyncIterator, Literal
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import ColumnElement, Select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+ExportFormat = Literal["ndjson", "csv"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+EXPORT_BATCH_SIZE = 1000
+
+
+def _ndjson_chunk(columns: list[str], rows) -> str:
+    return "".join(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + "\n" for row in rows)
+
+
+def _csv_chunk(rows) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+async def iter_export(
+    stmt: Select,
+    fmt: ExportFormat,
+    session_factory: async_sessionmaker,
+    key: ColumnElement,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> AsyncIterator[str]:
+    """Читает stmt keyset-пачками по key и отдаёт их сериализованными.
+
+    Каждая пачка — отдельная короткая сессия: ответ стримится уже после
+    выхода из обработчика, а медленный клиент не должен держать транзакцию
+    чтения (и блокировку SQLite) до последнего байта — иначе встанут все
+    записи. Цена — выгрузка не один снимок: строки, изменённые во время
+    неё, попадут в ту пачку, до которой дошла очередь. key — уникальная
+    колонка из выборки, по ней же stmt упорядочен.
+    Фабрику выбирает get_session_factory — как и для get_db.
+    """
+    columns = [column.key for column in stmt.selected_columns]
+    key_index = columns.index(key.key)
+    if fmt == "csv":
+        yield _csv_chunk([columns])
+    last = None
+    while True:
+        page = stmt if last is None else stmt.where(key > last)
+        async with session_factory() as session:
+            rows = (await session.execute(page.limit(batch_size))).all()
+        if not rows:
+            return
+        yield _ndjson_chunk(columns, rows) if fmt == "ndjson" else _csv_chunk(rows)
+        if len(rows) < batch_size:
+            return
+        last = rows[-1][key_index]
+
+
+def export_response(
+    stmt: Select,
+    fmt: ExportFormat,
+    filename: str,
+    session_factory: async_sessionmaker,
+    key: ColumnElement,
+) -> StreamingResponse:
+    return StreamingResponse(
+        iter_export(stmt, fmt, session_factory, key),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
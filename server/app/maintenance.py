@@ -0,0 +1,110 @@
+# server/app/maintenance.py
+# Фоновые задачи обслуживания БД. Запуск:
+#   python -m server.app.maintenance recompute-ratings
+#   python -m server.app.maintenance rebuild-recommendations
+#   python -m server.app.maintenance reconcile-counters
+#   python -m server.app.maintenance sweep-refresh-tokens
+#   python -m server.app.maintenance hash-images
+import argparse
+import asyncio
+import hashlib
+import mimetypes
+import os
+
+from sqlalchemy import select, update
+
+from server.app.crud import course as crud_courses
+from server.app.crud import refresh_token as crud_refresh_tokens
+from server.app.config import settings
+from server.app.db_helper import db_helper
+from server.app import models
+from server.app.static_files import COMPRESSIBLE_TYPES, content_hash_of, content_hashed_name
+from server.app.uploads import static_file_path, write_gzip_sibling
+from server.app.recommendations import recommendations
+from server.app.counters import reconcile_purchased_counts
+
+
+async def recompute_ratings() -> None:
+    async with db_helper.session_factory() as session:
+        updated = await crud_courses.recompute_ratings(session)
+    print(f"Recomputed ratings for {updated} courses")
+
+
+async def rebuild_recommendations() -> None:
+    async with db_helper.session_factory() as session:
+        await recommendations.rebuild(session)
+    recommendations.save(settings.recommendations_path)
+    print(f"Saved {recommendations.stats()['pairs']} co-purchase pairs to {settings.recommendations_path}")
+
+
+async def reconcile_counters() -> None:
+    # только при остановленном приложении: иначе его несброшенные приращения учтутся дважды
+    async with db_helper.session_factory() as session:
+        fixed = await reconcile_purchased_counts(session)
+    print(f"Reconciled purchased_count for {fixed} courses")
+
+
+async def sweep_refresh_tokens() -> None:
+    async with db_helper.session_factory() as session:
+        deleted = await crud_refresh_tokens.delete_expired_refresh_tokens(session)
+    print(f"Deleted {deleted} expired refresh tokens")
+
+
+async def hash_images() -> None:
+    """Переименовывает картинки курсов в имена по содержимому и правит image_url."""
+    async with db_helper.session_factory() as session:
+        urls = (await session.execute(
+            select(models.Course.image_url).where(models.Course.image_url.like("/static/%")).distinct()
+        )).scalars().all()
+        images_dir = settings.static_dir / "images" / "courses"
+        renamed = 0
+        for url in urls:
+            path = static_file_path(url, settings.static_dir, images_dir)
+            if path is None:
+                print(f"Skipping {url!r}: outside {images_dir}")
+                continue
+            if content_hash_of(path.name) or path.name.startswith("default.") or not path.is_file():
+                continue
+            digest = hashlib.sha256(path.read_bytes()).hexdigest()
+            hashed_path = path.with_name(content_hashed_name(digest, path.suffix))
+            if hashed_path.exists():
+                path.unlink()
+            else:
+                os.replace(path, hashed_path)
+            if mimetypes.guess_type(hashed_path.name)[0] in COMPRESSIBLE_TYPES:
+                write_gzip_sibling(hashed_path)
+            await session.execute(
+                update(models.Course)
+                .where(models.Course.image_url == url)
+                .values(image_url=url.rsplit("/", 1)[0] + "/" + hashed_path.name)
+            )
+            await session.commit()
+            renamed += 1
+    print(f"Renamed {renamed} images to content-hashed names")
+
+
+COMMANDS = {
+    "recompute-ratings": recompute_ratings,
+    "rebuild-recommendations": rebuild_recommendations,
+    "reconcile-counters": reconcile_counters,
+    "sweep-refresh-tokens": sweep_refresh_tokens,
+    "hash-images": hash_images,
+}
+
+
+async def _run(command: str) -> None:
+    try:
+        await COMMANDS[command]()
+    finally:
+        await db_helper.dispose()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintenance jobs")
+    parser.add_argument("command", choices=sorted(COMMANDS))
+    args = parser.parse_args()
+    asyncio.run(_run(args.command))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+# server/app/metrics.py
+# Метрики в текстовом формате Prometheus без внешних зависимостей.
+import bisect
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "__unmatched__"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values) -> float:
+        return self._values.get(label_values, 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    def dec(self, *label_values, amount: float = 1) -> None:
+        self.inc(*label_values, amount=-amount)
+
+    def render(self) -> list[str]:
+        lines = super().render()
+        lines[1] = f"# TYPE {self.name} gauge"
+        return lines
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин.
+
+    observe() — это bisect и пара сложений, поэтому её можно держать
+    включённой в проде.
+    """
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # label_values -> [счётчики по корзинам..., сумма, количество]
+        self._series: dict[tuple, list] = {}
+
+    def observe(self, value: float, *label_values) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * len(self.buckets) + [0.0, 0]
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            series[index] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def count(self, *label_values) -> int:
+        series = self._series.get(label_values)
+        return series[-1] if series else 0
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for label_values, series in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, series):
+                cumulative += bucket_count
+                lines.append(
+                    f"{self.name}_bucket{_format_labels(names, label_values + (bound,))} {cumulative}"
+                )
+            lines.append(
+                f"{self.name}_bucket{_format_labels(names, label_values + ('+Inf',))} {series[-1]}"
+            )
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-2])}")
+            lines.append(f"{self.name}_count{labels} {series[-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests_total = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status"),
+))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"),
+))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served",
+))
+http_request_db_statements = registry.register(Histogram(
+    "http_request_db_statements", "DB statements executed per request", ("method", "route"),
+    buckets=STATEMENT_BUCKETS,
+))
+http_request_db_duration = registry.register(Histogram(
+    "http_request_db_duration_seconds", "Time spent in the DB per request", ("method", "route"),
+))
+db_statements_total = registry.register(Counter(
+    "db_statements_total", "DB statements executed",
+))
+db_statement_duration = registry.register(Histogram(
+    "db_statement_duration_seconds", "DB statement latency",
+))
+db_pool_checkouts_total = registry.register(Counter(
+    "db_pool_checkouts_total", "Connections checked out of the pool",
+))
+db_pool_checked_out = registry.register(Gauge(
+    "db_pool_checked_out", "Connections currently checked out of the pool",
+))
+
+
+@dataclass
+class RequestStats:
+    db_statements: int = 0
+    db_time: float = 0.0
+
+
+# Статистика текущего запроса; события движка выполняются в той же задаче
+current_request: ContextVar[RequestStats | None] = ContextVar("current_request", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["metrics_started"].pop()
+    elapsed = time.perf_counter() - started
+    db_statements_total.inc()
+    db_statement_duration.observe(elapsed)
+    stats = current_request.get()
+    if stats is not None:
+        stats.db_statements += 1
+        stats.db_time += elapsed
+
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("metrics_started"):
+        conn.info["metrics_started"].pop()
+
+
+def _checkout(dbapi_connection, connection_record, connection_proxy):
+    db_pool_checkouts_total.inc()
+    db_pool_checked_out.inc()
+
+
+def _checkin(dbapi_connection, connection_record):
+    db_pool_checked_out.dec()
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(sync_engine, "handle_error", _handle_error)
+    event.listen(sync_engine.pool, "checkout", _checkout)
+    event.listen(sync_engine.pool, "checkin", _checkin)
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: время ответа, статус и работа с БД по маршрутам.
+
+    Маршрут берётся как шаблон пути (/courses/{course_id}), чтобы число
+    серий не зависело от идентификаторов в URL.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            current_request.reset(token)
+
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            method = scope["method"]
+            status = str(status_code)
+            http_requests_total.inc(method, route, status)
+            http_request_duration.observe(elapsed, method, route, status)
+            http_request_db_statements.observe(stats.db_statements, method, route)
+            http_request_db_duration.observe(stats.db_time, method, route)
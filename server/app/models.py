@@ -1,5 +1,6 @@
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import String, Integer, ForeignKey, Text, DateTime,Float, UniqueConstraint
+from sqlalchemy import String, Integer, ForeignKey, Text, DateTime,Float, UniqueConstraint, LargeBinary
+from sqlalchemy import DDL, Index, event, table, column
 from datetime import datetime
 from server.app.db_helper import db_helper
 from server.app.security import verify_password
@@ -48,7 +49,10 @@ class Course(Base):
     description: Mapped[str] = mapped_column(Text)
     price: Mapped[int] = mapped_column(Integer)
     duration_hours: Mapped[int] = mapped_column(Integer)
+    # rating = rating_sum / rating_count, поддерживается crud.comment
     rating: Mapped[float] = mapped_column(Float, default=0)
+    rating_sum: Mapped[float] = mapped_column(Float, default=0, server_default="0")
+    rating_count: Mapped[int] = mapped_column(Integer, default=0, server_default="0")
     purchased_count: Mapped[int] = mapped_column(Integer, default=0)
 
     owner_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
@@ -64,6 +68,17 @@ class Course(Base):
         default="/static/images/courses/default.png"
     )
 
+    # id (rowid) неявно входит в каждый индекс SQLite, поэтому
+    # keyset-пагинация по (price, id) и (rating, id) идёт по индексу
+    __table_args__ = (
+        Index("ix_courses_owner_id", "owner_id"),
+        Index("ix_courses_category_id_price", "category_id", "price"),
+        Index("ix_courses_price", "price"),
+        Index("ix_courses_rating", "rating"),
+        # удаление курса проверяет, нужна ли его картинка другим курсам
+        Index("ix_courses_image_url", "image_url"),
+    )
+
 class Cart(Base):
     __tablename__ = "cart"
 
@@ -90,6 +105,11 @@ class BoughtCourse(Base):
     user = relationship("User", back_populates="bought_courses")
     course = relationship("Course")
 
+    __table_args__ = (
+        Index("uq_bought_courses_user_course", "user_id", "course_id", unique=True),
+        Index("ix_bought_courses_course_id", "course_id"),
+    )
+
 
 
 class Comment(Base):
@@ -104,3 +124,86 @@ class Comment(Base):
 
     user = relationship("User", back_populates="comments")
     course = relationship("Course", back_populates="comments")
+
+    __table_args__ = (
+        # покрывает и список комментариев курса, и пересчёт рейтинга
+        Index("ix_comments_course_id_rating", "course_id", "rating"),
+        Index("ix_comments_user_id", "user_id"),
+    )
+
+
+class RefreshToken(Base):
+    """Refresh-токен: хранится только HMAC-SHA256 от значения, сам токен — у клиента.
+
+    Токены одной цепочки ротаций делят family: повторное предъявление уже
+    использованного токена после короткого окна отзывает всю цепочку.
+    """
+    __tablename__ = "refresh_tokens"
+
+    id: Mapped[int] = mapped_column(primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"))
+    family: Mapped[str] = mapped_column(String(16), nullable=False)
+    token_hash: Mapped[bytes] = mapped_column(LargeBinary(32), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    used_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    revoked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("uq_refresh_tokens_token_hash", "token_hash", unique=True),
+        Index("ix_refresh_tokens_family", "family"),
+        Index("ix_refresh_tokens_user_id", "user_id"),
+        Index("ix_refresh_tokens_expires_at", "expires_at"),
+    )
+
+
+# ================== ПОЛНОТЕКСТОВЫЙ ПОИСК ==================
+# FTS5-индекс по title/description курсов (external content):
+# данные хранятся только в courses, а индекс поддерживают триггеры.
+# Для существующих БД то же самое создаёт миграция 20fff2712381.
+
+courses_fts = table(
+    "courses_fts",
+    column("rowid"),
+    column("rank"),
+    column("courses_fts"),
+)
+
+COURSES_FTS_DDL = (
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS courses_fts USING fts5(
+        title, description,
+        content='courses', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    # совпадение в названии весит больше, чем в описании
+    "INSERT INTO courses_fts(courses_fts, rank) VALUES ('rank', 'bm25(10.0, 1.0)')",
+    """
+    CREATE TRIGGER IF NOT EXISTS courses_fts_ai AFTER INSERT ON courses BEGIN
+        INSERT INTO courses_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS courses_fts_ad AFTER DELETE ON courses BEGIN
+        INSERT INTO courses_fts(courses_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS courses_fts_au AFTER UPDATE OF title, description ON courses BEGIN
+        INSERT INTO courses_fts(courses_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO courses_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+)
+
+for _ddl in COURSES_FTS_DDL:
+    event.listen(Course.__table__, "after_create", DDL(_ddl).execute_if(dialect="sqlite"))
+event.listen(
+    Course.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS courses_fts").execute_if(dialect="sqlite"),
+)
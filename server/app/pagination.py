@@ -0,0 +1,65 @@
+# server/app/pagination.py
+# Keyset-пагинация: вместо OFFSET запрос продолжается с ключа
+# последней строки предыдущей страницы (WHERE (k1, k2) > (:v1, :v2)),
+# поэтому любая страница стоит как первая — это поиск по индексу.
+import base64
+import json
+from typing import Any, Sequence
+
+from fastapi import HTTPException, Response, status
+from sqlalchemy import Select, literal, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except ValueError:
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return values
+
+
+async def paginate(
+    session: AsyncSession,
+    stmt: Select,
+    order_by: Sequence,
+    after: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    descending: bool = False,
+) -> tuple[list, str | None]:
+    """Возвращает страницу объектов и курсор следующей страницы (или None)."""
+    if after is not None:
+        values = decode_cursor(after, len(order_by))
+        key = tuple_(*order_by)
+        bound = tuple_(*(literal(value) for value in values))
+        stmt = stmt.where(key < bound if descending else key > bound)
+
+    stmt = (
+        stmt.add_columns(*order_by)
+        .order_by(*(column.desc() if descending else column for column in order_by))
+        .limit(limit + 1)
+    )
+    rows = (await session.execute(stmt)).all()
+
+    items = [row[0] for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        next_cursor = encode_cursor(rows[limit - 1][1:])
+    return items, next_cursor
+
+
+def set_next_cursor(response: Response, next_cursor: str | None) -> None:
+    if next_cursor is not None:
+        response.headers[NEXT_CURSOR_HEADER] = next_cursor
@@ -0,0 +1,114 @@
+# server/app/query_budget.py
+# Подсчёт SQL-запросов на HTTP-запрос и поиск N+1.
+#
+# В тестах:
+#     with track_queries() as queries:
+#         await client.get("/courses/1")
+#     queries.assert_budget(2)
+#
+# В отладке: QUERY_DEBUG=true — middleware пишет в лог маршруты,
+# превысившие бюджет, и повторяющиеся запросы одной формы.
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE_RE = re.compile(r"\s+")
+# IN (?, ?, ?) и VALUES (?, ?), (?, ?) — одна форма независимо от числа элементов
+_IN_LIST_RE = re.compile(r"IN \((?:\?|__\[POSTCOMPILE_\w+\])(?:, (?:\?|__\[POSTCOMPILE_\w+\]))*\)")
+_VALUES_RE = re.compile(r"(VALUES \([^()]*\))(?:, \([^()]*\))+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    shape = _IN_LIST_RE.sub("IN (?)", shape)
+    return _VALUES_RE.sub(r"\1", shape)
+
+
+class QueryLog:
+    """SQL-запросы, выполненные внутри track_queries()."""
+
+    def __init__(self):
+        self.statements: list[str] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated(self, threshold: int = 3) -> dict[str, int]:
+        """Формы запросов, выполненные не меньше threshold раз (вероятный N+1)."""
+        shapes = Counter(statement_shape(statement) for statement in self.statements)
+        return {shape: times for shape, times in shapes.items() if times >= threshold}
+
+    def report(self) -> str:
+        return "\n".join(f"  {i}. {statement_shape(s)}" for i, s in enumerate(self.statements, 1))
+
+    def assert_budget(self, max_queries: int, repeat_threshold: int | None = 3) -> None:
+        assert self.count <= max_queries, (
+            f"{self.count} queries, budget is {max_queries}:\n{self.report()}"
+        )
+        if repeat_threshold is not None:
+            repeated = self.repeated(repeat_threshold)
+            assert not repeated, "Possible N+1:\n" + "\n".join(
+                f"  {times} x {shape}" for shape, times in repeated.items()
+            )
+
+
+# Активные журналы текущей задачи; вложенные track_queries() видят одни и те же запросы
+_active_logs: ContextVar[tuple[QueryLog, ...]] = ContextVar("active_query_logs", default=())
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryLog]:
+    log = QueryLog()
+    token = _active_logs.set(_active_logs.get() + (log,))
+    try:
+        yield log
+    finally:
+        _active_logs.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    for log in _active_logs.get():
+        log.statements.append(statement)
+
+
+def instrument_engine(engine: AsyncEngine) -> None:
+    """Подключает счётчик; без активного track_queries() он ничего не делает."""
+    sync_engine = engine.sync_engine
+    if not event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+
+
+class QueryBudgetMiddleware:
+    """Логирует запросы, превысившие бюджет, и повторяющиеся SQL (N+1)."""
+
+    def __init__(self, app, max_queries: int, repeat_threshold: int):
+        self.app = app
+        self.max_queries = max_queries
+        self.repeat_threshold = repeat_threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with track_queries() as log:
+            await self.app(scope, receive, send)
+
+        route = getattr(scope.get("route"), "path", scope["path"])
+        endpoint = f"{scope['method']} {route}"
+        if log.count > self.max_queries:
+            logger.warning(
+                "%s executed %d queries (budget %d):\n%s",
+                endpoint, log.count, self.max_queries, log.report(),
+            )
+        for shape, times in log.repeated(self.repeat_threshold).items():
+            logger.warning("%s possible N+1: %d x %s", endpoint, times, shape)
@@ -0,0 +1,196 @@
+# server/app/recommendations.py
+# «С этим курсом также покупают»: разреженная матрица совместных покупок.
+import heapq
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from server.app import models
+from server.app.config import settings
+
+
+class CoPurchaseIndex:
+    """Матрица course -> {course: число общих покупателей} в памяти процесса.
+
+    Полная сборка — один GROUP BY по self-join bought_courses в БД;
+    дальше покупки применяются инкрементально. Топ-N по курсу кэшируется
+    и пересчитывается только для затронутых курсов, поэтому выдача — это
+    поиск в словаре.
+
+    Покупка применяется идемпотентно (по множеству курсов пользователя),
+    поэтому порядок, в котором приходят id, не важен: закоммиченные позже
+    меньшие id не теряются. Покупки, записанные в обход этого процесса,
+    видны только после перезапуска (catch_up) или пересборки.
+
+    Рассчитан на работу внутри одного event loop, поэтому без блокировок.
+    """
+
+    def __init__(self, top_n: int, catch_up_window: int = 0):
+        self.top_n = top_n
+        self.catch_up_window = catch_up_window
+        self.reset()
+
+    def reset(self) -> None:
+        self.ready = False
+        # наибольший учтённый bought_courses.id
+        self.watermark = 0
+        self._user_courses: dict[int, set[int]] = defaultdict(set)
+        self._co: dict[int, dict[int, int]] = defaultdict(dict)
+        self._top: dict[int, list[tuple[int, int]]] = {}
+
+    # ---------- сборка ----------
+
+    async def rebuild(self, session: AsyncSession) -> None:
+        """Полная пересборка; оба запроса идут в одной транзакции чтения."""
+        mine, other = aliased(models.BoughtCourse), aliased(models.BoughtCourse)
+        pairs = (await session.execute(
+            select(mine.course_id, other.course_id, func.count())
+            .join(other, (other.user_id == mine.user_id) & (other.course_id != mine.course_id))
+            .group_by(mine.course_id, other.course_id)
+        )).all()
+        purchases = (await session.execute(
+            select(models.BoughtCourse.id, models.BoughtCourse.user_id, models.BoughtCourse.course_id)
+        )).all()
+        await session.rollback()
+
+        self.reset()
+        for course_id, other_id, count in pairs:
+            self._co[course_id][other_id] = count
+        for purchase_id, user_id, course_id in purchases:
+            self._user_courses[user_id].add(course_id)
+            self.watermark = max(self.watermark, purchase_id)
+        self.ready = True
+
+    async def catch_up(self, session: AsyncSession) -> int:
+        """Догоняет покупки после загрузки с диска.
+
+        Просматривает и catch_up_window id до watermark: строка с меньшим id
+        могла закоммититься уже после снимка.
+        """
+        rows = (await session.execute(
+            select(models.BoughtCourse.id, models.BoughtCourse.user_id, models.BoughtCourse.course_id)
+            .where(models.BoughtCourse.id > self.watermark - self.catch_up_window)
+            .order_by(models.BoughtCourse.id)
+        )).all()
+        await session.rollback()
+        self.add_purchases(rows)
+        return len(rows)
+
+    async def ensure_ready(self, session: AsyncSession) -> None:
+        if not self.ready:
+            await self.rebuild(session)
+
+    # ---------- инкрементальные изменения ----------
+
+    def _bump(self, course_id: int, other_id: int, delta: int) -> None:
+        row = self._co[course_id]
+        count = row.get(other_id, 0) + delta
+        if count > 0:
+            row[other_id] = count
+        else:
+            row.pop(other_id, None)
+        self._top.pop(course_id, None)
+
+    def add_purchases(self, purchases: Iterable[tuple[int, int, int]]) -> None:
+        """Учитывает покупки (id, user_id, course_id). До первой сборки ничего не делает."""
+        if not self.ready:
+            return
+        for purchase_id, user_id, course_id in purchases:
+            self.watermark = max(self.watermark, purchase_id)
+            self._add(user_id, course_id)
+
+    def _add(self, user_id: int, course_id: int) -> None:
+        owned = self._user_courses[user_id]
+        if course_id in owned:
+            return
+        for other_id in owned:
+            self._bump(course_id, other_id, 1)
+            self._bump(other_id, course_id, 1)
+        owned.add(course_id)
+
+    def remove_purchase(self, user_id: int, course_id: int) -> None:
+        if not self.ready:
+            return
+        owned = self._user_courses.get(user_id)
+        if not owned or course_id not in owned:
+            return
+        owned.discard(course_id)
+        for other_id in owned:
+            self._bump(course_id, other_id, -1)
+            self._bump(other_id, course_id, -1)
+
+    def replace_purchase(self, old: tuple[int, int], new: tuple[int, int]) -> None:
+        """Покупка (user_id, course_id) изменена на месте, её id не меняется."""
+        if not self.ready or old == new:
+            return
+        self.remove_purchase(*old)
+        self._add(*new)
+
+    # ---------- выдача ----------
+
+    def top(self, course_id: int, limit: int | None = None) -> list[tuple[int, int]]:
+        """[(course_id, число общих покупателей), ...] по убыванию."""
+        top = self._top.get(course_id)
+        if top is None:
+            row = self._co.get(course_id, {})
+            # при равенстве — меньший id, чтобы порядок был стабильным
+            top = heapq.nsmallest(self.top_n, ((-count, other) for other, count in row.items()))
+            top = self._top[course_id] = [(other, -neg) for neg, other in top]
+        return top if limit is None else top[:limit]
+
+    # ---------- диск ----------
+
+    def save(self, path: Path) -> None:
+        data = {
+            "watermark": self.watermark,
+            "users": {str(user): sorted(courses) for user, courses in self._user_courses.items() if courses},
+            "co": {
+                str(course): [[other, count] for other, count in row.items()]
+                for course, row in self._co.items() if row
+            },
+        }
+        tmp_path = path.with_name(f".{path.name}.tmp")
+        tmp_path.write_text(json.dumps(data, separators=(",", ":")))
+        os.replace(tmp_path, path)
+
+    def load(self, path: Path) -> bool:
+        try:
+            data = json.loads(path.read_text())
+        except (FileNotFoundError, ValueError):
+            return False
+        self.reset()
+        self.watermark = data["watermark"]
+        for user, courses in data["users"].items():
+            self._user_courses[int(user)] = set(courses)
+        for course, row in data["co"].items():
+            self._co[int(course)] = {other: count for other, count in row}
+        self.ready = True
+        return True
+
+    async def warm_up(self, session: AsyncSession, path: Path) -> None:
+        """Старт: снимок с диска плюс догонка, иначе полная сборка."""
+        if self.load(path):
+            await self.catch_up(session)
+        else:
+            await self.rebuild(session)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "watermark": self.watermark,
+            "courses": sum(1 for row in self._co.values() if row),
+            "pairs": sum(len(row) for row in self._co.values()),
+            "cached_top": len(self._top),
+        }
+
+
+recommendations = CoPurchaseIndex(
+    top_n=settings.recommendations_top_n,
+    catch_up_window=settings.recommendations_catch_up_window,
+)
@@ -1,42 +1,86 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Cookie, Depends, HTTPException, status, Response
+from fastapi.responses import JSONResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from datetime import timedelta, datetime
-from jose import jwt
+from datetime import timedelta
 
 from server.app.models import User
 from server.app.schemas import UserRegister, UserOut, Token
-from server.app.security import hash_password, create_access_token
-from server.app.db_helper import db_helper
+from server.app.security import ACCESS_TOKEN_EXPIRE_MINUTES, password_hasher, create_access_token
+from server.app.dependenses.auth_dependenses import get_current_user, get_db, get_writer
+from server.app.crud import refresh_token as crud_refresh_tokens
+from server.app.config import settings
+from server.app.write_queue import WriteQueue
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-SECRET_KEY = "super_secret_key"
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+# refresh-cookie уходит только на /auth/*, остальным запросам она не нужна
+REFRESH_COOKIE_PATH = "/auth"
 
 
 async def authenticate_user(session: AsyncSession, username: str, password: str):
     result = await session.execute(select(User).where(User.username == username))
     user = result.scalar_one_or_none()
-    if not user or not user.verify_password(password):
+    if not user or not await password_hasher.verify(password, user.hashed_password):
         return None
     return user
 
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
-    to_encode = data.copy()
-    expire = datetime.utcnow() + (expires_delta or timedelta(minutes=15))
-    to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+def _start_session(response: Response, user_id: int, refresh_token: str) -> dict:
+    """Ставит cookie access- и refresh-токенов и возвращает тело Token."""
+    access_token = create_access_token(
+        data={"sub": str(user_id)},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
+    )
+
+    response.set_cookie(
+        key="access_token",
+        value=access_token,
+        httponly=True,
+        secure=False,          # True в production (HTTPS)
+        samesite="lax",
+        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        path="/",              # важно
+    )
+    response.set_cookie(
+        key="refresh_token",
+        value=refresh_token,
+        httponly=True,
+        secure=False,          # True в production (HTTPS)
+        samesite="strict",
+        max_age=settings.refresh_token_expire_days * 24 * 3600,
+        path=REFRESH_COOKIE_PATH,
+    )
+
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+    }
+
+
+def _end_session(response: Response) -> None:
+    response.delete_cookie(
+        key="access_token",
+        httponly=True,
+        samesite="lax",
+        secure=False,  # True в production
+    )
+    response.delete_cookie(
+        key="refresh_token",
+        path=REFRESH_COOKIE_PATH,
+        httponly=True,
+        samesite="strict",
+        secure=False,  # True в production
+    )
 
 
 
 @router.post("/register", response_model=UserOut, status_code=status.HTTP_201_CREATED)
 async def register_user(
     user_data: UserRegister,
-    session: AsyncSession = Depends(db_helper.session_dependency),
+    session: AsyncSession = Depends(get_db),
+    writer: WriteQueue = Depends(get_writer),
 ):
     stmt = select(User).where(User.username == user_data.username)
     result = await session.execute(stmt)
@@ -44,62 +88,92 @@ async def register_user(
     if result.scalar_one_or_none():
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    user = User(
-        username=user_data.username,
-        email=user_data.email,
-        hashed_password=hash_password(user_data.password),
-    )
+    # bcrypt — до очереди: писатель не должен ждать ничего, кроме БД
+    hashed_password = await password_hasher.hash(user_data.password)
 
-    session.add(user)
-    await session.commit()
-    await session.refresh(user)
+    async def create(session: AsyncSession) -> User:
+        user = User(
+            username=user_data.username,
+            email=user_data.email,
+            hashed_password=hashed_password,
+        )
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+        return user
 
-    return user
+    return await writer.run(create)
 
 
 @router.post("/login", response_model=Token)
 async def login(
     response: Response,
     form_data: OAuth2PasswordRequestForm = Depends(),
-    session: AsyncSession = Depends(db_helper.session_dependency),
+    session: AsyncSession = Depends(get_db),
+    writer: WriteQueue = Depends(get_writer),
 ):
     result = await session.execute(
         select(User).where(User.username == form_data.username)
     )
     user = result.scalar_one_or_none()
 
-    if not user or not user.verify_password(form_data.password):
+    if not user or not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
 
-    access_token = create_access_token(
-        data={"sub": str(user.id)},
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES),
-    )
+    refresh_token = await writer.run(crud_refresh_tokens.issue_refresh_token, user.id)
+    return _start_session(response, user.id, refresh_token)
 
-    response.set_cookie(
-        key="access_token",
-        value=access_token,
-        httponly=True,
-        secure=False,          # True в production (HTTPS)
-        samesite="lax",
-        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,
-        path="/",              # важно
-    )
 
-    return {
-        "access_token": access_token,
-        "token_type": "bearer",
-    }
+@router.post("/refresh", response_model=Token)
+async def refresh(
+    response: Response,
+    refresh_token: str | None = Cookie(None),
+    writer: WriteQueue = Depends(get_writer),
+):
+    """Новая пара токенов по refresh-cookie: HMAC и два запроса вместо bcrypt.
+
+    Старый refresh-токен гасится; его повторное предъявление после
+    короткого окна для параллельных вкладок отзывает всю цепочку, и дальше
+    нужен вход по паролю.
+    """
+    rotated = await writer.run(crud_refresh_tokens.rotate_refresh_token, refresh_token) if refresh_token else None
+    if rotated is None:
+        # ответ целиком свой: HTTPException не умеет стирать две cookie
+        rejected = JSONResponse({"detail": "Invalid refresh token"}, status_code=status.HTTP_401_UNAUTHORIZED)
+        _end_session(rejected)
+        return rejected
+    user_id, new_refresh_token = rotated
+    return _start_session(response, user_id, new_refresh_token)
+
 
 @router.post("/logout", status_code=status.HTTP_200_OK)
-async def logout(response: Response):
-    response.delete_cookie(
-        key="access_token",
-        httponly=True,
-        samesite="lax",
-        secure=False,  # True в production
-    )
+async def logout(
+    response: Response,
+    refresh_token: str | None = Cookie(None),
+    writer: WriteQueue = Depends(get_writer),
+):
+    if refresh_token:
+        await writer.run(crud_refresh_tokens.revoke_refresh_token_family, refresh_token)
+    _end_session(response)
     return {"message": "Logout successful"}
+
+
+@router.post("/logout-all", status_code=status.HTTP_200_OK)
+async def logout_all(
+    response: Response,
+    current_user=Depends(get_current_user),
+    writer: WriteQueue = Depends(get_writer),
+):
+    """Отзывает refresh-токены пользователя на всех устройствах."""
+
+    async def revoke(session):
+        revoked = await crud_refresh_tokens.revoke_user_refresh_tokens(session, current_user.id)
+        await session.commit()
+        return revoked
+
+    revoked = await writer.submit(revoke)
+    _end_session(response)
+    return {"message": "Logged out everywhere", "revoked": revoked}
@@ -1,29 +1,24 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
-from server.app import schemas
-from server.app.database import async_session_maker
+from server.app import models, schemas
 from server.app.crud import bought_course as crud_bought_courses
-from server.app.dependenses.auth_dependenses import get_current_user
-from server.app import models
+from server.app.dependenses.auth_dependenses import get_current_user, get_db, get_session_factory, get_writer
+from server.app.exports import ExportFormat, export_response
+from server.app.serialization import BOUGHT_COURSE_LIST, json_response
+from server.app.pagination import set_next_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.app.write_queue import WriteQueue
 
 router = APIRouter(prefix="/bought-courses", tags=["Bought Courses"])
 
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
-
 @router.post("/", response_model=schemas.BoughtCourse, status_code=status.HTTP_201_CREATED)
 async def create_bought_course(
     bought_course: schemas.BoughtCourseCreate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    return await crud_bought_courses.create_bought_course(session, bought_course)
+    return await writer.run(crud_bought_courses.create_bought_course, bought_course)
 
 
 @router.get("/{bought_id}", response_model=schemas.BoughtCourse)
@@ -36,67 +31,46 @@ async def read_bought_course(bought_id: int, session: AsyncSession = Depends(get
 
 @router.get("/user/me", response_model=List[schemas.BoughtCourse])
 async def read_my_bought_courses(
+    response: Response,
+    after: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     current_user=Depends(get_current_user),
     session: AsyncSession = Depends(get_db)
 ):
-    stmt = (
-        select(models.BoughtCourse)
-        .where(models.BoughtCourse.user_id == current_user.id)
-        .options(selectinload(models.BoughtCourse.course))
+    bought_courses, next_cursor = await crud_bought_courses.get_user_bought_courses(
+        session, current_user.id, after=after, limit=limit
     )
-    result = await session.execute(stmt)
-    bought_courses = result.scalars().all()
-    
-    response = []
-    for bc in bought_courses:
-        course_short = None
-        if bc.course:
-            course_short = schemas.CourseShort(
-                id=bc.course.id,
-                title=bc.course.title,
-                price=bc.course.price,
-                image_url=bc.course.image_url  # Теперь включаем image_url
-            )
-        
-        response.append(schemas.BoughtCourse(
-            id=bc.id,
-            user_id=bc.user_id,
-            course_id=bc.course_id,
-            course=course_short
-        ))
-    
-    return response
+    set_next_cursor(response, next_cursor)
+    # курс уже подгружен selectinload, CourseShort строится при единственной валидации
+    return json_response(BOUGHT_COURSE_LIST, bought_courses, response)
+
+
+@router.get("/user/me/export")
+async def export_my_bought_courses(
+    format: ExportFormat = "ndjson",
+    current_user=Depends(get_current_user),
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """История покупок текущего пользователя одним потоком NDJSON/CSV."""
+    stmt = crud_bought_courses.export_user_purchases_stmt(current_user.id)
+    return export_response(stmt, format, "purchases", session_factory, models.BoughtCourse.id)
 
 
 @router.get("/user/{user_id}", response_model=List[schemas.BoughtCourse])
-async def read_user_bought_courses(user_id: int, session: AsyncSession = Depends(get_db)):
+async def read_user_bought_courses(
+    user_id: int,
+    response: Response,
+    after: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_db)
+):
     # Аналогичная логика для других пользователей
-    stmt = (
-        select(models.BoughtCourse)
-        .where(models.BoughtCourse.user_id == user_id)
-        .options(selectinload(models.BoughtCourse.course))
+    bought_courses, next_cursor = await crud_bought_courses.get_user_bought_courses(
+        session, user_id, after=after, limit=limit
     )
-    result = await session.execute(stmt)
-    bought_courses = result.scalars().all()
-    
-    response = []
-    for bc in bought_courses:
-        course_short = None
-        if bc.course:
-            course_short = schemas.CourseShort(
-                id=bc.course.id,
-                title=bc.course.title,
-                price=bc.course.price
-            )
-        
-        response.append(schemas.BoughtCourse(
-            id=bc.id,
-            user_id=bc.user_id,
-            course_id=bc.course_id,
-            course=course_short
-        ))
-    
-    return response
+    set_next_cursor(response, next_cursor)
+    # курс уже подгружен selectinload, CourseShort строится при единственной валидации
+    return json_response(BOUGHT_COURSE_LIST, bought_courses, response)
 
 
 # Остальные методы остаются без изменений
@@ -104,9 +78,9 @@ async def read_user_bought_courses(user_id: int, session: AsyncSession = Depends
 async def update_bought_course(
     bought_id: int,
     bought_course: schemas.BoughtCourseUpdate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_bought_course = await crud_bought_courses.update_bought_course(session, bought_id, bought_course)
+    db_bought_course = await writer.run(crud_bought_courses.update_bought_course, bought_id, bought_course)
     if db_bought_course is None:
         raise HTTPException(status_code=404, detail=f"Bought course {bought_id} not found")
     return db_bought_course
@@ -116,17 +90,19 @@ async def update_bought_course(
 async def update_bought_course_partial(
     bought_id: int,
     bought_course: schemas.BoughtCourseUpdatePartial,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_bought_course = await crud_bought_courses.update_bought_course(session, bought_id, bought_course, partial=True)
+    db_bought_course = await writer.run(
+        crud_bought_courses.update_bought_course, bought_id, bought_course, partial=True
+    )
     if db_bought_course is None:
         raise HTTPException(status_code=404, detail=f"Bought course {bought_id} not found")
     return db_bought_course
 
 
 @router.delete("/{bought_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_bought_course(bought_id: int, session: AsyncSession = Depends(get_db)):
-    deleted = await crud_bought_courses.delete_bought_course(session, bought_id)
+async def delete_bought_course(bought_id: int, writer: WriteQueue = Depends(get_writer)):
+    deleted = await writer.run(crud_bought_courses.delete_bought_course, bought_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Bought course {bought_id} not found")
     return None
\ No newline at end of file
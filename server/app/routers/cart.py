@@ -1,30 +1,26 @@
 from typing import List
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from datetime import datetime
 
 from server.app import schemas
-from server.app.database import async_session_maker
 from server.app.crud import cart as crud_cart
-from server.app.crud import bought_course as crud_bought_courses
-from server.app.dependenses.auth_dependenses import get_current_user
+from server.app.dependenses.auth_dependenses import get_current_user, get_db, get_writer
+from server.app.write_queue import WriteQueue
+from server.app.recommendations import recommendations
+from server.app.counters import purchase_counters
+from server.app.serialization import CART_LIST, json_response
 
 router = APIRouter(prefix="/cart", tags=["Cart"])
 
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
-
 @router.post("/", response_model=schemas.Cart, status_code=status.HTTP_201_CREATED)
 async def add_to_cart(
     cart_item: schemas.CartCreate,
     current_user=Depends(get_current_user),
-    session: AsyncSession = Depends(get_db),
+    writer: WriteQueue = Depends(get_writer),
 ):
-    return await crud_cart.add_to_cart(
-        session=session,
+    return await writer.run(
+        crud_cart.add_to_cart,
         user_id=current_user.id,
         course_id=cart_item.course_id,
     )
@@ -35,7 +31,7 @@ async def read_my_cart(
     current_user=Depends(get_current_user),
     session: AsyncSession = Depends(get_db),
 ):
-    return await crud_cart.get_user_cart(session, current_user.id)
+    return json_response(CART_LIST, await crud_cart.get_user_cart(session, current_user.id))
 
 
 @router.delete("/{cart_id}", status_code=status.HTTP_204_NO_CONTENT)
@@ -43,64 +39,44 @@ async def delete_cart_item(
     cart_id: int,
     current_user=Depends(get_current_user),
     session: AsyncSession = Depends(get_db),
+    writer: WriteQueue = Depends(get_writer),
 ):
     cart_item = await crud_cart.get_cart_item(session, cart_id)
 
     if not cart_item or cart_item.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Forbidden")
 
-    await crud_cart.delete_cart_item(session, cart_id)
+    await writer.run(crud_cart.delete_cart_item, cart_id)
 
 
 @router.post("/checkout", status_code=status.HTTP_200_OK)
 async def checkout_cart(
     current_user=Depends(get_current_user),
-    session: AsyncSession = Depends(get_db),
+    writer: WriteQueue = Depends(get_writer),
 ):
-    # Получаем все курсы из корзины пользователя
-    cart_items = await crud_cart.get_user_cart(session, current_user.id)
-    
-    if not cart_items:
-        raise HTTPException(status_code=400, detail="Cart is empty")
-    
-    bought_courses = []
-    
     try:
-        # Создаем записи о покупке для каждого курса
-        for item in cart_items:
-            # Проверяем, не куплен ли уже этот курс
-            bought_course_data = schemas.BoughtCourseCreate(
-                user_id=current_user.id,
-                course_id=item.course_id,
-                bought_at=datetime.utcnow()
-            )
-            
-            # Создаем запись о покупке
-            bought_course = await crud_bought_courses.create_bought_course(
-                session, 
-                bought_course_data
-            )
-            bought_courses.append(bought_course)
-        
-        # Очищаем корзину
-        await crud_cart.clear_user_cart(session, current_user.id)
-        
-        await session.commit()
-        
+        # Покупки и очистка корзины — одной транзакцией (пачкой группового коммита)
+        bought_courses, cart_course_ids = await writer.run(crud_cart.checkout, current_user.id)
     except Exception as e:
-        await session.rollback()
         raise HTTPException(status_code=500, detail=f"Checkout failed: {str(e)}")
-    
+    if not cart_course_ids:
+        raise HTTPException(status_code=400, detail="Cart is empty")
+
+    recommendations.add_purchases((bc["id"], bc["user_id"], bc["course_id"]) for bc in bought_courses)
+    for bc in bought_courses:
+        purchase_counters.add(bc["course_id"])
+    purchased_ids = {bc["course_id"] for bc in bought_courses}
     return {
         "message": "Checkout successful", 
         "courses_count": len(bought_courses),
-        "bought_courses": bought_courses
+        "bought_courses": bought_courses,
+        "already_bought": [course_id for course_id in cart_course_ids if course_id not in purchased_ids],
     }
 
 
 @router.delete("/", status_code=status.HTTP_204_NO_CONTENT)
 async def clear_cart(
     current_user=Depends(get_current_user),
-    session: AsyncSession = Depends(get_db),
+    writer: WriteQueue = Depends(get_writer),
 ):
-    await crud_cart.clear_user_cart(session, current_user.id)
\ No newline at end of file
+    await writer.run(crud_cart.clear_user_cart, current_user.id)
\ No newline at end of file
@@ -1,34 +1,35 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from server.app import schemas
-from server.app.database import async_session_maker
+from server.app.dependenses.auth_dependenses import get_db, get_writer
+from server.app.write_queue import WriteQueue
 from server.app.crud import category as crud_categories
+from server.app.pagination import set_next_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.app.serialization import CATEGORY_LIST, json_response
+from server.app.dependenses.etag_dependenses import categories_etag
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
-
 @router.post("/", response_model=schemas.Category, status_code=status.HTTP_201_CREATED)
 async def create_category(
     category: schemas.CategoryCreate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    return await crud_categories.create_category(session, category)
+    return await writer.run(crud_categories.create_category, category)
 
 
-@router.get("/", response_model=List[schemas.Category])
+@router.get("/", response_model=List[schemas.Category], dependencies=[Depends(categories_etag)])
 async def read_categories(
-    skip: int = 0,
-    limit: int = 100,
+    response: Response,
+    after: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     session: AsyncSession = Depends(get_db)
 ):
-    categories_list = await crud_categories.get_categories(session)
-    return categories_list[skip:skip + limit]
+    categories_list, next_cursor = await crud_categories.get_categories(session, after=after, limit=limit)
+    set_next_cursor(response, next_cursor)
+    return json_response(CATEGORY_LIST, categories_list, response)
 
 
 @router.get("/{category_id}", response_model=schemas.Category)
@@ -43,9 +44,9 @@ async def read_category(category_id: int, session: AsyncSession = Depends(get_db
 async def update_category(
     category_id: int,
     category: schemas.CategoryUpdate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_category = await crud_categories.update_category(session, category_id, category)
+    db_category = await writer.run(crud_categories.update_category, category_id, category)
     if db_category is None:
         raise HTTPException(status_code=404, detail=f"Category {category_id} not found")
     return db_category
@@ -55,17 +56,17 @@ async def update_category(
 async def update_category_partial(
     category_id: int,
     category: schemas.CategoryUpdatePartial,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_category = await crud_categories.update_category(session, category_id, category, partial=True)
+    db_category = await writer.run(crud_categories.update_category, category_id, category, partial=True)
     if db_category is None:
         raise HTTPException(status_code=404, detail=f"Category {category_id} not found")
     return db_category
 
 
 @router.delete("/{category_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_category(category_id: int, session: AsyncSession = Depends(get_db)):
-    deleted = await crud_categories.delete_category(session, category_id)
+async def delete_category(category_id: int, writer: WriteQueue = Depends(get_writer)):
+    deleted = await writer.run(crud_categories.delete_category, category_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Category {category_id} not found")
     return None
\ No newline at end of file
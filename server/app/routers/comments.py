@@ -1,25 +1,24 @@
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from server.app import schemas
-from server.app.database import async_session_maker
+from server.app.dependenses.auth_dependenses import get_db, get_writer
+from server.app.write_queue import WriteQueue
 from server.app.crud import comment as crud_comments
+from server.app.pagination import set_next_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.app.serialization import COMMENT_LIST, json_response
+from server.app.dependenses.etag_dependenses import course_comments_etag
 
 router = APIRouter(prefix="/comments", tags=["Comments"])
 
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
-
 @router.post("/", response_model=schemas.Comment, status_code=status.HTTP_201_CREATED)
 async def create_comment(
     comment: schemas.CommentCreate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 
 ):
-    return await crud_comments.create_comment(session, comment)
+    return await writer.run(crud_comments.create_comment, comment)
 
 
 @router.get("/{comment_id}", response_model=schemas.Comment)
@@ -30,21 +29,28 @@ async def read_comment(comment_id: int, session: AsyncSession = Depends(get_db))
     return db_comment
 
 
-@router.get("/course/{course_id}", response_model=List[schemas.Comment])
+@router.get("/course/{course_id}", response_model=List[schemas.Comment], dependencies=[Depends(course_comments_etag)])
 async def read_course_comments(
     course_id: int,
+    response: Response,
+    after: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
     session: AsyncSession = Depends(get_db)
 ):
-    return await crud_comments.get_course_comments(session, course_id)
+    comments, next_cursor = await crud_comments.get_course_comments(
+        session, course_id, after=after, limit=limit
+    )
+    set_next_cursor(response, next_cursor)
+    return json_response(COMMENT_LIST, comments, response)
 
 
 @router.put("/{comment_id}", response_model=schemas.Comment)
 async def update_comment(
     comment_id: int,
     comment: schemas.CommentUpdate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_comment = await crud_comments.update_comment(session, comment_id, comment)
+    db_comment = await writer.run(crud_comments.update_comment, comment_id, comment)
     if db_comment is None:
         raise HTTPException(status_code=404, detail=f"Comment {comment_id} not found")
     return db_comment
@@ -54,17 +60,17 @@ async def update_comment(
 async def update_comment_partial(
     comment_id: int,
     comment: schemas.CommentUpdatePartial,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_comment = await crud_comments.update_comment(session, comment_id, comment, partial=True)
+    db_comment = await writer.run(crud_comments.update_comment, comment_id, comment, partial=True)
     if db_comment is None:
         raise HTTPException(status_code=404, detail=f"Comment {comment_id} not found")
     return db_comment
 
 
 @router.delete("/{comment_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_comment(comment_id: int, session: AsyncSession = Depends(get_db)):
-    deleted = await crud_comments.delete_comment(session, comment_id)
+async def delete_comment(comment_id: int, writer: WriteQueue = Depends(get_writer)):
+    deleted = await writer.run(crud_comments.delete_comment, comment_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Comment {comment_id} not found")
     return None
\ No newline at end of file
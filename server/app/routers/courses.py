@@ -1,56 +1,97 @@
-from typing import List, Optional
+from typing import List, Literal, Optional, Union
 from fastapi import UploadFile, File, Form
-from pathlib import Path
-import uuid
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Request
 from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 from sqlalchemy import and_
 from server.app import models
-from server.app.dependenses.auth_dependenses import get_current_user
+from server.app.dependenses.auth_dependenses import get_current_user, get_db, get_session_factory, get_writer
+from server.app.write_queue import WriteQueue, after_commit
 from server.app import schemas
-from server.app.database import async_session_maker
 from server.app.crud import course as crud_courses
-from pathlib import Path
-import os
+from server.app.crud import comment as crud_comments
+from server.app.pagination import paginate, set_next_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.app.cache import catalog_versions
+from server.app.dependenses.etag_dependenses import courses_etag
+from server.app.config import settings
+from server.app.uploads import save_upload, remove_file, static_file_path
+from server.app import course_import
+from server.app.exports import ExportFormat, export_response
+from server.app.recommendations import recommendations
+from server.app.serialization import COURSE_LIST, COURSE_LIST_WITH_FACETS, json_response
 
 
-STATIC_DIR = Path("static/images/courses")
-STATIC_DIR.mkdir(parents=True, exist_ok=True)
+STATIC_DIR = settings.static_dir / "images" / "courses"
 
 router = APIRouter(prefix="/courses", tags=["Courses"])
 
 
-async def get_db():
-    async with async_session_maker() as session:
-        yield session
-
-
 @router.post("/", response_model=schemas.Course, status_code=status.HTTP_201_CREATED)
 async def create_course(
     course: schemas.CourseCreate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    return await crud_courses.create_course(session, course)
+    return await writer.run(crud_courses.create_course, course)
 
 
-@router.get("/", response_model=List[schemas.Course])
+@router.post("/import", response_model=schemas.CourseImportReport)
+async def import_courses(
+    request: Request,
+    session: AsyncSession = Depends(get_db),
+    writer: WriteQueue = Depends(get_writer),
+    user: schemas.User = Depends(get_current_user),
+):
+    """Массовый импорт курсов из тела запроса (NDJSON или CSV с заголовком).
+
+    Тело читается потоком, строки проверяются по CourseCreate и
+    вставляются пачками; ошибочные строки попадают в отчёт.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    lines = course_import.iter_lines(request.stream(), settings.import_max_line_bytes)
+    if content_type in course_import.NDJSON_TYPES:
+        rows = course_import.iter_ndjson_rows(lines)
+    elif content_type in course_import.CSV_TYPES:
+        rows = course_import.iter_csv_rows(lines)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Expected application/x-ndjson or text/csv",
+        )
+
+    return await course_import.import_courses(
+        session,
+        writer,
+        rows,
+        owner_id=user.id,
+        batch_size=settings.import_batch_size,
+        max_errors=settings.import_max_errors,
+    )
+
+
+@router.get(
+    "/",
+    response_model=Union[List[schemas.Course], schemas.CourseListWithFacets],
+    dependencies=[Depends(courses_etag)],
+)
 async def read_courses(
+    response: Response,
     search: str | None = None,
     category_id: int | None = None,
     min_price: float | None = None,
     max_price: float | None = None,
-    skip: int = 0,
-    limit: int = 100,
+    min_rating: float | None = None,
+    sort: Literal["id", "price", "-price", "rating", "-rating"] | None = Query(
+        None, description="По умолчанию — по id, а с search — по релевантности"
+    ),
+    after: str | None = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    facets: bool = Query(False, description="Вернуть {items, facets} вместо списка"),
     session: AsyncSession = Depends(get_db),
 ):
     stmt = select(models.Course)
 
     filters = []
 
-    if search:
-        filters.append(models.Course.title.ilike(f"%{search}%"))
-
     if category_id:
         filters.append(models.Course.category_id == category_id)
 
@@ -60,13 +101,55 @@ async def read_courses(
     if max_price is not None:
         filters.append(models.Course.price <= max_price)
 
+    if min_rating is not None:
+        filters.append(models.Course.rating >= min_rating)
+
     if filters:
         stmt = stmt.where(and_(*filters))
 
-    stmt = stmt.offset(skip).limit(limit)
+    # ключ сортировки всегда заканчивается id, чтобы порядок был стабильным
+    order_by = [models.Course.id]
+    descending = False
+    if sort not in (None, "id"):
+        order_by = [getattr(models.Course, sort.lstrip("-")), models.Course.id]
+        descending = sort.startswith("-")
 
-    result = await session.execute(stmt)
-    return result.scalars().all()
+    if search:
+        stmt, search_order = crud_courses.apply_search(stmt, search)
+        # релевантность — только если порядок не задан явно
+        if search_order is not None and sort is None:
+            order_by, descending = search_order, False
+
+    courses, next_cursor = await paginate(
+        session, stmt, order_by, after=after, limit=limit, descending=descending
+    )
+    set_next_cursor(response, next_cursor)
+    if not facets:
+        return json_response(COURSE_LIST, courses, response)
+
+    return json_response(COURSE_LIST_WITH_FACETS, {
+        "items": courses,
+        "facets": await crud_courses.get_course_facets(
+            session,
+            search=search,
+            category_id=category_id,
+            min_price=min_price,
+            max_price=max_price,
+            min_rating=min_rating,
+        ),
+    }, response)
+
+
+@router.get("/export")
+async def export_courses(
+    format: ExportFormat = "ndjson",
+    category_id: int | None = None,
+    session_factory: async_sessionmaker = Depends(get_session_factory),
+):
+    """Весь каталог одним потоком NDJSON/CSV, без пагинации."""
+    return export_response(
+        crud_courses.export_courses_stmt(category_id), format, "courses", session_factory, models.Course.id,
+    )
 
 
 @router.post("/my", response_model=schemas.Course)
@@ -78,40 +161,50 @@ async def create_my_course(
     duration_hours: int = Form(...),
     category_id: int = Form(...),
     image: UploadFile = File(...),
-    session: AsyncSession = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    writer: WriteQueue = Depends(get_writer),
+    user: schemas.User = Depends(get_current_user),
 ):
-    filename = f"{uuid.uuid4()}_{image.filename}"
-    file_path = STATIC_DIR / filename
-
-    with open(file_path, "wb") as f:
-        f.write(await image.read())
-
-    course = models.Course(
-        title=title,
-        format=format,
-        description=description,
-        price=price,
-        duration_hours=duration_hours,
-        category_id=category_id,
-        owner_id=user.id,
-        image_url=f"/static/images/courses/{filename}",
+    filename, created = await save_upload(
+        image,
+        STATIC_DIR,
+        max_bytes=settings.max_image_upload_bytes,
+        allowed_types=settings.allowed_image_types,
     )
 
-    session.add(course)
-    await session.commit()
-    await session.refresh(course)
-    return course
+    async def create(session: AsyncSession) -> models.Course:
+        course = models.Course(
+            title=title,
+            format=format,
+            description=description,
+            price=price,
+            duration_hours=duration_hours,
+            category_id=category_id,
+            owner_id=user.id,
+            image_url=f"/static/images/courses/{filename}",
+        )
+        session.add(course)
+        await session.commit()
+        after_commit(session, catalog_versions.bump, "courses")
+        await session.refresh(course)
+        return course
+
+    try:
+        return await writer.run(create)
+    except Exception:
+        # файл с тем же содержимым мог уже принадлежать другому курсу
+        if created:
+            await remove_file(STATIC_DIR / filename)
+        raise
 
 @router.get("/my", response_model=list[schemas.Course])
 async def get_my_courses(
     session: AsyncSession = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    user: schemas.User = Depends(get_current_user),
 ):
     result = await session.execute(
         select(models.Course).where(models.Course.owner_id == user.id)
     )
-    return result.scalars().all()
+    return json_response(COURSE_LIST, result.scalars().all())
 
 
 @router.get("/by-category/{category_id}", response_model=schemas.Course)
@@ -121,64 +214,138 @@ async def read_course_by_category_id(category_id: int, session: AsyncSession = D
         raise HTTPException(status_code=404, detail=f"Course {category_id} not found")
     return db_course
 
-@router.get("/{course_id}", response_model=schemas.Course)
+@router.get("/{course_id}", response_model=schemas.Course, dependencies=[Depends(courses_etag)])
 async def read_course(course_id: int, session: AsyncSession = Depends(get_db)):
     db_course = await crud_courses.get_course(session, course_id)
     if db_course is None:
         raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
     return db_course
 
+@router.get("/{course_id}/full", response_model=schemas.CourseFull)
+async def read_course_full(
+    course_id: int,
+    comments_limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE),
+    session: AsyncSession = Depends(get_db),
+):
+    """Страница курса одним ответом: категория, владелец, рейтинг и
+    первая страница комментариев с авторами — всегда три запроса."""
+    db_course = await crud_courses.get_course_with_relations(session, course_id)
+    if db_course is None:
+        raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
+
+    comments, next_cursor = await crud_comments.get_course_comments(
+        session, course_id, limit=comments_limit, with_authors=True
+    )
+    distribution = await crud_comments.get_rating_distribution(session, course_id)
+
+    return schemas.CourseFull.model_validate({
+        **{field: getattr(db_course, field) for field in schemas.Course.model_fields},
+        "category": db_course.category,
+        "owner": db_course.owner,
+        "rating_summary": {
+            "rating": db_course.rating,
+            "rating_count": db_course.rating_count,
+            "distribution": distribution,
+        },
+        "comments": comments,
+        "comments_next_cursor": next_cursor,
+    })
+
+@router.get("/{course_id}/recommendations", response_model=list[schemas.CourseRecommendation])
+async def read_course_recommendations(
+    course_id: int,
+    limit: int = Query(10, ge=1, le=settings.recommendations_top_n),
+    session: AsyncSession = Depends(get_db),
+):
+    """«С этим курсом также покупают» из индекса в памяти."""
+    await recommendations.ensure_ready(session)
+    top = recommendations.top(course_id, limit)
+    if not top:
+        return []
+
+    courses = await session.execute(
+        select(models.Course).where(models.Course.id.in_([other_id for other_id, _ in top]))
+    )
+    by_id = {course.id: course for course in courses.scalars()}
+    return [
+        schemas.CourseRecommendation(
+            id=other_id,
+            title=by_id[other_id].title,
+            price=by_id[other_id].price,
+            image_url=by_id[other_id].image_url,
+            co_purchases=count,
+        )
+        for other_id, count in top
+        if other_id in by_id
+    ]
+
 @router.patch("/my/{course_id}", response_model=schemas.Course)
 async def update_my_course(
     course_id: int,
     data: schemas.CourseUpdatePartial,
-    session: AsyncSession = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    writer: WriteQueue = Depends(get_writer),
+    user: schemas.User = Depends(get_current_user),
 ):
-    course = await session.get(models.Course, course_id)
+    async def update(session: AsyncSession) -> models.Course:
+        course = await session.get(models.Course, course_id)
+
+        if not course or course.owner_id != user.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
 
-    if not course or course.owner_id != user.id:
-        raise HTTPException(status_code=403, detail="Forbidden")
+        for k, v in data.model_dump(exclude_unset=True).items():
+            setattr(course, k, v)
 
-    for k, v in data.model_dump(exclude_unset=True).items():
-        setattr(course, k, v)
+        await session.commit()
+        after_commit(session, catalog_versions.bump, "courses")
+        await session.refresh(course)
+        return course
 
-    await session.commit()
-    await session.refresh(course)
-    return course
+    return await writer.run(update)
 
 
 @router.delete("/my/{course_id}", status_code=204)
 async def delete_my_course(
     course_id: int,
-    session: AsyncSession = Depends(get_db),
-    user: models.User = Depends(get_current_user),
+    writer: WriteQueue = Depends(get_writer),
+    user: schemas.User = Depends(get_current_user),
 ):
-    course = await session.get(models.Course, course_id)
+    async def delete(session: AsyncSession) -> str | None:
+        """Удаляет курс; возвращает URL картинки, которая больше никому не нужна."""
+        course = await session.get(models.Course, course_id)
+
+        if not course:
+            raise HTTPException(status_code=404, detail="Course not found")
 
-    if not course:
-        raise HTTPException(status_code=404, detail="Course not found")
+        if course.owner_id != user.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
 
-    if course.owner_id != user.id:
-        raise HTTPException(status_code=403, detail="Forbidden")
+        image_url = course.image_url
+        await session.delete(course)
+        await session.commit()
+        after_commit(session, catalog_versions.bump, "courses")
 
-    # удаляем картинку, если она не дефолтная
-    if course.image_url and "default.png" not in course.image_url:
-        file_path = Path(course.image_url.lstrip("/"))
-        if file_path.exists():
-            os.remove(file_path)
+        # картинка не дефолтная и не нужна другим курсам (имя — по содержимому)
+        if image_url and "default.png" not in image_url:
+            still_used = await session.scalar(
+                select(models.Course.id).where(models.Course.image_url == image_url).limit(1)
+            )
+            if still_used is None:
+                return image_url
+        return None
 
-    await session.delete(course)
-    await session.commit()
+    image_url = await writer.run(delete)
+    path = static_file_path(image_url, settings.static_dir, STATIC_DIR) if image_url else None
+    if path is not None:
+        await remove_file(path)
 
 
 @router.put("/{course_id}", response_model=schemas.Course)
 async def update_course(
     course_id: int,
     course: schemas.CourseUpdate,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_course = await crud_courses.update_course(session, course_id, course)
+    db_course = await writer.run(crud_courses.update_course, course_id, course)
     if db_course is None:
         raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
     return db_course
@@ -188,17 +355,17 @@ async def update_course(
 async def update_course_partial(
     course_id: int,
     course: schemas.CourseUpdatePartial,
-    session: AsyncSession = Depends(get_db)
+    writer: WriteQueue = Depends(get_writer)
 ):
-    db_course = await crud_courses.update_course(session, course_id, course, partial=True)
+    db_course = await writer.run(crud_courses.update_course, course_id, course, partial=True)
     if db_course is None:
         raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
     return db_course
 
 
 @router.delete("/{course_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_course(course_id: int, session: AsyncSession = Depends(get_db)):
-    deleted = await crud_courses.delete_course(session, course_id)
+async def delete_course(course_id: int, writer: WriteQueue = Depends(get_writer)):
+    deleted = await writer.run(crud_courses.delete_course, course_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"Course {course_id} not found")
     return None
\ No newline at end of file
@@ -1,11 +1,14 @@
 # app/routers/users.py
-from fastapi import APIRouter, Depends, HTTPException, status, Cookie
+from fastapi import APIRouter, Depends, HTTPException, status, Cookie, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from server.app.dependenses.auth_dependenses import get_current_user, get_db
+from server.app.dependenses.auth_dependenses import get_current_user, get_db, get_writer
+from server.app.security import password_hasher
+from server.app.write_queue import WriteQueue
 from server.app import schemas
-from server.app.database import async_session_maker
 from server.app.crud import users as crud_users
+from server.app.pagination import set_next_cursor, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.app.serialization import USER_LIST, json_response
 
 SECRET_KEY = "super_secret_key"
 ALGORITHM = "HS256"
@@ -13,8 +16,17 @@ ALGORITHM = "HS256"
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
+async def _hash_new_password(user: schemas.UserUpdate | schemas.UserUpdatePartial) -> str | None:
+    password = getattr(user, "password", None)
+    return await password_hasher.hash(password) if password else None
+
+
 @router.post("/", response_model=schemas.User, status_code=status.HTTP_201_CREATED)
-async def create_user(user: schemas.UserCreate, session: AsyncSession = Depends(get_db)):
+async def create_user(
+        user: schemas.UserCreate,
+        session: AsyncSession = Depends(get_db),
+        writer: WriteQueue = Depends(get_writer),
+):
     db_user = await crud_users.get_user_by_email(session, email=user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
@@ -23,17 +35,21 @@ async def create_user(user: schemas.UserCreate, session: AsyncSession = Depends(
     if db_user:
         raise HTTPException(status_code=400, detail="Username already taken")
 
-    return await crud_users.create_user(session=session, user=user)
+    # bcrypt — до очереди, чтобы не задерживать пачку
+    hashed_password = await password_hasher.hash(user.password)
+    return await writer.run(crud_users.create_user, user=user, hashed_password=hashed_password)
 
 
 @router.get("/", response_model=list[schemas.User])
 async def read_users(
-        skip: int = 0,
-        limit: int = 100,
+        response: Response,
+        after: str | None = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
         session: AsyncSession = Depends(get_db)
 ):
-    users_list = await crud_users.get_users(session)
-    return users_list[skip:skip + limit]
+    users_list, next_cursor = await crud_users.get_users(session, after=after, limit=limit)
+    set_next_cursor(response, next_cursor)
+    return json_response(USER_LIST, users_list, response)
 
 # ---------- Новый маршрут /me ----------
 @router.get("/me", response_model=schemas.User)
@@ -69,9 +85,9 @@ async def read_user_by_username(username: str, session: AsyncSession = Depends(g
 async def update_user(
         user_id: int,
         user: schemas.UserUpdate,
-        session: AsyncSession = Depends(get_db)
+        writer: WriteQueue = Depends(get_writer)
 ):
-    db_user = await crud_users.update_user(session, user_id, user)
+    db_user = await writer.run(crud_users.update_user, user_id, user, hashed_password=await _hash_new_password(user))
     if db_user is None:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
     return db_user
@@ -81,17 +97,19 @@ async def update_user(
 async def update_user_partial(
         user_id: int,
         user: schemas.UserUpdatePartial,
-        session: AsyncSession = Depends(get_db)
+        writer: WriteQueue = Depends(get_writer)
 ):
-    db_user = await crud_users.update_user(session, user_id, user, partial=True)
+    db_user = await writer.run(
+        crud_users.update_user, user_id, user, partial=True, hashed_password=await _hash_new_password(user)
+    )
     if db_user is None:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
     return db_user
 
 
 @router.delete("/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_user(user_id: int, session: AsyncSession = Depends(get_db)):
-    deleted = await crud_users.delete_user(session, user_id)
+async def delete_user(user_id: int, writer: WriteQueue = Depends(get_writer)):
+    deleted = await writer.run(crud_users.delete_user, user_id)
     if not deleted:
         raise HTTPException(status_code=404, detail=f"User {user_id} not found")
     return None
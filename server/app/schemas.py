@@ -1,5 +1,6 @@
 from pydantic import BaseModel, ConfigDict, EmailStr
 from typing import Optional
+from datetime import datetime
 
 from pydantic import BaseModel, EmailStr
 from typing import Optional
@@ -65,7 +66,6 @@ class CourseBase(BaseModel):
     description: str
     price: float
     duration_hours: int
-    rating: float
     category_id: int
 
 
@@ -83,20 +83,55 @@ class CourseUpdatePartial(BaseModel):
     description: Optional[str] = None
     price: Optional[float] = None
     duration_hours: Optional[int] = None
-    rating: Optional[float] = None
     category_id: Optional[int] = None
-    image_url: Optional[str] = None
 
 
 class Course(CourseBase):
     id: int
     image_url: str
     owner_id: Optional[int] = None
+    # считаются по комментариям, клиент их не задаёт
+    rating: float = 0
+    rating_count: int = 0
 
     class Config:
         from_attributes = True
 
 
+class CourseImportError(BaseModel):
+    line: int
+    errors: list[str]
+
+
+class CourseImportReport(BaseModel):
+    imported: int
+    failed: int
+    errors: list[CourseImportError]
+    errors_truncated: bool
+
+
+class CategoryFacet(BaseModel):
+    category_id: int
+    count: int
+
+
+class PriceBucketFacet(BaseModel):
+    bucket: str
+    min: float
+    max: Optional[float] = None
+    count: int
+
+
+class CourseFacets(BaseModel):
+    categories: list[CategoryFacet]
+    price_buckets: list[PriceBucketFacet]
+
+
+class CourseListWithFacets(BaseModel):
+    items: list[Course]
+    facets: CourseFacets
+
+
 class CourseShort(BaseModel):
     id: int
     title: str
@@ -107,6 +142,11 @@ class CourseShort(BaseModel):
         from_attributes = True
 
 
+class CourseRecommendation(CourseShort):
+    # сколько покупателей курса купили и этот
+    co_purchases: int
+
+
 # ================== CART ==================
 
 class CartCreate(BaseModel):
@@ -193,6 +233,37 @@ class Comment(CommentBase):
 
 
 
+# ================== COURSE DETAIL ==================
+
+class UserProfile(BaseModel):
+    id: int
+    username: str
+    avatar_url: Optional[str] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class CommentWithAuthor(Comment):
+    created_at: datetime
+    user: Optional[UserProfile] = None
+
+
+class RatingSummary(BaseModel):
+    rating: float
+    rating_count: int
+    # оценка -> число комментариев с ней
+    distribution: dict[int, int]
+
+
+class CourseFull(Course):
+    category: Optional[Category] = None
+    owner: Optional[UserProfile] = None
+    rating_summary: RatingSummary
+    comments: list[CommentWithAuthor]
+    # продолжение — GET /comments/course/{id}?after=...
+    comments_next_cursor: Optional[str] = None
+
+
 from pydantic import BaseModel, EmailStr
 
 
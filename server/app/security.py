@@ -1,13 +1,23 @@
 # server/app/security.py
+import asyncio
+import hashlib
+import hmac
+import multiprocessing
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from jose import jwt
 from passlib.context import CryptContext
 
+from server.app.config import settings
+
 SECRET_KEY = "super_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt_sha256 оставлен, чтобы проверять хэши, созданные через /users/
+pwd_context = CryptContext(schemes=["bcrypt", "bcrypt_sha256"], deprecated="auto")
 
 
 def hash_password(password: str) -> str:
@@ -18,6 +28,88 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+class PasswordHasher:
+    """Выполняет bcrypt в пуле процессов, не блокируя event loop.
+
+    Одновременно в пул отправляется не больше max_concurrency задач,
+    остальные ждут в очереди на семафоре.
+    """
+
+    def __init__(self, max_workers: int, max_concurrency: int):
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency
+        self._executor: ProcessPoolExecutor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self.waiting = 0
+        self.running = 0
+        self.completed = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    async def _run(self, func, *args):
+        semaphore = self._get_semaphore()
+        queued_at = time.perf_counter()
+        self.waiting += 1
+        try:
+            await semaphore.acquire()
+        finally:
+            self.waiting -= 1
+
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - queued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            semaphore.release()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(hash_password, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "waiting": self.waiting,
+            "running": self.running,
+            "completed": self.completed,
+            "avg_wait_ms": round(self.total_wait_seconds / completed * 1000, 3),
+            "avg_run_ms": round(self.total_run_seconds / completed * 1000, 3),
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.password_hash_workers,
+    max_concurrency=settings.password_hash_max_concurrency,
+)
+
+
 def create_access_token(data: dict, expires_delta: timedelta | None = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (
@@ -26,3 +118,11 @@ def create_access_token(data: dict, expires_delta: timedelta | None = None) -> s
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+
+def new_refresh_token() -> str:
+    return secrets.token_urlsafe(32)
+
+
+def refresh_token_digest(token: str) -> bytes:
+    """HMAC от refresh-токена — ключ поиска в БД; проверка стоит микросекунды, а не bcrypt."""
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).digest()
@@ -0,0 +1,80 @@
+# server/app/serialization.py
+# Быстрый путь для списков: одна валидация готовым TypeAdapter и orjson.
+#
+# Обычный путь FastAPI проверяет возвращённые объекты по response_model и
+# затем кодирует результат стандартным json. Здесь ORM-строки проверяются
+# один раз, а байты ответа собирает orjson; response_model у маршрута
+# остаётся ради OpenAPI, FastAPI его не применяет, так как получает Response.
+from typing import Any
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter
+
+from server.app import schemas
+
+JSON_MEDIA_TYPE = "application/json"
+
+COURSE_LIST = TypeAdapter(list[schemas.Course])
+COURSE_LIST_WITH_FACETS = TypeAdapter(schemas.CourseListWithFacets)
+CATEGORY_LIST = TypeAdapter(list[schemas.Category])
+COMMENT_LIST = TypeAdapter(list[schemas.Comment])
+USER_LIST = TypeAdapter(list[schemas.User])
+CART_LIST = TypeAdapter(list[schemas.Cart])
+BOUGHT_COURSE_LIST = TypeAdapter(list[schemas.BoughtCourse])
+
+
+def _fields(schema: type[BaseModel]) -> frozenset[str]:
+    return frozenset(field.alias or name for name, field in schema.model_fields.items())
+
+
+# поля ORM-объектов, которые проверяет каждый адаптер
+_ITEM_FIELDS = {
+    COURSE_LIST: _fields(schemas.Course),
+    COURSE_LIST_WITH_FACETS: _fields(schemas.Course),
+    CATEGORY_LIST: _fields(schemas.Category),
+    COMMENT_LIST: _fields(schemas.Comment),
+    USER_LIST: _fields(schemas.User),
+    CART_LIST: _fields(schemas.Cart),
+    BOUGHT_COURSE_LIST: _fields(schemas.BoughtCourse),
+}
+
+
+def _loaded_state(content: Any, fields: frozenset[str]) -> Any:
+    """ORM-объекты -> их __dict__, если в нём загружены все поля схемы.
+
+    Валидация словаря в несколько раз быстрее, чем from_attributes через
+    инструментированные атрибуты SQLAlchemy. Объект, у которого поле истекло
+    или связь не загружена, остаётся объектом: иначе схема молча подставила
+    бы значение по умолчанию. Вложенные связи проверяются через from_attributes.
+    """
+    if isinstance(content, list):
+        return [
+            vars(item) if hasattr(item, "_sa_instance_state") and fields <= vars(item).keys() else item
+            for item in content
+        ]
+    if isinstance(content, dict):
+        return {key: _loaded_state(value, fields) for key, value in content.items()}
+    return content
+
+
+def dump(adapter: TypeAdapter, content: Any) -> bytes:
+    fields = _ITEM_FIELDS.get(adapter)
+    if fields is not None:
+        content = _loaded_state(content, fields)
+    validated = adapter.validate_python(content, from_attributes=True)
+    return orjson.dumps(adapter.dump_python(validated), option=orjson.OPT_NON_STR_KEYS)
+
+
+def json_response(
+    adapter: TypeAdapter,
+    content: Any,
+    response: Response | None = None,
+    status_code: int = 200,
+) -> Response:
+    """Готовый JSON-ответ; заголовки, выставленные зависимостями
+    и обработчиком в response (ETag, X-Next-Cursor), переносятся."""
+    fast = Response(dump(adapter, content), status_code=status_code, media_type=JSON_MEDIA_TYPE)
+    if response is not None:
+        fast.headers.raw.extend(response.headers.raw)
+    return fast
@@ -0,0 +1,107 @@
+# server/app/startup.py
+# Подготовка воркера до того, как он начнёт принимать запросы.
+#
+# Lifespan приложения выполняет эти шаги до yield, а uvicorn открывает
+# сокет только после него, поэтому первый запрос не платит за них:
+#   - ревизия схемы в БД совпадает с головой миграций alembic — воркер
+#     со старой схемой не стартует, вместо 500 на первых запросах;
+#   - пулы открывают соединения заранее;
+#   - горячие SELECT-ы выполняются по разу на каждом движке: их SQL
+#     компилируется в кэш выражений, а страницы индексов попадают в кэш SQLite.
+# Длительность шагов видна в /health/startup.
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from server.app import models
+from server.app.config import BASE_DIR
+from server.app.crud import bought_course as crud_bought_courses
+from server.app.crud import cart as crud_cart
+from server.app.crud import category as crud_categories
+from server.app.crud import comment as crud_comments
+from server.app.crud import course as crud_courses
+from server.app.crud import users as crud_users
+from server.app.db_helper import DatabaseHelper
+from server.app.pagination import paginate
+
+ALEMBIC_INI = BASE_DIR / "alembic.ini"
+
+# те же выражения, что строят обработчики самых частых GET: ключи кэша совпадают,
+# а LIMIT в SQLAlchemy — параметр и на ключ не влияет
+HOT_READS: tuple[Callable[[AsyncSession], Awaitable], ...] = (
+    lambda session: paginate(session, select(models.Course), [models.Course.id], limit=1),
+    lambda session: crud_courses.get_course(session, 0),
+    lambda session: crud_categories.get_categories(session, limit=1),
+    lambda session: crud_comments.get_course_comments(session, 0, limit=1),
+    lambda session: crud_users.get_user(session, 0),
+    lambda session: crud_cart.get_user_cart(session, 0),
+    lambda session: crud_bought_courses.get_user_bought_courses(session, 0, limit=1),
+)
+
+
+class SchemaRevisionError(RuntimeError):
+    pass
+
+
+def schema_heads() -> set[str]:
+    """Головные ревизии из server/alembic/versions."""
+    # alembic нужен только при старте, не при импорте
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    return set(ScriptDirectory.from_config(Config(str(ALEMBIC_INI))).get_heads())
+
+
+async def current_revisions(engine: AsyncEngine) -> set[str]:
+    """Ревизии, записанные в alembic_version (пусто, если таблицы нет)."""
+    from alembic.runtime.migration import MigrationContext
+
+    def read(sync_conn) -> tuple[str, ...]:
+        return MigrationContext.configure(sync_conn).get_current_heads()
+
+    async with engine.connect() as conn:
+        return set(await conn.run_sync(read))
+
+
+async def check_schema_revision(engine: AsyncEngine) -> set[str]:
+    expected = schema_heads()
+    current = await current_revisions(engine)
+    if current != expected:
+        raise SchemaRevisionError(
+            f"Database schema revision {sorted(current) or 'none'} does not match "
+            f"migrations head {sorted(expected)}; run `alembic upgrade head`"
+        )
+    return current
+
+
+async def precompile_hot_reads(helper: DatabaseHelper) -> int:
+    async with helper.session_factory() as session:
+        for read in HOT_READS:
+            await read(session)
+    return len(HOT_READS)
+
+
+class StartupTimings:
+    """Длительность шагов подготовки воркера, мс."""
+
+    def __init__(self):
+        self.steps: dict[str, float] = {}
+        self.ready = False
+
+    @contextmanager
+    def step(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.steps[name] = round((time.perf_counter() - started) * 1000, 1)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "total_ms": round(sum(self.steps.values()), 1),
+            "steps": dict(self.steps),
+        }
@@ -0,0 +1,96 @@
+# server/app/static_files.py
+# Раздача статики с кэшированием под неизменяемые URL.
+#
+# Загруженные картинки называются по хэшу содержимого (<sha256[:32]>.<ext>),
+# поэтому их URL никогда не меняет смысл: ответ получает
+# Cache-Control: immutable на год и сильный ETag из того же хэша, и
+# повторные просмотры страниц вообще не обращаются к приложению за ними.
+# Остальные файлы (default.png и старые имена) кэшируются с перепроверкой,
+# ETag у них — из mtime и размера, как у Starlette: хэшировать файл целиком
+# на каждом промахе значило бы читать его в event loop.
+# Range и If-Range обрабатывает FileResponse.
+# Если клиент принимает gzip и рядом лежит file.gz, отдаётся он.
+import mimetypes
+import os
+import re
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+# уже сжатые форматы (jpeg/png/webp/gif) повторно не сжимаются
+COMPRESSIBLE_TYPES = {"image/svg+xml", "text/css", "text/plain", "application/javascript", "application/json"}
+
+HASH_LENGTH = 32
+_HASHED_NAME = re.compile(rf"^([0-9a-f]{{{HASH_LENGTH}}})\.[0-9a-z]+$")
+
+
+def content_hashed_name(hexdigest: str, extension: str) -> str:
+    return f"{hexdigest[:HASH_LENGTH]}{extension.lower()}"
+
+
+def content_hash_of(name: str) -> str | None:
+    """Хэш из имени файла вида <hash>.<ext> или None для прочих имён."""
+    match = _HASHED_NAME.match(name)
+    return match.group(1) if match else None
+
+
+def _stat_etag(stat_result: os.stat_result) -> str:
+    return f"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"
+
+
+def _accepts_gzip(headers: Headers) -> bool:
+    return any(
+        part.split(";")[0].strip() == "gzip"
+        for part in headers.get("accept-encoding", "").split(",")
+    )
+
+
+class ImmutableStaticFiles(StaticFiles):
+    def file_response(
+        self,
+        full_path,
+        stat_result: os.stat_result,
+        scope: Scope,
+        status_code: int = 200,
+    ) -> Response:
+        request_headers = Headers(scope=scope)
+        full_path = os.fspath(full_path)
+        content_hash = content_hash_of(os.path.basename(full_path))
+        headers = {
+            "cache-control": IMMUTABLE_CACHE_CONTROL if content_hash else REVALIDATE_CACHE_CONTROL,
+            "vary": "Accept-Encoding",
+        }
+        etag = content_hash or _stat_etag(stat_result)
+        media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+
+        response = None
+        # на Range отдаём исходный файл: диапазон в сжатом потоке клиенту не пригодится
+        if "range" not in request_headers and _accepts_gzip(request_headers):
+            gzip_path = f"{full_path}.gz"
+            try:
+                gzip_stat = os.stat(gzip_path)
+            except OSError:
+                gzip_stat = None
+            if gzip_stat is not None:
+                response = FileResponse(
+                    gzip_path,
+                    status_code=status_code,
+                    stat_result=gzip_stat,
+                    media_type=media_type,
+                    headers={**headers, "etag": f'"{etag}-gz"', "content-encoding": "gzip"},
+                )
+        if response is None:
+            response = FileResponse(
+                full_path,
+                status_code=status_code,
+                stat_result=stat_result,
+                media_type=media_type,
+                headers={**headers, "etag": f'"{etag}"'},
+            )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
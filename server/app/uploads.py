@@ -0,0 +1,165 @@
+# server/app/uploads.py
+import asyncio
+import gzip
+import hashlib
+import mimetypes
+import os
+import uuid
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+from fastapi import HTTPException, UploadFile, status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+from server.app.static_files import COMPRESSIBLE_TYPES, content_hashed_name
+
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# текстовые поля формы и границы multipart сверх самой картинки
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+class SavedUpload(NamedTuple):
+    filename: str
+    # False — такой же файл уже был сохранён раньше (имя по содержимому)
+    created: bool
+
+
+def _write_chunk(fd: int, chunk: bytes) -> None:
+    view = memoryview(chunk)
+    while view:
+        written = os.write(fd, view)
+        view = view[written:]
+
+
+def _discard(path: Path) -> None:
+    try:
+        path.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def write_gzip_sibling(path: Path) -> bool:
+    """Кладёт рядом path.gz, если сжатие заметно уменьшает файл."""
+    data = path.read_bytes()
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) > len(data) * 0.9:
+        return False
+    part_path = path.with_name(f".{path.name}.gz.part")
+    part_path.write_bytes(compressed)
+    os.replace(part_path, path.with_name(f"{path.name}.gz"))
+    return True
+
+
+async def save_upload(
+    upload: UploadFile,
+    directory: Path,
+    max_bytes: int,
+    allowed_types: set[str],
+) -> SavedUpload:
+    """Сохраняет загруженный файл в directory под именем из хэша содержимого.
+
+    К вызову обработчика Starlette уже разобрал multipart во временный файл,
+    поэтому max_bytes здесь проверяет размер картинки, а размер всего тела
+    ограничивает UploadSizeLimitMiddleware. Копия пишется кусками во
+    временный .part вне event loop и атомарно переименовывается.
+    Одинаковые картинки хранятся один раз, а URL неизменяем и кэшируется
+    навсегда. Для сжимаемых типов рядом пишется .gz.
+    """
+    if upload.content_type not in allowed_types:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail=f"Unsupported image type: {upload.content_type}",
+        )
+
+    original_name = Path(upload.filename or "image").name
+    extension = mimetypes.guess_extension(upload.content_type) or Path(original_name).suffix.lower()
+    part_path = directory / f".{uuid.uuid4()}.part"
+    digest = hashlib.sha256()
+
+    fd = await asyncio.to_thread(os.open, part_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+    size = 0
+    try:
+        try:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(
+                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                        detail=f"Image is larger than {max_bytes} bytes",
+                    )
+                digest.update(chunk)
+                await asyncio.to_thread(_write_chunk, fd, chunk)
+        finally:
+            await asyncio.to_thread(os.close, fd)
+
+        filename = content_hashed_name(digest.hexdigest(), extension)
+        final_path = directory / filename
+        if await asyncio.to_thread(final_path.exists):
+            await asyncio.to_thread(_discard, part_path)
+            return SavedUpload(filename, created=False)
+        await asyncio.to_thread(os.replace, part_path, final_path)
+    except BaseException:
+        await asyncio.to_thread(_discard, part_path)
+        raise
+    if upload.content_type in COMPRESSIBLE_TYPES:
+        await asyncio.to_thread(write_gzip_sibling, final_path)
+    return SavedUpload(filename, created=True)
+
+
+def static_file_path(url: str, static_dir: Path, allowed_dir: Path) -> Path | None:
+    """Файл по URL вида /static/...; None, если путь выходит за allowed_dir.
+
+    image_url лежит в БД, поэтому ему не доверяем: абсолютный путь или
+    ../ не должны дать удалить или переименовать чужой файл.
+    """
+    if not url.startswith("/static/"):
+        return None
+    path = (static_dir / url.removeprefix("/static/")).resolve()
+    return path if path.is_relative_to(allowed_dir.resolve()) else None
+
+
+async def remove_file(path: Path) -> None:
+    await asyncio.to_thread(_discard, path)
+    await asyncio.to_thread(_discard, path.with_name(f"{path.name}.gz"))
+
+
+class UploadSizeLimitMiddleware:
+    """Ограничивает тело запросов загрузки до того, как его разберут в файл.
+
+    Content-Length больше лимита отклоняется сразу; тело без длины
+    (chunked) считается по мере чтения и обрывается с 413 на превышении.
+    """
+
+    def __init__(self, app, paths: set[str], max_bytes: Callable[[], int]):
+        self.app = app
+        self.paths = paths
+        # лимит читается на каждый запрос: он зависит от settings
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self.max_bytes()
+        detail = f"Request body is larger than {limit} bytes"
+        length = Headers(scope=scope).get("content-length")
+        if length is not None and length.isdigit() and int(length) > limit:
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # HTTPException из разбора тела FastAPI пропускает как есть
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
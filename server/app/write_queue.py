@@ -0,0 +1,277 @@
+# server/app/write_queue.py
+# Групповой коммит для SQLite: один писатель на процесс.
+#
+# Пишущие обработчики не коммитят каждый в своей сессии (fsync на запрос и
+# "database is locked" при конкуренции), а ставят операцию в очередь.
+# Отдельная задача забирает до max_batch операций, подождав новые не дольше
+# max_wait, и выполняет их в одной транзакции — каждую в своём SAVEPOINT.
+# Ошибка операции откатывает только её точку сохранения и возвращается её
+# вызывающему; ошибка общего COMMIT — всем операциям пачки.
+#
+# У писателя свой движок с одним соединением. pysqlite сам не открывает
+# транзакцию перед SAVEPOINT, поэтому BEGIN IMMEDIATE выдаётся явно
+# (рецепт из документации SQLAlchemy для sqlite/aiosqlite).
+#
+# Операции — обычные crud-функции (session, *args). Их session.commit()
+# внутри пачки только сбрасывает изменения, session.rollback() откатывает
+# свою точку сохранения. Побочные эффекты после commit() (версии ETag,
+# кэши, счётчики) crud регистрирует через after_commit(): внутри пачки они
+# выполняются только после удавшегося COMMIT всей пачки, иначе конкурентный
+# GET успел бы закэшировать старые данные под новой версией.
+# Операция выполняется в контексте вызывающего (contextvars), поэтому её
+# запросы попадают в метрики и бюджет запросов своего HTTP-запроса.
+# Операция не должна ждать ничего, кроме БД: пока она выполняется,
+# остальные пишущие запросы стоят в очереди.
+# Через очередь идут все записи приложения, включая сброс счётчиков.
+# Вне её пишут только команды server.app.maintenance: это отдельный
+# процесс, который при конкуренции ждёт блокировку SQLite (busy_timeout).
+#
+# Писатель не должен ждать читателей, поэтому файловая БД переводится в
+# WAL (db_helper.sqlite_pragmas): в режиме rollback journal любой долгий
+# читатель — потоковая выгрузка, недочитанный курсор, реплика на том же
+# файле — держит SHARED-блокировку, и COMMIT падает сразу для всей пачки.
+import asyncio
+import contextvars
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+
+from server.app.config import settings
+from server.app.db_helper import _is_file_db, sqlite_pragmas, warm_pool
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+IN_BATCH = "group_commit"
+AFTER_COMMIT = "after_commit"
+
+
+def after_commit(session: AsyncSession | Session, callback: Callable[..., Any], *args) -> None:
+    """Выполняет callback(*args) после реального COMMIT.
+
+    Вызывается сразу после session.commit(): вне пачки COMMIT уже прошёл и
+    callback выполняется немедленно, в пачке — откладывается до её COMMIT
+    и отбрасывается, если операция или пачка откатились.
+    """
+    pending = session.info.get(AFTER_COMMIT)
+    if pending is None:
+        callback(*args)
+    else:
+        pending.append((callback, args))
+
+
+class GroupCommitSession(Session):
+    """Сессия писателя: внутри пачки commit/rollback касаются только своей операции."""
+
+    def commit(self) -> None:
+        if self.info.get(IN_BATCH):
+            self.flush()
+            return
+        super().commit()
+
+    def rollback(self) -> None:
+        savepoint = self.get_nested_transaction() if self.info.get(IN_BATCH) else None
+        if savepoint is not None:
+            savepoint.rollback()
+            return
+        super().rollback()
+
+
+def _manual_transactions(dbapi_connection, connection_record) -> None:
+    dbapi_connection.isolation_level = None
+
+
+def _begin_immediate(conn) -> None:
+    conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+@dataclass(slots=True)
+class _Write:
+    operation: Callable[[AsyncSession], Awaitable[Any]]
+    future: asyncio.Future
+    context: contextvars.Context
+
+
+class WriteQueue:
+    """Очередь операций записи с групповым коммитом.
+
+    Движок создаётся при первом обращении, писатель — при первой операции
+    в текущем event loop; останавливается через stop().
+    """
+
+    def __init__(self, url: str, max_batch: int, max_wait: float, echo: bool = False, busy_timeout: float = 5):
+        self.url = url
+        self.echo = echo
+        self.busy_timeout = busy_timeout
+        self._engine: AsyncEngine | None = None
+        self._session_factory: async_sessionmaker | None = None
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: asyncio.Queue[_Write] | None = None
+        self._task: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.batches = 0
+        self.writes = 0
+        self.max_batch_seen = 0
+        self._last_batch = 0
+
+    @property
+    def engine(self) -> AsyncEngine:
+        if self._engine is None:
+            pool_kwargs = {"pool_size": 1, "max_overflow": 0} if _is_file_db(self.url) else {}
+            self._engine = create_async_engine(self.url, echo=self.echo, **pool_kwargs)
+            event.listen(self._engine.sync_engine, "connect", _manual_transactions)
+            if _is_file_db(self.url):
+                sqlite_pragmas(self._engine, wal=True, busy_timeout=self.busy_timeout)
+            event.listen(self._engine.sync_engine, "begin", _begin_immediate)
+        return self._engine
+
+    @property
+    def session_factory(self) -> async_sessionmaker:
+        if self._session_factory is None:
+            self._session_factory = async_sessionmaker(
+                bind=self.engine,
+                autoflush=False,
+                expire_on_commit=False,
+                sync_session_class=GroupCommitSession,
+            )
+        return self._session_factory
+
+    async def warm_up(self) -> int:
+        """Открывает соединение писателя заранее."""
+        return await warm_pool(self.engine, 1)
+
+    async def submit(self, operation: Callable[[AsyncSession], Awaitable[T]]) -> T:
+        """Выполняет operation(session) в ближайшей пачке и возвращает её результат."""
+        self._ensure_writer()
+        future = self._loop.create_future()
+        await self._queue.put(_Write(operation, future, contextvars.copy_context()))
+        return await future
+
+    async def run(self, func: Callable[..., Awaitable[T]], *args, **kwargs) -> T:
+        """Сокращение для crud-функций: run(crud.create_comment, data)."""
+        return await self.submit(lambda session: func(session, *args, **kwargs))
+
+    def _ensure_writer(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            if self._loop is not None and self._loop is not loop and self._engine is not None:
+                # соединения пула привязаны к прежнему loop
+                self._engine.sync_engine.dispose(close=False)
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            # писатель не наследует контекст запроса, который его запустил
+            self._task = loop.create_task(self._writer(), context=contextvars.Context())
+
+    async def stop(self) -> None:
+        """Дожидается уже поставленных операций, останавливает писателя и закрывает движок."""
+        if self._task is not None and self._loop is asyncio.get_running_loop():
+            await self._queue.join()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._engine is not None:
+            await self._engine.dispose()
+
+    # ---------- писатель ----------
+
+    async def _collect(self) -> list[_Write]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            timeout = deadline - self._loop.time()
+            # одиночному писателю ждать некого: прошлая пачка тоже была из одной операции
+            if timeout <= 0 or self._last_batch <= 1:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _writer(self) -> None:
+        while True:
+            batch = await self._collect()
+            self._last_batch = len(batch)
+            try:
+                await self._apply(batch)
+            except Exception as exc:
+                logger.exception("Group commit of %d writes failed", len(batch))
+                for write in batch:
+                    if not write.future.done():
+                        write.future.set_exception(exc)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _apply(self, batch: list[_Write]) -> None:
+        done: list[tuple[_Write, Any, list]] = []
+        async with self.session_factory() as session:
+            session.info[IN_BATCH] = True
+            for write in batch:
+                if write.future.cancelled():
+                    continue
+                callbacks = session.info[AFTER_COMMIT] = []
+                savepoint = await session.begin_nested()
+                try:
+                    # BEGIN/SAVEPOINT — в контексте писателя, а не операции
+                    await session.connection()
+                    result = await asyncio.create_task(write.operation(session), context=write.context)
+                    if savepoint.is_active:
+                        await savepoint.commit()
+                except Exception as exc:
+                    # после ошибки flush точка сохранения уже не активна, но её
+                    # всё равно надо закрыть, иначе вся пачка ждёт rollback()
+                    if session.sync_session.get_nested_transaction() is savepoint.sync_transaction:
+                        await savepoint.rollback()
+                    if not write.future.done():
+                        write.future.set_exception(exc)
+                else:
+                    done.append((write, result, callbacks))
+            del session.info[AFTER_COMMIT]
+            session.info[IN_BATCH] = False
+            await session.commit()
+
+        self.batches += 1
+        self.writes += len(batch)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        for write, result, callbacks in done:
+            for callback, args in callbacks:
+                try:
+                    callback(*args)
+                except Exception:
+                    logger.exception("After-commit callback %r failed", callback)
+            if not write.future.done():
+                write.future.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch": round(self.writes / self.batches, 2) if self.batches else 0,
+            "max_batch": self.max_batch_seen,
+        }
+
+
+write_queue = WriteQueue(
+    settings.db_url,
+    max_batch=settings.write_queue_max_batch,
+    max_wait=settings.write_queue_max_wait,
+    echo=settings.db_echo,
+    busy_timeout=settings.db_busy_timeout,
+)
@@ -1,9 +1,25 @@
-from fastapi import FastAPI
+# server/main.py
+# Приложение собирается фабрикой create_app(): импорт модуля не создаёт
+# движков, каталогов и соединений. Запуск:
+#   python -m server.main --port 8000
+#   uvicorn server.main:create_app --factory
+# server.main:app по-прежнему работает и собирает приложение при первом обращении.
+#
+# Сервер рассчитан на один процесс: единственный писатель (write_queue),
+# версии каталога для ETag, кэш пользователей, индекс рекомендаций с их
+# файлом и буфер счётчиков покупок живут в памяти процесса. Несколько
+# воркеров uvicorn дали бы несколько писателей и расходящиеся ETag и кэши,
+# поэтому масштабировать нужно не --workers, а отдельными репликами чтения.
+import argparse
+import asyncio
+import logging
+from contextlib import asynccontextmanager, suppress
+
+from fastapi import APIRouter, FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from server.app.routers.auth import router as auth_router
-import uvicorn
 
-from fastapi.staticfiles import StaticFiles
+from server.app.static_files import ImmutableStaticFiles
+from server.app.uploads import UPLOAD_FORM_OVERHEAD, UploadSizeLimitMiddleware
 from server.app.routers.comments import router as comment_router
 from server.app.routers.bought_courses import router as bought_courses_router
 from server.app.routers.cart import router as cart_router
@@ -11,30 +27,201 @@ from server.app.routers.users import router as users_router
 from server.app.routers.auth import router as auth_router
 from server.app.routers.courses import router as courses_router
 from server.app.routers.categories import router as categories_router
+from server.app.db_helper import db_helper, db_router
+from server.app.config import settings, Setting
+from server.app.pagination import NEXT_CURSOR_HEADER
+from server.app.cache import user_cache
+from server.app.security import password_hasher
+from server.app import metrics, query_budget
+from server.app.recommendations import recommendations
+from server.app.counters import purchase_counters
+from server.app.write_queue import write_queue
+from server.app.crud import refresh_token as crud_refresh_tokens
+from server.app import startup
 
-app = FastAPI()
-app.mount(
-    "/static",
-    StaticFiles(directory="static"),
-    name="static"
-)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-app.include_router(categories_router)
-app.include_router(cart_router)
-app.include_router(comment_router)
-app.include_router(users_router)
-app.include_router(auth_router)
-app.include_router(courses_router)
-app.include_router(bought_courses_router)
+logger = logging.getLogger(__name__)
 
 
-if __name__ == "__main__":
-    uvicorn.run("main:app", reload=True)
+async def sweep_refresh_tokens(interval: float) -> None:
+    """Периодически удаляет просроченные refresh-токены."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await write_queue.run(crud_refresh_tokens.delete_expired_refresh_tokens)
+        except Exception:
+            logger.exception("Failed to sweep expired refresh tokens")
+
+
+def make_lifespan(config: Setting):
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        # до yield воркер не принимает запросы: всё дорогое делается здесь
+        timings = app.state.startup = startup.StartupTimings()
+        sweeper: asyncio.Task | None = None
+        try:
+            if config.db_check_schema_revision:
+                with timings.step("schema_revision"):
+                    await startup.check_schema_revision(db_helper.engine)
+            with timings.step("connections"):
+                for helper in db_router.helpers:
+                    await helper.warm_up(config.db_pool_size)
+                await write_queue.warm_up()
+            with timings.step("statements"):
+                for helper in db_router.helpers:
+                    await startup.precompile_hot_reads(helper)
+            with timings.step("recommendations"):
+                async with db_helper.session_factory() as session:
+                    await recommendations.warm_up(session, config.recommendations_path)
+            with timings.step("purchase_counters"):
+                await purchase_counters.start(write_queue)
+            sweeper = asyncio.create_task(sweep_refresh_tokens(config.refresh_token_sweep_interval))
+            timings.ready = True
+            logger.info("Worker ready in %.1f ms: %s", sum(timings.steps.values()), timings.steps)
+            yield
+        finally:
+            # и после штатной работы, и после сбоя на середине старта:
+            # закрывается всё, что успело открыться
+            timings.ready = False
+            try:
+                try:
+                    if sweeper is not None:
+                        sweeper.cancel()
+                        with suppress(asyncio.CancelledError):
+                            await sweeper
+                    # остаток счётчиков уходит через очередь, поэтому она останавливается после них
+                    await purchase_counters.stop(write_queue)
+                finally:
+                    await write_queue.stop()
+                # недогретый индекс не должен затереть снимок на диске
+                if recommendations.ready:
+                    recommendations.save(config.recommendations_path)
+            finally:
+                password_hasher.shutdown()
+                await db_router.dispose()
+
+    return lifespan
+
+
+health_router = APIRouter(prefix="/health", tags=["Health"])
+
+
+@health_router.get("/startup")
+async def startup_status(request: Request):
+    timings = getattr(request.app.state, "startup", None)
+    return timings.stats() if timings is not None else {"ready": False, "total_ms": 0, "steps": {}}
+
+
+@health_router.get("/db-pool")
+async def db_pool_status():
+    return db_router.pool_status()
+
+
+@health_router.get("/user-cache")
+async def user_cache_status():
+    return user_cache.stats()
+
+
+@health_router.get("/password-hasher")
+async def password_hasher_status():
+    return password_hasher.stats()
+
+
+@health_router.get("/recommendations")
+async def recommendations_status():
+    return recommendations.stats()
 
+
+@health_router.get("/purchase-counters")
+async def purchase_counters_status():
+    return purchase_counters.stats()
+
+
+@health_router.get("/write-queue")
+async def write_queue_status():
+    return write_queue.stats()
+
+
+async def prometheus_metrics():
+    return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def create_app(config: Setting = settings) -> FastAPI:
+    """Собирает приложение; соединения с БД открывает его lifespan.
+
+    Движки и очереди — общие для процесса и настраиваются из settings;
+    config задаёт сборку приложения и шаги старта.
+    """
+    app = FastAPI(lifespan=make_lifespan(config))
+    # каталог загрузок должен существовать до первой загрузки и для StaticFiles
+    (config.static_dir / "images" / "courses").mkdir(parents=True, exist_ok=True)
+    app.mount(
+        "/static",
+        ImmutableStaticFiles(directory=config.static_dir),
+        name="static"
+    )
+    app.add_middleware(
+        UploadSizeLimitMiddleware,
+        paths={"/courses/my"},
+        max_bytes=lambda: config.max_image_upload_bytes + UPLOAD_FORM_OVERHEAD,
+    )
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["http://localhost:5173"],
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
+    )
+    for engine in [helper.engine for helper in db_router.helpers] + [write_queue.engine]:
+        if config.metrics_enabled:
+            metrics.instrument_engine(engine)
+        query_budget.instrument_engine(engine)
+    if config.metrics_enabled:
+        app.add_middleware(metrics.MetricsMiddleware)
+    if config.query_debug:
+        app.add_middleware(
+            query_budget.QueryBudgetMiddleware,
+            max_queries=config.query_budget,
+            repeat_threshold=config.query_repeat_threshold,
+        )
+
+    app.include_router(categories_router)
+    app.include_router(cart_router)
+    app.include_router(comment_router)
+    app.include_router(users_router)
+    app.include_router(auth_router)
+    app.include_router(courses_router)
+    app.include_router(bought_courses_router)
+    app.include_router(health_router)
+    app.add_api_route("/metrics", prometheus_metrics, tags=["Health"], include_in_schema=False)
+    return app
+
+
+def __getattr__(name: str):
+    # server.main:app для старых запусков и тестов: собирается при первом обращении
+    if name == "app":
+        app = globals()["app"] = create_app()
+        return app
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--reload", action="store_true", help="перезапуск при изменении кода (разработка)")
+    args = parser.parse_args()
+    import uvicorn
+
+    # один воркер: приложение собирается и проходит lifespan до готовности
+    uvicorn.run(
+        "server.main:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        reload=args.reload,
+    )
+
+
+if __name__ == "__main__":
+    main()
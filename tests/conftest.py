@@ -0,0 +1,56 @@
+import os
+import tempfile
+
+import pytest
+from httpx import AsyncClient
+from httpx import ASGITransport
+
+# отдельные БД и статика для тестов, чтобы не трогать server/
+_DB_DIR = tempfile.mkdtemp()
+os.environ.setdefault("DB_URL", f"sqlite+aiosqlite:///{_DB_DIR}/test.db")
+os.environ.setdefault("STATIC_DIR", f"{_DB_DIR}/static")
+os.environ.setdefault("RECOMMENDATIONS_PATH", f"{_DB_DIR}/recommendations.json")
+os.environ.setdefault("PURCHASE_COUNTER_MARKER_PATH", f"{_DB_DIR}/purchase_counters.running")
+
+from server.main import app
+from server.app.models import Base
+from server.app.db_helper import db_helper
+from server.app.cache import user_cache
+from server.app.recommendations import recommendations
+from server.app.counters import purchase_counters
+
+
+@pytest.fixture
+async def session():
+    async with db_helper.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    user_cache.clear()
+    recommendations.reset()
+    purchase_counters.reset()
+    async with db_helper.session_factory() as session:
+        yield session
+    await db_helper.engine.dispose()
+
+
+@pytest.fixture
+async def client(session):
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        yield ac
+
+
+
+@pytest.fixture
+def login(client):
+    async def register_and_login(username="student", password="secret"):
+        response = await client.post(
+            "/auth/register",
+            json={"username": username, "email": f"{username}@test.com", "password": password},
+        )
+        assert response.status_code == 201
+        response = await client.post("/auth/login", data={"username": username, "password": password})
+        assert response.status_code == 200
+        return response.json()
+
+    return register_and_login
@@ -21,3 +21,10 @@ async def test_docs_available():
     assert response.status_code == 200
 
 
+@pytest.mark.asyncio
+async def test_db_pool_status():
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as ac:
+        response = await ac.get("/health/db-pool")
+    assert response.status_code == 200
+    assert "pool_class" in response.json()
@@ -0,0 +1,31 @@
+import pytest
+
+from benchmarks.api_benchmark import Dataset, compare, run_benchmark
+
+
+@pytest.mark.asyncio
+async def test_benchmark_drives_every_route_without_errors(session):
+    report = await run_benchmark(
+        Dataset(users=3, categories=2, courses=10, comments_per_course=1, purchases_per_user=2),
+        concurrency=2,
+        requests=4,
+    )
+
+    assert {"POST /auth/login", "GET /courses/", "POST /cart/checkout",
+            "POST /comments/", "GET /bought-courses/user/me"} <= set(report["routes"])
+    for name, stats in report["routes"].items():
+        assert stats["errors"] == 0, name
+        assert stats["requests"] > 0
+        assert stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+
+
+def test_compare_flags_regressions_past_threshold():
+    baseline = {"routes": {"GET /courses/": {"errors": 0, "p95_ms": 10.0, "throughput_rps": 100.0}}}
+
+    within = {"routes": {"GET /courses/": {"errors": 0, "p95_ms": 12.0, "throughput_rps": 90.0}}}
+    assert compare(within, baseline, threshold=0.25) == []
+
+    slower = {"routes": {"GET /courses/": {"errors": 0, "p95_ms": 13.0, "throughput_rps": 70.0}}}
+    regressions = compare(slower, baseline, threshold=0.25)
+    assert len(regressions) == 2
+    assert all(r.startswith("GET /courses/") for r in regressions)
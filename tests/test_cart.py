@@ -0,0 +1,70 @@
+import pytest
+from sqlalchemy import event, select
+
+from server.app import models
+from server.app.db_helper import db_helper
+from server.app.write_queue import write_queue
+from server.app.counters import purchase_counters
+
+
+async def _seed_courses(session, count):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([owner, category])
+    await session.flush()
+    courses = [
+        models.Course(
+            title=f"Course {i}", format="online", description="-", price=10,
+            duration_hours=1, owner_id=owner.id, category_id=category.id,
+        )
+        for i in range(count)
+    ]
+    session.add_all(courses)
+    await session.commit()
+    return [course.id for course in courses]
+
+
+async def _checkout_statements(client, course_ids):
+    for course_id in course_ids:
+        response = await client.post("/cart/", json={"course_id": course_id})
+        assert response.status_code == 201
+    await client.get("/users/me")
+
+    statements = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db_helper.engine.sync_engine, "before_cursor_execute", count)
+    try:
+        response = await client.post("/cart/checkout")
+    finally:
+        event.remove(db_helper.engine.sync_engine, "before_cursor_execute", count)
+    assert response.status_code == 200
+    return response.json(), statements
+
+
+@pytest.mark.asyncio
+async def test_checkout_is_one_transaction(client, session, login):
+    course_ids = await _seed_courses(session, 12)
+    await login()
+
+    body, small = await _checkout_statements(client, course_ids[:2])
+    assert body["courses_count"] == 2
+
+    # уже купленный курс пропускается, число запросов не зависит от размера корзины
+    body, large = await _checkout_statements(client, course_ids[1:])
+    assert body["courses_count"] == 10
+    assert body["already_bought"] == [course_ids[1]]
+    assert len(large) == len(small)
+
+    await purchase_counters.flush(write_queue)
+    counts = dict((await session.execute(
+        select(models.Course.id, models.Course.purchased_count)
+    )).all())
+    assert all(counts[course_id] == 1 for course_id in course_ids)
+
+    response = await client.get("/cart/")
+    assert response.json() == []
+    response = await client.post("/cart/checkout")
+    assert response.status_code == 400
@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import update
+
+from server.app import models
+from server.app.crud import course as crud_courses
+
+
+async def _seed(session):
+    user = models.User(username="author", email="author@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([user, category])
+    await session.flush()
+    for title in ("First", "Second"):
+        session.add(models.Course(
+            title=title, format="online", description="-", price=10,
+            duration_hours=1, owner_id=user.id, category_id=category.id,
+        ))
+    await session.commit()
+    return user.id
+
+
+async def _ratings(client):
+    response = await client.get("/courses/", params={"sort": "-rating"})
+    return [(c["id"], c["rating"], c["rating_count"]) for c in response.json()]
+
+
+@pytest.mark.asyncio
+async def test_course_rating_is_maintained_incrementally(client, session):
+    user_id = await _seed(session)
+
+    async def comment(course_id, rating):
+        response = await client.post("/comments/", json={
+            "user_id": user_id, "course_id": course_id, "content": "-", "rating": rating,
+        })
+        assert response.status_code == 201
+        return response.json()["id"]
+
+    first = await comment(1, 5)
+    await comment(1, 3)
+    await comment(2, 2)
+    assert await _ratings(client) == [(1, 4.0, 2), (2, 2.0, 1)]
+
+    await client.patch(f"/comments/{first}", json={"rating": 1})
+    assert await _ratings(client) == [(2, 2.0, 1), (1, 2.0, 2)]
+
+    await client.patch(f"/comments/{first}", json={"course_id": 2})
+    assert await _ratings(client) == [(1, 3.0, 1), (2, 1.5, 2)]
+
+    await client.delete(f"/comments/{first}")
+    assert await _ratings(client) == [(1, 3.0, 1), (2, 2.0, 1)]
+
+
+@pytest.mark.asyncio
+async def test_recompute_ratings_repairs_drift(client, session):
+    user_id = await _seed(session)
+    session.add(models.Comment(user_id=user_id, course_id=1, content="-", rating=4))
+    await session.execute(update(models.Course).values(rating=1, rating_sum=7, rating_count=9))
+    await session.commit()
+
+    assert await crud_courses.recompute_ratings(session) == 2
+    assert await _ratings(client) == [(1, 4.0, 1), (2, 0.0, 0)]
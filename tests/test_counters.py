@@ -0,0 +1,103 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from sqlalchemy import event, select
+
+from server.app import models
+from server.app.counters import purchase_counters, reconcile_purchased_counts
+from server.app.write_queue import write_queue
+
+
+async def _seed(session, courses=3):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([owner, category])
+    await session.flush()
+    session.add_all([
+        models.Course(title=f"Course {i}", format="online", description="-", price=10,
+                      duration_hours=1, owner_id=owner.id, category_id=category.id)
+        for i in range(courses)
+    ])
+    await session.commit()
+    return owner.id
+
+
+async def _counts(session):
+    session.expire_all()
+    return dict((await session.execute(select(models.Course.id, models.Course.purchased_count))).all())
+
+
+@pytest.mark.asyncio
+async def test_purchases_are_buffered_and_flushed_in_one_statement(client, session):
+    owner_id = await _seed(session)
+    buyer = models.User(username="buyer", email="buyer@test.com", hashed_password="x")
+    session.add(buyer)
+    await session.commit()
+    for user_id, course_id in ((owner_id, 1), (buyer.id, 1), (owner_id, 2)):
+        response = await client.post("/bought-courses/", json={"user_id": user_id, "course_id": course_id})
+        assert response.status_code == 201
+    assert await _counts(session) == {1: 0, 2: 0, 3: 0}
+    assert purchase_counters.pending() == {1: 2, 2: 1}
+
+    statements = []
+    listener = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(write_queue.engine.sync_engine, "before_cursor_execute", listener)
+    try:
+        assert await purchase_counters.flush(write_queue) == 2
+    finally:
+        event.remove(write_queue.engine.sync_engine, "before_cursor_execute", listener)
+
+    assert len([s for s in statements if s.lstrip().upper().startswith("UPDATE")]) == 1
+    assert await _counts(session) == {1: 2, 2: 1, 3: 0}
+    assert purchase_counters.pending() == {}
+
+
+def _dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", ""])
+    process.wait()
+    return process.pid
+
+
+@pytest.mark.asyncio
+async def test_unclean_shutdown_is_reconciled_on_start(session, tmp_path, monkeypatch):
+    owner_id = await _seed(session)
+    session.add_all([models.BoughtCourse(user_id=owner_id, course_id=course_id) for course_id in (1, 2)])
+    await session.commit()
+    # приращения упавшего процесса так и не дошли до БД
+    assert await _counts(session) == {1: 0, 2: 0, 3: 0}
+
+    marker_path = tmp_path / "purchase_counters.running"
+    crashed = tmp_path / f"purchase_counters.running.{_dead_pid()}"
+    crashed.write_text("running\n")
+    monkeypatch.setattr(purchase_counters, "marker_path", marker_path)
+    await purchase_counters.start(write_queue)
+    assert purchase_counters.own_marker.exists()
+    purchase_counters.add(3)
+    await purchase_counters.stop(write_queue)
+
+    assert await _counts(session) == {1: 1, 2: 1, 3: 1}
+    assert list(tmp_path.iterdir()) == []
+    assert await reconcile_purchased_counts(session) == 1
+
+
+@pytest.mark.asyncio
+async def test_live_process_markers_are_left_alone(session, tmp_path, monkeypatch):
+    owner_id = await _seed(session)
+    session.add(models.BoughtCourse(user_id=owner_id, course_id=1))
+    await session.commit()
+
+    marker_path = tmp_path / "purchase_counters.running"
+    # соседний воркер ещё держит приращения в памяти
+    live = tmp_path / f"purchase_counters.running.{os.getppid()}"
+    crashed = tmp_path / f"purchase_counters.running.{_dead_pid()}"
+    live.write_text("running\n")
+    crashed.write_text("running\n")
+    monkeypatch.setattr(purchase_counters, "marker_path", marker_path)
+    await purchase_counters.start(write_queue)
+    await purchase_counters.stop(write_queue)
+
+    assert await _counts(session) == {1: 0, 2: 0, 3: 0}
+    assert live.exists() and crashed.exists()
+    assert not purchase_counters.own_marker.exists()
@@ -0,0 +1,85 @@
+import json
+
+import pytest
+
+from server.app import models
+from server.app.config import settings
+
+
+async def _category(session) -> int:
+    category = models.Category(name="General")
+    session.add(category)
+    await session.commit()
+    return category.id
+
+
+async def _chunks(payload: bytes, size: int = 7):
+    # тело приходит кусками, которые режут строки посередине
+    for start in range(0, len(payload), size):
+        yield payload[start:start + size]
+
+
+@pytest.mark.asyncio
+async def test_import_ndjson_reports_bad_rows(client, session, login, monkeypatch):
+    monkeypatch.setattr(settings, "import_batch_size", 2)
+    category_id = await _category(session)
+    await login()
+
+    good = {"title": "Course", "format": "online", "description": "-", "price": 10,
+            "duration_hours": 2, "category_id": category_id}
+    lines = [
+        json.dumps(good),
+        json.dumps({**good, "title": "Second"}),
+        "{not json",
+        "",
+        json.dumps({**good, "price": "free"}),
+        json.dumps({**good, "category_id": 999}),
+        json.dumps({**good, "title": "Third"}),
+    ]
+    response = await client.post(
+        "/courses/import",
+        content=_chunks("\n".join(lines).encode()),
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 200
+    report = response.json()
+    assert report["imported"] == 3
+    assert report["failed"] == 3
+    assert [error["line"] for error in report["errors"]] == [3, 5, 6]
+    assert report["errors"][1]["errors"][0].startswith("price:")
+
+    titles = (await client.get("/courses/")).json()
+    assert [course["title"] for course in titles] == ["Course", "Second", "Third"]
+
+
+@pytest.mark.asyncio
+async def test_import_csv_with_quoted_multiline_field(client, session, login):
+    category_id = await _category(session)
+    await login()
+
+    payload = (
+        "title,format,description,price,duration_hours,category_id\r\n"
+        f'SQL,online,"Joins,\nindexes and ""plans""",15,3,{category_id}\r\n'
+        f"Short,offline,-,5,1\r\n"
+    ).encode()
+    response = await client.post(
+        "/courses/import", content=_chunks(payload), headers={"Content-Type": "text/csv"},
+    )
+
+    assert response.json() == {
+        "imported": 1,
+        "failed": 1,
+        "errors": [{"line": 4, "errors": ["Expected 6 columns, got 5"]}],
+        "errors_truncated": False,
+    }
+    course = (await client.get("/courses/")).json()[0]
+    assert course["description"] == 'Joins,\nindexes and "plans"'
+    assert course["price"] == 15
+
+
+@pytest.mark.asyncio
+async def test_import_rejects_unknown_content_type(client, session, login):
+    await login()
+    response = await client.post("/courses/import", content=b"[]", headers={"Content-Type": "application/json"})
+    assert response.status_code == 415
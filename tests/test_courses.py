@@ -0,0 +1,315 @@
+import gzip
+import hashlib
+
+import pytest
+
+from server.app import models, schemas
+
+
+async def _seed_catalog(session):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    python = models.Category(name="Python")
+    other = models.Category(name="Other")
+    session.add_all([owner, python, other])
+    await session.flush()
+    courses = [
+        ("Python для начинающих", "основы языка", 100, python.id),
+        ("Продвинутый Python", "асинхронность и typing", 300, python.id),
+        ("Java", "после курса можно перейти на python", 200, other.id),
+        ("Рисование", "акварель", 50, other.id),
+    ]
+    for title, description, price, category_id in courses:
+        session.add(models.Course(
+            title=title, format="online", description=description, price=price,
+            duration_hours=10, owner_id=owner.id, category_id=category_id,
+        ))
+    await session.commit()
+    return python.id
+
+
+@pytest.mark.asyncio
+async def test_search_uses_title_and_description(client, session):
+    await _seed_catalog(session)
+
+    response = await client.get("/courses/", params={"search": "pyth"})
+    assert response.status_code == 200
+    titles = [course["title"] for course in response.json()]
+    assert set(titles) == {"Python для начинающих", "Продвинутый Python", "Java"}
+    # совпадение в описании ранжируется ниже совпадений в названии
+    assert titles[-1] == "Java"
+
+
+@pytest.mark.asyncio
+async def test_search_applies_filters_and_tracks_updates(client, session):
+    python_id = await _seed_catalog(session)
+
+    response = await client.get(
+        "/courses/", params={"search": "python", "category_id": python_id, "max_price": 150}
+    )
+    assert [course["title"] for course in response.json()] == ["Python для начинающих"]
+
+    response = await client.patch("/courses/4", json={"description": "python для художников"})
+    assert response.status_code == 200
+    response = await client.get("/courses/", params={"search": "художник"})
+    assert [course["id"] for course in response.json()] == [4]
+
+
+@pytest.mark.asyncio
+async def test_search_honours_explicit_sort(client, session):
+    await _seed_catalog(session)
+
+    response = await client.get("/courses/", params={"search": "python", "sort": "-price"})
+    assert [course["price"] for course in response.json()] == [300, 200, 100]
+
+    # с курсором вторая страница продолжает тот же порядок
+    page = await client.get("/courses/", params={"search": "python", "sort": "price", "limit": 2})
+    assert [course["price"] for course in page.json()] == [100, 200]
+    rest = await client.get(
+        "/courses/", params={"search": "python", "sort": "price", "limit": 2, "after": page.headers["X-Next-Cursor"]}
+    )
+    assert [course["price"] for course in rest.json()] == [300]
+
+
+@pytest.mark.asyncio
+async def test_courses_keyset_pagination(client, session):
+    await _seed_catalog(session)
+
+    seen = []
+    params = {"limit": 3, "sort": "-price"}
+    while True:
+        response = await client.get("/courses/", params=params)
+        assert response.status_code == 200
+        seen.extend(course["price"] for course in response.json())
+        next_cursor = response.headers.get("X-Next-Cursor")
+        if next_cursor is None:
+            break
+        params["after"] = next_cursor
+    assert seen == [300, 200, 100, 50]
+
+    response = await client.get("/courses/", params={"after": "not-a-cursor"})
+    assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_catalog_conditional_get(client, session):
+    await _seed_catalog(session)
+
+    response = await client.get("/courses/")
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == "public, no-cache"
+
+    response = await client.get("/courses/", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+
+    response = await client.patch("/courses/1", json={"price": 1})
+    assert response.status_code == 200
+    response = await client.get("/courses/", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+
+    response = await client.get("/comments/course/1")
+    etag = response.headers["ETag"]
+    response = await client.post(
+        "/comments/", json={"user_id": 1, "course_id": 2, "content": "ok", "rating": 5}
+    )
+    assert response.status_code == 201
+    # комментарий к другому курсу не меняет версию
+    response = await client.get("/comments/course/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+
+
+@pytest.mark.asyncio
+async def test_my_course_image_upload(client, session, login, monkeypatch):
+    from server.app.config import settings
+    from server.app.routers.courses import STATIC_DIR
+
+    monkeypatch.setattr(settings, "max_image_upload_bytes", 1024)
+    session.add(models.Category(name="General"))
+    await session.commit()
+    await login()
+    form = {"title": "Upload", "format": "online", "description": "-", "price": 1,
+            "duration_hours": 1, "category_id": 1}
+
+    response = await client.post(
+        "/courses/my", data=form, files={"image": ("big.png", b"x" * 2048, "image/png")}
+    )
+    assert response.status_code == 413
+    response = await client.post(
+        "/courses/my", data=form, files={"image": ("script.sh", b"echo", "text/x-sh")}
+    )
+    assert response.status_code == 415
+    assert list(STATIC_DIR.iterdir()) == []
+
+    response = await client.post(
+        "/courses/my", data=form, files={"image": ("../../cover.png", b"png" * 100, "image/png")}
+    )
+    assert response.status_code == 200
+    image_path = STATIC_DIR / response.json()["image_url"].rsplit("/", 1)[1]
+    assert image_path.read_bytes() == b"png" * 100
+    assert image_path.name == hashlib.sha256(b"png" * 100).hexdigest()[:32] + ".png"
+
+    # та же картинка у второго курса хранится один раз и переживает удаление первого
+    second = await client.post(
+        "/courses/my", data=form, files={"image": ("copy.png", b"png" * 100, "image/png")}
+    )
+    assert second.json()["image_url"] == response.json()["image_url"]
+
+    response = await client.delete(f"/courses/my/{response.json()['id']}")
+    assert response.status_code == 204
+    assert image_path.exists()
+    response = await client.delete(f"/courses/my/{second.json()['id']}")
+    assert not image_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_upload_body_is_limited_before_parsing(client, session, login, monkeypatch):
+    from server.app.config import settings
+    from server.app.uploads import UPLOAD_FORM_OVERHEAD
+
+    monkeypatch.setattr(settings, "max_image_upload_bytes", 1024)
+    await login()
+    big = b"x" * (UPLOAD_FORM_OVERHEAD + 2048)
+
+    response = await client.post("/courses/my", files={"image": ("big.png", big, "image/png")})
+    assert response.status_code == 413
+
+    # без Content-Length тело считается по мере чтения
+    body = (
+        b'--x\r\nContent-Disposition: form-data; name="image"; filename="big.png"\r\n'
+        b"Content-Type: image/png\r\n\r\n" + big + b"\r\n--x--\r\n"
+    )
+
+    async def chunks():
+        for offset in range(0, len(body), 4096):
+            yield body[offset:offset + 4096]
+
+    response = await client.post(
+        "/courses/my", content=chunks(), headers={"Content-Type": "multipart/form-data; boundary=x"}
+    )
+    assert response.status_code == 413
+
+
+@pytest.mark.asyncio
+async def test_delete_my_course_keeps_files_outside_static(client, session, login, tmp_path):
+    outside = tmp_path / "secret.txt"
+    outside.write_text("keep")
+    session.add(models.Category(name="General"))
+    await session.commit()
+    await login()
+
+    # image_url задаёт только загрузка, но в БД могли остаться старые значения
+    assert "image_url" not in schemas.CourseUpdatePartial.model_fields
+    for image_url in (str(outside), f"/static/images/courses/../../../../../../..{outside}"):
+        session.add(models.Course(
+            title="Old", format="online", description="-", price=1, duration_hours=1,
+            owner_id=1, category_id=1, image_url=image_url,
+        ))
+    await session.commit()
+
+    for course_id in (1, 2):
+        response = await client.delete(f"/courses/my/{course_id}")
+        assert response.status_code == 204
+    assert outside.read_text() == "keep"
+
+
+@pytest.mark.asyncio
+async def test_static_images_are_immutable_with_strong_etag_and_ranges(client, session):
+    from server.app.routers.courses import STATIC_DIR
+
+    content = bytes(range(256)) * 4
+    name = hashlib.sha256(content).hexdigest()[:32] + ".png"
+    (STATIC_DIR / name).write_bytes(content)
+    url = f"/static/images/courses/{name}"
+
+    response = await client.get(url)
+    assert response.headers["cache-control"] == "public, max-age=31536000, immutable"
+    etag = response.headers["etag"]
+    assert etag == f'"{name[:32]}"'
+    assert (await client.get(url, headers={"If-None-Match": etag})).status_code == 304
+
+    response = await client.get(url, headers={"Range": "bytes=10-19", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == content[10:20]
+
+    # сжимаемый файл со сжатой копией рядом и старое имя без хэша
+    svg = b"<svg>" + b"<g/>" * 500 + b"</svg>"
+    (STATIC_DIR / "logo.svg").write_bytes(svg)
+    (STATIC_DIR / "logo.svg.gz").write_bytes(gzip.compress(svg))
+    response = await client.get("/static/images/courses/logo.svg", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == "public, no-cache"
+    assert response.content == svg
+    # ETag без чтения файла: из mtime и размера
+    stat = (STATIC_DIR / "logo.svg").stat()
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    plain = {"Accept-Encoding": "identity"}
+    response = await client.get("/static/images/courses/logo.svg", headers=plain)
+    assert response.headers["etag"] == etag
+    response = await client.get("/static/images/courses/logo.svg", headers={**plain, "If-None-Match": etag})
+    assert response.status_code == 304
+
+    for path in (STATIC_DIR / name, STATIC_DIR / "logo.svg", STATIC_DIR / "logo.svg.gz"):
+        path.unlink()
+
+
+@pytest.mark.asyncio
+async def test_course_full_detail_in_constant_queries(client, session):
+    from server.app.query_budget import track_queries
+
+    await _seed_catalog(session)
+    authors = [models.User(username=f"author{i}", email=f"a{i}@test.com", hashed_password="x",
+                           avatar_url=f"/a{i}.png") for i in range(6)]
+    session.add_all(authors)
+    await session.flush()
+    for i, author in enumerate(authors):
+        session.add(models.Comment(user_id=author.id, course_id=1, content=f"c{i}", rating=4 + i % 2))
+    await session.commit()
+
+    with track_queries() as queries:
+        response = await client.get("/courses/1/full", params={"comments_limit": 4})
+    assert queries.count == 3
+
+    body = response.json()
+    assert body["category"]["name"] == "Python"
+    assert body["owner"] == {"id": 1, "username": "owner", "avatar_url": None}
+    assert body["rating_summary"]["distribution"] == {"4": 3, "5": 3}
+    assert [c["user"]["username"] for c in body["comments"]] == ["author0", "author1", "author2", "author3"]
+    assert body["comments"][0]["user"]["avatar_url"] == "/a0.png"
+
+    rest = await client.get("/comments/course/1", params={"after": body["comments_next_cursor"]})
+    assert [c["content"] for c in rest.json()] == ["c4", "c5"]
+
+    assert (await client.get("/courses/999/full")).status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_course_facets_are_cached_until_course_write(client, session):
+    from server.app.query_budget import track_queries
+
+    python_id = await _seed_catalog(session)
+    params = {"search": "python", "min_price": 150, "facets": "true"}
+
+    with track_queries() as queries:
+        body = (await client.get("/courses/", params=params)).json()
+    assert queries.count == 2
+    assert [course["title"] for course in body["items"]] == ["Продвинутый Python", "Java"]
+    # категории считаются с учётом цены, но без фильтра по категории
+    assert body["facets"]["categories"] == [
+        {"category_id": python_id, "count": 1}, {"category_id": python_id + 1, "count": 1},
+    ]
+    # корзины — по всем найденным курсам, без ценового фильтра
+    buckets = {b["bucket"]: b["count"] for b in body["facets"]["price_buckets"]}
+    assert buckets == {"0-50": 0, "50-100": 0, "100-200": 1, "200-500": 2, "500+": 0}
+
+    with track_queries() as queries:
+        await client.get("/courses/", params={**params, "search": "  PYTHON "})
+    assert queries.count == 1
+
+    await client.patch("/courses/1", json={"price": 600})
+    body = (await client.get("/courses/", params=params)).json()
+    buckets = {b["bucket"]: b["count"] for b in body["facets"]["price_buckets"]}
+    assert buckets["100-200"] == 0 and buckets["500+"] == 1
+    assert [c["title"] for c in body["items"]] == ["Python для начинающих", "Продвинутый Python", "Java"]
+
+    assert isinstance((await client.get("/courses/")).json(), list)
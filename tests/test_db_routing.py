@@ -0,0 +1,62 @@
+import json
+import tempfile
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+
+from server.main import app
+from server.app import models
+from server.app.models import Base
+from server.app.db_helper import DatabaseHelper, DatabaseRouter, db_helper
+from server.app.dependenses import auth_dependenses
+
+
+@pytest.fixture
+async def replica(session, monkeypatch):
+    # вторая SQLite-база, которую никто не реплицирует: видно, куда ушёл запрос
+    replica = DatabaseHelper(url=f"sqlite+aiosqlite:///{tempfile.mkdtemp()}/replica.db")
+    async with replica.engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    router = DatabaseRouter(db_helper, replica, sticky_seconds=30)
+    monkeypatch.setattr(auth_dependenses, "db_router", router)
+    yield router
+    await replica.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reads_go_to_replica_and_writer_sticks_to_primary(client, session, replica):
+    response = await client.post("/categories/", json={"name": "Python"})
+    assert response.status_code == 201
+    assert response.cookies[DatabaseRouter.STICKY_COOKIE] == "1"
+
+    # тот, кто писал, сразу видит свою запись
+    response = await client.get("/categories/")
+    assert [category["name"] for category in response.json()] == ["Python"]
+    assert "ETag" in response.headers
+
+    # остальные читают реплику, которая ещё не догнала
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as other:
+        response = await other.get("/categories/")
+        assert response.json() == []
+        assert DatabaseRouter.STICKY_COOKIE not in response.cookies
+        # версия из primary не должна помечать данные реплики
+        assert "ETag" not in response.headers
+
+    # выгрузка стримится после обработчика, но выбирает базу так же
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    session.add(owner)
+    await session.flush()
+    session.add(models.Course(title="Intro", format="online", description="-", price=1,
+                              duration_hours=1, owner_id=owner.id, category_id=1))
+    await session.commit()
+    response = await client.get("/courses/export")
+    assert [json.loads(line)["title"] for line in response.text.splitlines()] == ["Intro"]
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as other:
+        assert (await other.get("/courses/export")).text == ""
+
+
+def test_router_without_replica_uses_primary_for_everything():
+    router = DatabaseRouter(db_helper)
+    assert not router.has_replica
+    assert router.session_factory_for("GET", {}) is db_helper.session_factory
+    assert router.session_factory_for("POST", {}) is db_helper.session_factory
@@ -0,0 +1,91 @@
+import asyncio
+import csv
+import io
+import json
+
+import pytest
+from sqlalchemy import update
+
+from server.app import models
+from server.app.crud import course as crud_courses
+from server.app.db_helper import db_helper
+from server.app.exports import iter_export
+from server.app.write_queue import write_queue
+
+
+async def _seed(session, count=5):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([owner, category])
+    await session.flush()
+    session.add_all([
+        models.Course(title=f"Course {i}", format="online", description="a, \"b\"\nc", price=i,
+                      duration_hours=1, owner_id=owner.id, category_id=category.id)
+        for i in range(count)
+    ])
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_export_courses_ndjson_and_csv(client, session):
+    await _seed(session)
+
+    response = await client.get("/courses/export")
+    assert response.headers["content-type"] == "application/x-ndjson"
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["title"] for row in rows] == [f"Course {i}" for i in range(5)]
+    assert rows[0]["description"] == "a, \"b\"\nc"
+
+    response = await client.get("/courses/export", params={"format": "csv"})
+    assert response.headers["content-disposition"] == 'attachment; filename="courses.csv"'
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert len(rows) == 5
+    assert rows[4]["price"] == "4"
+    assert rows[0]["description"] == "a, \"b\"\nc"
+
+
+@pytest.mark.asyncio
+async def test_export_streams_in_batches(session):
+    await _seed(session, count=7)
+
+    stmt = crud_courses.export_courses_stmt()
+    export = iter_export(stmt, "ndjson", db_helper.session_factory, models.Course.id, batch_size=3)
+    chunks = [chunk async for chunk in export]
+    assert [chunk.count("\n") for chunk in chunks] == [3, 3, 1]
+    assert [json.loads(line)["id"] for chunk in chunks for line in chunk.splitlines()] == list(range(1, 8))
+
+
+@pytest.mark.asyncio
+async def test_paused_export_does_not_block_writes(session):
+    await _seed(session, count=7)
+
+    # медленный клиент: первая пачка отдана, следующую он ещё не читает
+    stmt = crud_courses.export_courses_stmt()
+    export = iter_export(stmt, "ndjson", db_helper.session_factory, models.Course.id, batch_size=3)
+    first = await anext(export)
+
+    async def rename(session):
+        await session.execute(update(models.Course).where(models.Course.id == 7).values(title="Renamed"))
+        await session.commit()
+
+    await asyncio.wait_for(write_queue.run(rename), timeout=2)
+
+    rest = [chunk async for chunk in export]
+    titles = [json.loads(line)["title"] for chunk in (first, *rest) for line in chunk.splitlines()]
+    assert titles[-1] == "Renamed" and len(titles) == 7
+
+
+@pytest.mark.asyncio
+async def test_export_purchases_is_scoped_to_current_user(client, session, login):
+    await _seed(session)
+    await login()
+    me = (await client.get("/users/me")).json()
+    session.add_all([
+        models.BoughtCourse(user_id=me["id"], course_id=2),
+        models.BoughtCourse(user_id=1, course_id=3),
+    ])
+    await session.commit()
+
+    response = await client.get("/bought-courses/user/me/export")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [(row["course_id"], row["title"]) for row in rows] == [(2, "Course 1")]
@@ -0,0 +1,38 @@
+import pytest
+
+from server.app import metrics
+
+
+@pytest.mark.asyncio
+async def test_metrics_record_route_latency_and_db_work(client, session):
+    route = ("GET", "/courses/{course_id}")
+    requests_before = metrics.http_requests_total.value(*route, "404")
+    statements_before = metrics.http_request_db_statements.count(*route)
+
+    response = await client.get("/courses/12345")
+    assert response.status_code == 404
+
+    assert metrics.http_requests_total.value(*route, "404") == requests_before + 1
+    assert metrics.http_request_db_statements.count(*route) == statements_before + 1
+
+    response = await client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert 'http_request_duration_seconds_bucket{method="GET",route="/courses/{course_id}",status="404",le="+Inf"}' in body
+    assert 'http_request_db_statements_count{method="GET",route="/courses/{course_id}"}' in body
+    assert "db_pool_checkouts_total" in body
+    # /metrics сам ещё выполняется, поэтому в полёте ровно один запрос
+    assert "http_requests_in_flight 1" in body
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = metrics.Histogram("t_seconds", "test", ("route",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "/x")
+
+    lines = histogram.render()
+    assert 't_seconds_bucket{route="/x",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{route="/x",le="1.0"} 2' in lines
+    assert 't_seconds_bucket{route="/x",le="+Inf"} 3' in lines
+    assert 't_seconds_count{route="/x"} 3' in lines
@@ -0,0 +1,77 @@
+import logging
+
+import pytest
+
+from server.app import models
+from server.app.query_budget import QueryBudgetMiddleware, statement_shape, track_queries
+
+# Максимум SQL-запросов на эндпоинт (пользователь уже в кэше аутентификации)
+BUDGETS = [
+    ("get", "/courses/", {}, 1),
+    ("get", "/courses/1", {}, 1),
+    ("patch", "/courses/1", {"json": {"price": 3}}, 2),
+    ("get", "/categories/", {}, 1),
+    ("post", "/cart/", {"json": {"course_id": 1}}, 2),
+    ("post", "/cart/", {"json": {"course_id": 2}}, 2),
+    ("get", "/cart/", {}, 2),
+    ("post", "/cart/checkout", {}, 3),
+    ("get", "/bought-courses/user/me", {}, 2),
+    ("post", "/comments/", {"json": {"course_id": 1, "content": "-", "rating": 4}}, 3),
+    ("get", "/comments/course/1", {}, 1),
+    ("patch", "/comments/1", {"json": {"rating": 2}}, 3),
+    ("get", "/users/me", {}, 0),
+]
+
+
+@pytest.mark.asyncio
+async def test_endpoints_stay_within_query_budget(client, session, login):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([owner, category])
+    await session.flush()
+    for i in range(5):
+        session.add(models.Course(
+            title=f"Course {i}", format="online", description="-", price=i,
+            duration_hours=1, owner_id=owner.id, category_id=category.id,
+        ))
+    await session.commit()
+    await login()
+    user_id = (await client.get("/users/me")).json()["id"]
+
+    for method, path, kwargs, budget in BUDGETS:
+        if "json" in kwargs and path == "/comments/":
+            kwargs = {"json": {**kwargs["json"], "user_id": user_id}}
+        with track_queries() as queries:
+            response = await getattr(client, method)(path, **kwargs)
+        assert response.status_code < 400, (method, path, response.text)
+        queries.assert_budget(budget)
+
+
+def test_statement_shape_collapses_in_lists_and_values():
+    assert statement_shape("SELECT *\n  FROM t WHERE id IN (?, ?, ?)") == "SELECT * FROM t WHERE id IN (?)"
+    assert statement_shape("INSERT INTO t (a, b) VALUES (?, ?), (?, ?)") == "INSERT INTO t (a, b) VALUES (?, ?)"
+
+
+@pytest.mark.asyncio
+async def test_middleware_logs_budget_overrun_and_repeated_queries(caplog):
+    from sqlalchemy import text
+    from server.app.db_helper import db_helper
+
+    async def endpoint(scope, receive, send):
+        async with db_helper.session_factory() as s:
+            for i in range(3):
+                await s.execute(text("SELECT :i"), {"i": i})
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    middleware = QueryBudgetMiddleware(endpoint, max_queries=2, repeat_threshold=3)
+    with caplog.at_level(logging.WARNING, logger="server.app.query_budget"):
+        await middleware({"type": "http", "method": "GET", "path": "/loop"}, None, send)
+    await db_helper.engine.dispose()
+
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("GET /loop executed 3 queries (budget 2)" in m for m in messages)
+    assert any("GET /loop possible N+1: 3 x SELECT ?" in m for m in messages)
@@ -0,0 +1,153 @@
+import re
+
+import pytest
+from sqlalchemy import event
+
+from server.app import models
+from server.app.db_helper import db_helper
+from server.app.write_queue import write_queue
+
+# "SCAN <table>" без индекса — полный проход по таблице.
+# Виртуальная таблица FTS5 ищет по своему индексу и сюда не попадает.
+_FULL_SCAN_RE = re.compile(r"^SCAN (\w+)$")
+_PLANNED_PREFIXES = ("SELECT", "UPDATE", "DELETE", "INSERT INTO bought_courses")
+
+
+def _is_full_scan(detail: str, statement: str, plan: list[str]) -> bool:
+    if not _FULL_SCAN_RE.match(detail):
+        return False
+    # разрешён только обход в порядке rowid без фильтра, с LIMIT и без сортировки
+    # во временном B-дереве: он останавливается на первой странице (первая
+    # страница keyset-пагинации). С WHERE тот же SCAN читает таблицу до
+    # набора LIMIT подходящих строк, то есть, возможно, целиком.
+    sql = " ".join(statement.split())
+    index_ordered = (
+        " LIMIT " in sql
+        and " WHERE " not in sql
+        and not any("TEMP B-TREE" in step for step in plan)
+    )
+    return not index_ordered
+
+
+def _ok(response, status_code=200):
+    assert response.status_code == status_code, f"{response.request.method} {response.request.url}: {response.text}"
+    return response
+
+
+async def _exercise_api(client, session, login):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([owner, category])
+    await session.flush()
+    for i in range(5):
+        session.add(models.Course(
+            title=f"Python {i}", format="online", description="asyncio", price=10 * i,
+            rating=i, rating_count=1, duration_hours=1, owner_id=owner.id, category_id=category.id,
+        ))
+    await session.commit()
+
+    await login()
+    me = _ok(await client.get("/users/me")).json()
+    user_id = me["id"]
+
+    # каталог
+    _ok(await client.post("/categories/", json={"name": "Extra"}), 201)
+    _ok(await client.get("/categories/"))
+    page = _ok(await client.get("/categories/", params={"limit": 1}))
+    _ok(await client.get("/categories/", params={"after": page.headers["X-Next-Cursor"]}))
+    _ok(await client.get("/categories/1"))
+    _ok(await client.patch("/categories/2", json={"name": "Extra 2"}))
+    _ok(await client.delete("/categories/2"), 204)
+    for params in (
+        {},
+        {"category_id": 1},
+        {"category_id": 1, "min_price": 5, "max_price": 30},
+        {"sort": "price"},
+        {"sort": "-rating", "min_rating": 1},
+        {"search": "python"},
+        {"search": "python", "category_id": 1},
+        {"facets": True},
+        {"facets": True, "category_id": 1, "min_price": 5},
+    ):
+        page = _ok(await client.get("/courses/", params={**params, "limit": 2}))
+        cursor = page.headers.get("X-Next-Cursor")
+        if cursor:
+            _ok(await client.get("/courses/", params={**params, "limit": 2, "after": cursor}))
+    _ok(await client.get("/courses/1"))
+    _ok(await client.get("/courses/1/full"))
+    _ok(await client.get("/courses/by-category/1"))
+    _ok(await client.patch("/courses/1", json={"title": "Python renamed"}))
+
+    # свои курсы
+    created = _ok(await client.post(
+        "/courses/my",
+        data={"title": "Mine", "format": "online", "description": "-", "price": 1,
+              "duration_hours": 1, "category_id": 1},
+        files={"image": ("cover.png", b"png", "image/png")},
+    ))
+    my_course_id = created.json()["id"]
+    _ok(await client.get("/courses/my"))
+    _ok(await client.patch(f"/courses/my/{my_course_id}", json={"price": 2}))
+
+    # корзина и покупки
+    for course_id in (1, 2, 3):
+        _ok(await client.post("/cart/", json={"course_id": course_id}), 201)
+    _ok(await client.get("/cart/"))
+    cart = _ok(await client.get("/cart/")).json()
+    _ok(await client.delete(f"/cart/{cart[0]['id']}"), 204)
+    _ok(await client.post("/cart/checkout"))
+    _ok(await client.post("/cart/", json={"course_id": 4}), 201)
+    _ok(await client.delete("/cart/"), 204)
+    _ok(await client.get("/bought-courses/user/me"))
+    _ok(await client.get(f"/bought-courses/user/{user_id}", params={"limit": 1}))
+    _ok(await client.get("/bought-courses/1"))
+
+    # комментарии
+    comment = _ok(await client.post("/comments/", json={
+        "user_id": user_id, "course_id": 1, "content": "-", "rating": 5,
+    }), 201)
+    comment_id = comment.json()["id"]
+    _ok(await client.get(f"/comments/{comment_id}"))
+    _ok(await client.get("/comments/course/1"))
+    _ok(await client.patch(f"/comments/{comment_id}", json={"rating": 3}))
+    _ok(await client.delete(f"/comments/{comment_id}"), 204)
+
+    # пользователи
+    _ok(await client.get("/users/"))
+    _ok(await client.get(f"/users/{user_id}"))
+    _ok(await client.get(f"/users/email/{me['email']}"))
+    _ok(await client.get(f"/users/username/{me['username']}"))
+    _ok(await client.patch(f"/users/{user_id}", json={"avatar_url": "/a.png"}))
+
+    _ok(await client.delete(f"/courses/my/{my_course_id}"), 204)
+    _ok(await client.delete("/courses/5"), 204)
+
+
+@pytest.mark.asyncio
+async def test_no_query_regresses_to_full_table_scan(client, session, login):
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(_PLANNED_PREFIXES):
+            statements.append((statement, parameters))
+
+    # чтения идут через db_helper, записи — через движок единственного писателя
+    engines = (db_helper.engine.sync_engine, write_queue.engine.sync_engine)
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", capture)
+    try:
+        await _exercise_api(client, session, login)
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", capture)
+
+    assert statements
+    offenders = []
+    async with db_helper.engine.connect() as conn:
+        for statement, parameters in {(s, tuple(p)) for s, p in statements}:
+            rows = await conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            plan = [row[-1] for row in rows]
+            if any(_is_full_scan(detail, statement, plan) for detail in plan):
+                offenders.append(f"{statement}\n  plan: {plan}")
+
+    assert not offenders, "Full table scans:\n" + "\n".join(offenders)
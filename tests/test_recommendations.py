@@ -0,0 +1,89 @@
+import pytest
+
+from server.app import models
+from server.app.recommendations import CoPurchaseIndex, recommendations
+
+
+async def _seed(session, purchases):
+    users = [models.User(username=f"u{i}", email=f"u{i}@test.com", hashed_password="x") for i in range(4)]
+    category = models.Category(name="General")
+    session.add_all([*users, category])
+    await session.flush()
+    session.add_all([
+        models.Course(title=f"Course {i}", format="online", description="-", price=i,
+                      duration_hours=1, owner_id=users[0].id, category_id=category.id)
+        for i in range(1, 6)
+    ])
+    await session.flush()
+    session.add_all([models.BoughtCourse(user_id=u, course_id=c) for u, c in purchases])
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_recommendations_follow_checkout_and_delete(client, session, login):
+    # курс 1 чаще всего покупают вместе с 2, затем с 3
+    await _seed(session, [(1, 1), (1, 2), (1, 3), (2, 1), (2, 2), (3, 4)])
+
+    response = await client.get("/courses/1/recommendations")
+    assert [(r["id"], r["co_purchases"]) for r in response.json()] == [(2, 2), (3, 1)]
+    assert response.json()[0]["title"] == "Course 2"
+
+    # новый студент покупает 1, 3 и 5 через корзину — индекс обновляется без пересборки
+    await login()
+    for course_id in (1, 3, 5):
+        await client.post("/cart/", json={"course_id": course_id})
+    await client.post("/cart/checkout")
+
+    response = await client.get("/courses/1/recommendations")
+    assert [(r["id"], r["co_purchases"]) for r in response.json()] == [(2, 2), (3, 2), (5, 1)]
+
+    await client.delete("/bought-courses/1")  # (user 1, course 1)
+    response = await client.get("/courses/1/recommendations", params={"limit": 2})
+    assert [(r["id"], r["co_purchases"]) for r in response.json()] == [(2, 1), (3, 1)]
+
+    assert (await client.get("/courses/4/recommendations")).json() == []
+
+
+@pytest.mark.asyncio
+async def test_index_snapshot_restores_and_catches_up(session, tmp_path):
+    await _seed(session, [(1, 1), (1, 2)])
+    await recommendations.rebuild(session)
+    path = tmp_path / "recommendations.json"
+    recommendations.save(path)
+
+    # покупка, сделанная, пока процесс был остановлен
+    session.add(models.BoughtCourse(user_id=1, course_id=3))
+    await session.commit()
+
+    restored = CoPurchaseIndex(top_n=5)
+    await restored.warm_up(session, path)
+    assert restored.top(1) == [(2, 1), (3, 1)]
+    assert restored.top(3) == [(1, 1), (2, 1)]
+    assert restored.watermark == 3
+
+
+@pytest.mark.asyncio
+async def test_purchases_committed_out_of_order_are_kept(session, tmp_path):
+    await _seed(session, [(1, 1)])
+    index = CoPurchaseIndex(top_n=5, catch_up_window=10)
+    await index.rebuild(session)
+
+    # id 5 закоммичен раньше id 2
+    session.add_all([models.BoughtCourse(id=5, user_id=1, course_id=3), models.BoughtCourse(id=2, user_id=1, course_id=2)])
+    await session.commit()
+    index.add_purchases([(5, 1, 3)])
+    index.add_purchases([(2, 1, 2), (5, 1, 3)])
+    assert index.top(1) == [(2, 1), (3, 1)]
+    assert index.top(2) == [(1, 1), (3, 1)]
+    path = tmp_path / "recommendations.json"
+    index.save(path)
+
+    # строки с id меньше watermark снимка, закоммиченные уже после него
+    session.add_all([models.BoughtCourse(id=3, user_id=2, course_id=1), models.BoughtCourse(id=4, user_id=2, course_id=4)])
+    await session.commit()
+
+    restored = CoPurchaseIndex(top_n=5, catch_up_window=10)
+    await restored.warm_up(session, path)
+    assert restored.top(4) == [(1, 1)]
+    assert restored.top(1) == [(2, 1), (3, 1), (4, 1)]
+    assert restored.watermark == 5
@@ -0,0 +1,77 @@
+from datetime import datetime, timedelta
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import select, update
+
+from server.main import app
+from server.app import models
+from server.app.crud import refresh_token as crud_refresh_tokens
+
+
+async def _refresh_with(token):
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test",
+                           cookies={"refresh_token": token}) as other:
+        return await other.post("/auth/refresh")
+
+
+async def _age_used_tokens(session):
+    await session.execute(
+        update(models.RefreshToken)
+        .where(models.RefreshToken.used_at.is_not(None))
+        .values(used_at=datetime.utcnow() - timedelta(minutes=5))
+    )
+    await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_refresh_rotates_and_reuse_revokes_the_family(client, session, login):
+    await login()
+    first = client.cookies.get("refresh_token", path="/auth")
+    assert first
+
+    response = await client.post("/auth/refresh")
+    assert response.status_code == 200
+    second = client.cookies.get("refresh_token", path="/auth")
+    assert second != first
+    assert (await client.get("/users/me")).json()["username"] == "student"
+
+    # старый токен предъявлен повторно после окна — вся цепочка отозвана, в том числе второй токен
+    await _age_used_tokens(session)
+    response = await _refresh_with(first)
+    assert response.status_code == 401
+    assert (await _refresh_with(second)).status_code == 401
+
+    rows = (await session.execute(select(models.RefreshToken.revoked_at))).scalars().all()
+    assert len(rows) == 2 and all(rows)
+
+
+@pytest.mark.asyncio
+async def test_just_rotated_token_is_accepted_within_grace(client, session, login):
+    await login()
+    first = client.cookies.get("refresh_token", path="/auth")
+
+    # две вкладки обменивают один и тот же токен почти одновременно
+    assert (await client.post("/auth/refresh")).status_code == 200
+    response = await _refresh_with(first)
+    assert response.status_code == 200
+    sibling = response.cookies.get("refresh_token")
+    assert sibling not in (first, client.cookies.get("refresh_token", path="/auth"))
+
+    assert (await client.post("/auth/refresh")).status_code == 200
+    assert (await _refresh_with(sibling)).status_code == 200
+    rows = (await session.execute(select(models.RefreshToken.revoked_at))).scalars().all()
+    assert len(rows) == 5 and not any(rows)
+
+
+@pytest.mark.asyncio
+async def test_logout_revokes_and_sweep_drops_expired_tokens(client, session, login):
+    await login()
+    token = client.cookies.get("refresh_token", path="/auth")
+    assert (await client.post("/auth/logout")).status_code == 200
+    assert (await _refresh_with(token)).status_code == 401
+
+    await session.execute(update(models.RefreshToken).values(expires_at=datetime.utcnow() - timedelta(seconds=1)))
+    await session.commit()
+    assert await crud_refresh_tokens.delete_expired_refresh_tokens(session) == 1
+    assert (await session.execute(select(models.RefreshToken))).first() is None
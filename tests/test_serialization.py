@@ -0,0 +1,30 @@
+import orjson
+import pytest
+from sqlalchemy import select, update
+
+from server.app import models
+from server.app.serialization import COURSE_LIST, dump
+
+
+@pytest.mark.asyncio
+async def test_expired_attributes_are_read_not_defaulted(session):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([owner, category])
+    await session.flush()
+    session.add_all([
+        models.Course(title=f"Course {i}", format="online", description="-", price=10,
+                      duration_hours=1, owner_id=owner.id, category_id=category.id)
+        for i in range(2)
+    ])
+    await session.commit()
+    courses = (await session.execute(select(models.Course).order_by(models.Course.id))).scalars().all()
+
+    # рейтинг изменился в БД, а у второго курса атрибут истёк и не лежит в __dict__
+    await session.execute(
+        update(models.Course).values(rating=4.5, rating_count=2).execution_options(synchronize_session=False)
+    )
+    session.expire(courses[1], ["rating", "rating_count"])
+
+    body = orjson.loads(await session.run_sync(lambda _: dump(COURSE_LIST, courses)))
+    assert [(c["rating"], c["rating_count"]) for c in body] == [(0, 0), (4.5, 2)]
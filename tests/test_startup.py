@@ -0,0 +1,113 @@
+import asyncio
+import subprocess
+import sys
+
+import pytest
+from httpx import AsyncClient, ASGITransport
+from sqlalchemy import text
+
+from server import main
+from server.main import create_app
+from server.app.counters import purchase_counters
+from server.app.recommendations import recommendations
+from server.app.write_queue import write_queue
+from server.app import startup
+from server.app.db_helper import db_helper, db_router
+
+
+async def _stamp_head():
+    async with db_helper.engine.begin() as conn:
+        await conn.execute(text("DROP TABLE IF EXISTS alembic_version"))
+        await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL PRIMARY KEY)"))
+        for head in startup.schema_heads():
+            await conn.execute(text("INSERT INTO alembic_version VALUES (:head)"), {"head": head})
+
+
+def test_import_has_no_side_effects():
+    # свежий интерпретатор: импорт не собирает приложение и не создаёт движков
+    code = (
+        "import server.main as m\n"
+        "from server.app.db_helper import db_helper\n"
+        "from server.app.write_queue import write_queue\n"
+        "assert 'app' not in vars(m)\n"
+        "assert db_helper._engine is None and write_queue._engine is None\n"
+    )
+    subprocess.run([sys.executable, "-c", code], check=True)
+
+
+@pytest.mark.asyncio
+async def test_startup_rejects_unmigrated_schema(session):
+    app = create_app()
+    with pytest.raises(startup.SchemaRevisionError):
+        async with app.router.lifespan_context(app):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_startup_warms_up_before_ready(session):
+    await _stamp_head()
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            report = (await client.get("/health/startup")).json()
+            pool = (await client.get("/health/db-pool")).json()
+            courses = await client.get("/courses/")
+
+    assert report["ready"] is True
+    assert {"schema_revision", "connections", "statements"} <= set(report["steps"])
+    # соединения открыты заранее и ждут в пуле
+    assert pool["checkedin"] >= 1
+    assert courses.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_failed_startup_releases_what_it_opened(session, monkeypatch):
+    await _stamp_head()
+    closed = []
+    for target, name in ((write_queue, "stop"), (db_router, "dispose"), (purchase_counters, "stop")):
+        original = getattr(target, name)
+
+        async def spy(*args, original=original, name=name, target=target):
+            closed.append(type(target).__name__)
+            return await original(*args)
+
+        monkeypatch.setattr(target, name, spy)
+
+    async def broken_warm_up(*args):
+        raise RuntimeError("recommendations snapshot is broken")
+
+    # пулы и соединение писателя уже открыты, когда старт падает
+    monkeypatch.setattr(recommendations, "warm_up", broken_warm_up)
+    app = create_app()
+    with pytest.raises(RuntimeError):
+        async with app.router.lifespan_context(app):
+            pass
+
+    assert closed == ["WriteBehindCounter", "WriteQueue", "DatabaseRouter"]
+    assert not app.state.startup.ready
+
+
+@pytest.mark.asyncio
+async def test_shutdown_waits_for_the_sweeper(session, monkeypatch):
+    await _stamp_head()
+    events = []
+
+    async def sweep(interval):
+        try:
+            await asyncio.sleep(3600)
+        finally:
+            # отмена пришла посреди удаления: оно ещё дописывается
+            await asyncio.sleep(0.05)
+            events.append("sweeper finished")
+
+    async def dispose(original=db_router.dispose):
+        events.append("engines disposed")
+        await original()
+
+    monkeypatch.setattr(main, "sweep_refresh_tokens", sweep)
+    monkeypatch.setattr(db_router, "dispose", dispose)
+    app = create_app()
+    async with app.router.lifespan_context(app):
+        await asyncio.sleep(0)
+
+    assert events == ["sweeper finished", "engines disposed"]
@@ -0,0 +1,47 @@
+import pytest
+
+from server.app.cache import user_cache
+
+
+@pytest.mark.asyncio
+async def test_current_user_is_cached_and_invalidated(client, login):
+    await login()
+
+    response = await client.get("/users/me")
+    assert response.status_code == 200
+    user_id = response.json()["id"]
+    hits = user_cache.hits
+
+    response = await client.get("/users/me")
+    assert response.status_code == 200
+    assert user_cache.hits == hits + 1
+
+    response = await client.patch(f"/users/{user_id}", json={"username": "renamed"})
+    assert response.status_code == 200
+    response = await client.get("/users/me")
+    assert response.json()["username"] == "renamed"
+
+    response = await client.delete(f"/users/{user_id}")
+    assert response.status_code == 204
+    response = await client.get("/users/me")
+    assert response.status_code == 401
+
+    response = await client.get("/health/user-cache")
+    assert response.json()["misses"] >= 2
+
+
+@pytest.mark.asyncio
+async def test_password_hashing_runs_in_executor(client):
+    response = await client.post(
+        "/users/", json={"username": "api", "email": "api@test.com", "password": "pw"}
+    )
+    assert response.status_code == 201
+
+    response = await client.post("/auth/login", data={"username": "api", "password": "pw"})
+    assert response.status_code == 200
+    response = await client.post("/auth/login", data={"username": "api", "password": "bad"})
+    assert response.status_code == 401
+
+    stats = (await client.get("/health/password-hasher")).json()
+    assert stats["completed"] >= 3
+    assert stats["waiting"] == 0 and stats["running"] == 0
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from server.app import models
+from server.app.db_helper import db_helper
+from server.app.write_queue import after_commit, write_queue
+
+
+async def _add_category(session, name):
+    category = models.Category(name=name)
+    session.add(category)
+    if name == "broken":
+        await session.flush()
+        raise ValueError("rejected")
+    await session.commit()  # внутри пачки — только flush
+    return category.id
+
+
+@pytest.mark.asyncio
+async def test_concurrent_writes_share_transactions_and_keep_own_results(session):
+    batches_before = write_queue.batches
+    names = [f"Category {i}" for i in range(30)] + ["broken"]
+    results = await asyncio.gather(
+        *(write_queue.run(_add_category, name) for name in names),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[-1], ValueError)
+    ids = results[:-1]
+    assert len(set(ids)) == 30
+    # 31 операция уложилась в заметно меньшее число транзакций
+    assert write_queue.batches - batches_before < 10
+
+    stored = dict((await session.execute(select(models.Category.id, models.Category.name))).all())
+    assert stored == {category_id: name for category_id, name in zip(ids, names)}
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_does_not_break_the_batch(session):
+    async def broken(session):
+        session.add(models.Category(name=None))
+        await session.commit()  # flush падает на NOT NULL
+
+    results = await asyncio.gather(
+        write_queue.run(broken),
+        write_queue.run(_add_category, "after"),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[0], IntegrityError)
+    assert (await session.get(models.Category, results[1])).name == "after"
+
+
+@pytest.mark.asyncio
+async def test_side_effects_wait_for_the_batch_commit(session):
+    effects = []
+
+    async def write(session, name):
+        await _add_category(session, name)
+        after_commit(session, effects.append, name)
+        # SAVEPOINT уже отпущен, но COMMIT пачки ещё не прошёл
+        assert effects == []
+        if name == "rolled back":
+            raise ValueError("rejected")
+
+    results = await asyncio.gather(
+        write_queue.run(write, "kept"),
+        write_queue.run(write, "rolled back"),
+        return_exceptions=True,
+    )
+
+    assert isinstance(results[1], ValueError)
+    assert effects == ["kept"]
+
+
+@pytest.mark.asyncio
+async def test_checkout_and_comments_go_through_the_queue(client, session, login):
+    owner = models.User(username="owner", email="owner@test.com", hashed_password="x")
+    category = models.Category(name="General")
+    session.add_all([owner, category])
+    await session.flush()
+    session.add(models.Course(title="Course", format="online", description="-", price=1,
+                              duration_hours=1, owner_id=owner.id, category_id=category.id))
+    await session.commit()
+    await login()
+    writes_before = write_queue.writes
+
+    assert (await client.post("/cart/", json={"course_id": 1})).status_code == 201
+    assert (await client.post("/cart/checkout")).json()["courses_count"] == 1
+    response = await client.post("/comments/", json={"course_id": 1, "user_id": owner.id, "content": "-", "rating": 5})
+    assert response.status_code == 201
+    assert (await client.post("/cart/checkout")).status_code == 400
+
+    assert write_queue.writes - writes_before == 4
+
+
+@pytest.mark.asyncio
+async def test_open_read_transaction_does_not_block_the_writer(session):
+    async with db_helper.engine.connect() as conn:
+        assert (await conn.exec_driver_sql("PRAGMA journal_mode")).scalar() == "wal"
+        # читатель, не завершивший транзакцию (медленная выгрузка, недочитанный курсор)
+        await conn.exec_driver_sql("BEGIN")
+        await conn.exec_driver_sql("SELECT count(*) FROM categories")
+        category_id = await asyncio.wait_for(write_queue.run(_add_category, "while reading"), timeout=2)
+        await conn.exec_driver_sql("COMMIT")
+
+    assert (await session.get(models.Category, category_id)).name == "while reading"